@@ -1,32 +1,57 @@
+import time
+STARTUP_STARTED = time.perf_counter() # Für den Startup-Report, vor allen anderen Imports
 import os
 import json
+import re
 import sys
+import hashlib
+import hmac
+import threading
+import tempfile
+from collections import deque, OrderedDict
 import shutil
 import uuid
 import zipfile
-import io
+import fcntl
+import gc
+import gzip
+import mmap
+import pickle
+import sqlite3
+import atexit
+from contextlib import contextmanager
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import click
+import numpy as np
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, Request, Response, render_template, request, redirect, url_for, flash, session, send_file, g, has_request_context
+from flask.signals import before_render_template, template_rendered
 from functools import wraps
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# Versuche iracingdataapi zu importieren
-try:
-    from iracingdataapi.client import irDataClient
-    IRACING_AVAILABLE = True
-except Exception as e: # Fange ALLE Fehler, nicht nur ImportError!
-    IRACING_AVAILABLE = False
-    print(f"Warnung: iracingdataapi konnte nicht geladen werden: {e}")
+# iracingdataapi (zieht pydantic nach) und requests werden erst geladen, wenn ein Sync sie braucht
+_irdataclient_class = None
+_irdataclient_checked = False
 
-# --- Eigener Mini-Client (Fallback) ---
-import hashlib
-import base64
-import requests
+def get_irdataclient_class():
+    global _irdataclient_class, _irdataclient_checked
+    if not _irdataclient_checked:
+        _irdataclient_checked = True
+        try:
+            from iracingdataapi.client import irDataClient
+            _irdataclient_class = irDataClient
+        except Exception as e: # Fange ALLE Fehler, nicht nur ImportError!
+            print(f"Warnung: iracingdataapi konnte nicht geladen werden: {e}")
+    return _irdataclient_class
 
+# --- Eigener Mini-Client (Fallback) ---
 class SimpleIRacingClient:
     def __init__(self, username, password):
+        import requests
         self.session = requests.Session()
         self.username = username
         self.password = password
@@ -34,6 +59,7 @@ class SimpleIRacingClient:
         self.login()
 
     def login(self):
+        import base64
         # 1. Passwort Hashen (Standard iRacing Hash)
         hash_val = hashlib.sha256((self.password + self.username.lower()).encode('utf-8')).digest()
         pw_hash = base64.b64encode(hash_val).decode('utf-8')
@@ -44,6 +70,7 @@ class SimpleIRacingClient:
         data = {"email": self.username, "password": pw_hash}
         
         try:
+            metric_inc('iracing_calls')
             resp = self.session.post(url, json=data, headers=headers, timeout=10)
             if resp.status_code == 200:
                 self.authenticated = True
@@ -62,6 +89,7 @@ class SimpleIRacingClient:
         url = "https://members-ng.iracing.com/data/stats/member_career"
         params = {"cust_id": cust_id}
         
+        metric_inc('iracing_calls')
         resp = self.session.get(url, params=params, timeout=10)
         if resp.status_code == 200:
             return resp.json().get('stats', [])
@@ -78,6 +106,31 @@ except Exception as e:
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'super-secret-key-for-dev') # Notwendig für Flash-Messages
 
+# --- Startup-Report ---
+# Jede Phase beim Import (Worker-Boot) wird gemessen und am Ende einmal ausgegeben.
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '1500'))
+STARTUP_TIMINGS = [{"phase": "imports", "ms": round((time.perf_counter() - STARTUP_STARTED) * 1000, 1), "note": ""}]
+
+@contextmanager
+def startup_phase(name):
+    started = time.perf_counter()
+    info = {"phase": name, "note": ""}
+    try:
+        yield info
+    finally:
+        info["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        STARTUP_TIMINGS.append(info)
+
+def report_startup():
+    total = (time.perf_counter() - STARTUP_STARTED) * 1000
+    measured = sum(t['ms'] for t in STARTUP_TIMINGS)
+    STARTUP_TIMINGS.append({"phase": "module", "ms": round(total - measured, 1), "note": "Routen & Setup"})
+    STARTUP_TIMINGS.append({"phase": "total", "ms": round(total, 1), "note": ""})
+    summary = ", ".join(f"{t['phase']} {t['ms']:.0f}ms" + (f" ({t['note']})" if t['note'] else '') for t in STARTUP_TIMINGS)
+    print(f"Startup (pid {os.getpid()}): {summary}")
+    if total > STARTUP_BUDGET_MS:
+        print(f"WARNUNG: Startup dauerte {total:.0f}ms, Budget ist {STARTUP_BUDGET_MS:.0f}ms (STARTUP_BUDGET_MS).")
+
 # --- PERSISTENZ KONFIGURATION (Volume Support) ---
 RAILWAY_VOLUME_MOUNT_POINT = os.environ.get('RAILWAY_VOLUME_MOUNT_POINT', '/app/persistent')
 
@@ -98,22 +151,844 @@ LIVERIES_FILE = os.path.join(BASE_DATA_DIR, 'liveries.json')
 SETUPS_FILE = os.path.join(BASE_DATA_DIR, 'setups.json')
 APPLICATIONS_FILE = os.path.join(BASE_DATA_DIR, 'applications.json')
 RESULTS_META_FILE = os.path.join(BASE_DATA_DIR, 'results_meta.json')
+DRIVER_STATS_FILE = os.path.join(BASE_DATA_DIR, 'driver_stats.json')
+STANDINGS_FILE = os.path.join(BASE_DATA_DIR, 'standings.json')
+PERSONAL_BESTS_FILE = os.path.join(BASE_DATA_DIR, 'personal_bests.json')
+BLOBS_FILE = os.path.join(BASE_DATA_DIR, 'blobs.json')
+LOCKS_FOLDER = os.path.join(BASE_DATA_DIR, 'locks')
+UPLOAD_INCOMING_FOLDER = os.path.join(BASE_DATA_DIR, 'incoming')
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123") # Default Passwort
 
+# --- Generationen & Store-Cache ---
+# Jeder Store (und der Ergebnis-Ordner als Ganzes) hat einen Generationszähler in generations.bin, die von
+# allen Workern per mmap geteilt wird (8 Byte pro Slot). save_* erhöht den Zähler, Caches vergleichen
+# nur die Zahl -> kein stat/read pro Request und trotzdem keine veralteten Daten nach dem Save eines
+# anderen Workers. Gecacht wird das gepickelte Ergebnis, jeder Aufruf bekommt eine eigene Kopie.
+GENERATIONS_FILE = os.path.join(BASE_DATA_DIR, 'generations.bin')
+GENERATION_NAMES = ('drivers', 'config', 'cars', 'events', 'news', 'messages', 'liveries', 'setups',
+                    'applications', 'results_meta', 'blobs', 'results', 'laps',
+                    'driver_stats', 'standings', 'personal_bests')
+STORE_CACHE_ENABLED = os.environ.get('STORE_CACHE', '1') != '0'
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '24'))
+
+class GenerationCounters:
+    def __init__(self, path, names):
+        self.path = path
+        self.slots = {name: i for i, name in enumerate(names)}
+        self._map = None
+
+    def _mapping(self):
+        if self._map is None:
+            size = len(self.slots) * 8
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        return self._map
+
+    def get(self, name):
+        offset = self.slots[name] * 8
+        return int.from_bytes(self._mapping()[offset:offset + 8], 'little')
+
+    def bump(self, name):
+        offset = self.slots[name] * 8
+        with file_lock('generations'):
+            value = self.get(name) + 1
+            self._mapping()[offset:offset + 8] = value.to_bytes(8, 'little')
+        return value
+
+GENERATIONS = GenerationCounters(GENERATIONS_FILE, GENERATION_NAMES)
+_store_cache = {}
+
+def bump_generation(name):
+    try:
+        return GENERATIONS.bump(name)
+    except OSError as e:
+        print(f"Generation {name} konnte nicht erhöht werden: {e}")
+        _store_cache.pop(name, None)
+
+def store_cached(name):
+    def decorator(loader):
+        @wraps(loader)
+        def wrapper():
+            if not STORE_CACHE_ENABLED:
+                return loader()
+            # Generation VOR dem Lesen holen: ein Save dazwischen macht den Eintrag beim nächsten Mal ungültig
+            generation = GENERATIONS.get(name)
+            entry = _store_cache.get(name)
+            if entry and entry[0] == generation:
+                return pickle.loads(entry[1])
+            data = loader()
+            _store_cache[name] = (generation, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+            return data
+        return wrapper
+    return decorator
+
+# --- JSON Streaming (selektives Lesen) ---
+# Für Kopfdaten, Meta-Backfill und einzelne Sessions muss nicht die ganze Ergebnisdatei geparst werden.
+# JsonStream liest die Datei stückweise und läuft über die Objekt-/Array-Struktur (ähnlich ijson): gewünschte
+# Werte dekodiert der C-Decoder (raw_decode), alles andere wird nur auf Strings und Klammern gescannt und
+# verworfen. Sobald alle gesuchten Pfade gefunden sind, wird nicht weitergelesen.
+JSON_STREAM_CHUNK = 16 * 1024
+_JSON_DECODER = json.JSONDecoder()
+_JSON_NUMBER_START = frozenset('-0123456789')
+_JSON_NUMBER_CHARS = frozenset('0123456789.eE+-')
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Alles bis zur nächsten Klammer außerhalb von Strings in einem Rutsch (Strings komplett, Escapes beachtet)
+_JSON_SKIP_RUN = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+
+class JsonStream:
+    def __init__(self, f, chunk_size=JSON_STREAM_CHUNK):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.chars_read = 0
+
+    def _fill(self, size=None):
+        # Verbrauchtes vorne abschneiden, dann mindestens einen Chunk nachladen
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.f.read(max(self.chunk_size, size or 0))
+        if not chunk:
+            self.eof = True
+            return False
+        self.chars_read += len(chunk)
+        self.buf += chunk
+        return True
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.buf, min(self.pos, len(self.buf)))
+
+    def peek(self):
+        while True:
+            self.pos = _JSON_WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise self._error("Unerwartetes Ende der JSON-Daten")
+
+    def _expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise self._error(f"Erwartet {' oder '.join(chars)}, gefunden {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Nächsten Wert vollständig dekodieren; der Puffer wächst, bis der Wert ganz drin ist."""
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(len(self.buf)):
+                    raise
+                continue
+            # Zahlen/Literale am Pufferende können abgeschnitten sein - auch mitten in Nachkommastellen oder
+            # Exponent ("123." | "45"): dann endet der dekodierte Wert vor einem Zahlzeichen
+            truncated = end == len(self.buf) or (self.buf[self.pos] in _JSON_NUMBER_START
+                                                 and self.buf[end] in _JSON_NUMBER_CHARS)
+            if truncated and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Nächsten Wert überspringen, ohne Objekte zu bauen."""
+        if self.peek() not in '{[':
+            self.value()
+            return
+        depth = 0
+        while True:
+            self.pos = _JSON_SKIP_RUN.match(self.buf, self.pos).end()
+            # Pufferende oder ein String, der darüber hinausreicht -> nachladen
+            if self.pos == len(self.buf) or self.buf[self.pos] == '"':
+                if not self._fill():
+                    raise self._error("Unerwartetes Ende der JSON-Daten")
+                continue
+            char = self.buf[self.pos]
+            self.pos += 1
+            if char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def object_keys(self):
+        """Schlüssel des Objekts an der aktuellen Position; der Aufrufer muss jeden Wert lesen oder überspringen."""
+        self._expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("Schlüssel erwartet")
+            key = self.value()
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def array_items(self):
+        """Ein Schritt pro Element des Arrays; der Aufrufer muss jedes Element lesen oder überspringen."""
+        self._expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self._expect(',]') == ']':
+                return
+
+    def finish(self):
+        # Nach dem Dokument darf nur noch Whitespace kommen
+        try:
+            self.peek()
+        except json.JSONDecodeError:
+            return
+        raise self._error("Zusätzliche Daten nach dem JSON-Dokument")
+
+def _stream_collect(stream, prefix, wanted, prefixes, found, until):
+    # True = fertig (alles gefunden oder 'until' erreicht), dann wird nirgends weitergelesen
+    for key in stream.object_keys():
+        path = prefix + (key,)
+        if path == until:
+            return True
+        if path in wanted:
+            found[wanted[path]] = stream.value()
+            if len(found) == len(wanted):
+                return True
+        elif path in prefixes and stream.peek() == '{':
+            if _stream_collect(stream, path, wanted, prefixes, found, until):
+                return True
+        else:
+            stream.skip()
+    return False
+
+def _note_stream_read(stream):
+    metric_inc('result_files')
+    metric_inc('bytes_read', stream.chars_read)
+
+def stream_json_values(filepath, paths, until=None):
+    """Liest nur die Werte unter den angegebenen Pfaden ('data.track', ...) -> {pfad: wert}; fehlende Pfade
+    fehlen im Ergebnis. Mit until (ebenfalls ein Pfad) wird beim Erreichen dieses Schlüssels aufgehört."""
+    wanted = {tuple(p.split('.')): p for p in paths}
+    prefixes = {path[:i] for path in wanted for i in range(1, len(path))}
+    found = {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        if stream.peek() == '{':
+            _stream_collect(stream, (), wanted, prefixes, found, tuple(until.split('.')) if until else None)
+        _note_stream_read(stream)
+    return found
+
+def _stream_seek(stream, path):
+    for key in stream.object_keys():
+        if key != path[0]:
+            stream.skip()
+        elif len(path) == 1:
+            return True
+        elif stream.peek() == '{':
+            return _stream_seek(stream, path[1:])
+        else:
+            return False
+    return False
+
+def stream_json_items(filepath, path):
+    """Elemente des Arrays unter path ('data.session_results') einzeln - immer nur eines im Speicher."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        try:
+            if stream.peek() == '{' and _stream_seek(stream, tuple(path.split('.'))) and stream.peek() == '[':
+                for _ in stream.array_items():
+                    yield stream.value()
+        finally:
+            _note_stream_read(stream)
+
+def stream_result_sessions(filepath):
+    """(Rennen, Quali) einer Ergebnisdatei: erste Race-Session (sonst die letzte) und erste Qualifying-Session.
+    Die Sessions werden einzeln gestreamt, Trainings nicht behalten."""
+    race_session = quali_session = last_session = None
+    for sess in stream_json_items(filepath, 'data.session_results'):
+        last_session = sess
+        if race_session is None and sess.get('simsession_type_name') == 'Race':
+            race_session = sess
+        if quali_session is None and 'Qualify' in sess.get('simsession_type_name', ''):
+            quali_session = sess
+        if race_session and quali_session:
+            break
+    return race_session or last_session, quali_session
+
+# --- Session Tabellen ---
+# Eine Session aus einer Ergebnisdatei als Spalten (NumPy): Positionen, Klassen, Runden, Abstände, Rundenzeiten,
+# Incidents. Rückstand in Runden, Abstände und Zeitformatierung werden für alle Zeilen auf einmal berechnet;
+# Ergebnis-Ansicht, Event-Seite und Fahrer-Historie nutzen dieselbe Tabelle statt eigener Schleifen.
+# Zeiten kommen von iRacing in 1/10000 Sekunden.
+_session_table_cache = OrderedDict()
+_session_table_lock = threading.Lock() # Cache-Warmer-Thread und Requests teilen sich das LRU
+
+def format_lap_time(val):
+    if not val or val <= 0: return "-"
+    seconds = val / 10000
+    minutes = int(seconds // 60)
+    rem_seconds = seconds % 60
+    return f"{minutes}:{rem_seconds:06.3f}"
+
+def format_lap_times(ticks):
+    ticks = np.asarray(ticks, dtype=np.int64)
+    seconds = ticks / 10000
+    minutes = (seconds // 60).astype(np.int64).tolist()
+    rest = (seconds % 60).tolist()
+    return [f"{m}:{r:06.3f}" if t > 0 else "-" for t, m, r in zip(ticks.tolist(), minutes, rest)]
+
+def format_gaps(ticks):
+    # Abstand zum Vordermann/Sieger: über einer Minute als +m:ss.ss, sonst +s.sss s
+    seconds = np.asarray(ticks, dtype=np.int64) / 10000
+    minutes = (seconds // 60).astype(np.int64).tolist()
+    rest = (seconds % 60).tolist()
+    return [f"+{m}:{r:05.2f}" if s > 60 else f"+{s:.3f}s" for s, m, r in zip(seconds.tolist(), minutes, rest)]
+
+def format_laps_down(diff):
+    return f"+{diff} Lap{'s' if diff > 1 else ''}"
+
+class SessionTable:
+    COLUMNS = ('cust_id', 'car_class_id', 'finish_position', 'laps_complete', 'interval',
+               'class_interval', 'best_lap_time', 'average_lap', 'incidents')
+
+    def __init__(self, session):
+        self.session = session
+        self.rows = session.get('results', []) or []
+        n = len(self.rows)
+        for col in self.COLUMNS:
+            setattr(self, col, np.fromiter(((r.get(col) or 0) for r in self.rows), dtype=np.int64, count=n))
+        # Fallback wie bisher in der Ergebnis-Ansicht, falls finish_position_in_class fehlt
+        self.class_position = np.fromiter(
+            ((r.get('finish_position_in_class', r.get('position', 0) + 1) or 0) for r in self.rows),
+            dtype=np.int64, count=n)
+        self.classes, self.class_index = np.unique(self.car_class_id, return_inverse=True)
+        self._members = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _class_max(self, values):
+        result = np.zeros(len(self.classes), dtype=np.int64)
+        np.maximum.at(result, self.class_index, values)
+        return result[self.class_index]
+
+    def laps_down(self):
+        if not len(self.rows):
+            return self.laps_complete
+        return self.laps_complete.max() - self.laps_complete
+
+    def class_laps_down(self):
+        return self._class_max(self.laps_complete) - self.laps_complete
+
+    def _gap_strings(self, laps_down, interval, leader):
+        formatted = format_gaps(interval)
+        gaps = []
+        for down, ticks, text in zip(laps_down.tolist(), interval.tolist(), formatted):
+            if down > 0:
+                gaps.append(format_laps_down(down))
+            elif ticks > 0:
+                gaps.append(text)
+            elif ticks == 0:
+                gaps.append(leader)
+            else:
+                gaps.append("-")
+        return gaps
+
+    def class_gaps(self, leader="-"):
+        return self._gap_strings(self.class_laps_down(), self.class_interval, leader)
+
+    def overall_gaps(self, leader="-"):
+        return self._gap_strings(self.laps_down(), self.interval, leader)
+
+    def gaps_to_pole(self):
+        # Quali: Abstand der besten Runde zur besten Runde des Klassenersten
+        n = len(self.rows)
+        if not n:
+            return []
+        order = np.lexsort((self.class_position, self.class_index))
+        first = np.ones(n, dtype=bool)
+        first[1:] = self.class_index[order][1:] != self.class_index[order][:-1]
+        is_pole = np.zeros(n, dtype=bool)
+        is_pole[order[first]] = True
+        pole_lap = np.zeros(len(self.classes), dtype=np.int64)
+        pole_lap[self.class_index[order[first]]] = self.best_lap_time[order[first]]
+        pole_lap = pole_lap[self.class_index]
+        valid = ~is_pole & (self.best_lap_time > 0) & (pole_lap > 0)
+        seconds = ((self.best_lap_time - pole_lap) / 10000).tolist()
+        return [f"+{s:.3f}s" if ok else "-" for s, ok in zip(seconds, valid.tolist())]
+
+    def best_laps(self):
+        return format_lap_times(self.best_lap_time)
+
+    def avg_laps(self):
+        return format_lap_times(self.average_lap)
+
+    def locate(self, cust_id):
+        """Zeile für eine iRacing ID: (Index, None) bei Einzelfahrern, (Index, Fahrer-Eintrag) bei Teams."""
+        if self._members is None:
+            members = {}
+            for i, r in enumerate(self.rows):
+                members.setdefault(str(r.get('cust_id')), (i, None))
+                for team_driver in r.get('driver_results', None) or []:
+                    members.setdefault(str(team_driver.get('cust_id')), (i, team_driver))
+            self._members = members
+        return self._members.get(str(cust_id), (None, None))
+
+def load_session_tables(filepath):
+    """(Rennen, Quali) einer Ergebnisdatei als SessionTable, pro Prozess gecacht solange die Datei gleich ist.
+    Die Zeilen sind geteilt - nur lesen, vor Änderungen kopieren."""
+    st = os.stat(filepath)
+    version = (st.st_mtime_ns, st.st_size)
+    with _session_table_lock:
+        entry = _session_table_cache.get(filepath)
+        if entry and entry[0] == version:
+            _session_table_cache.move_to_end(filepath)
+            return entry[1]
+    race_session, quali_session = stream_result_sessions(filepath)
+    tables = (SessionTable(race_session) if race_session else None,
+              SessionTable(quali_session) if quali_session else None)
+    with _session_table_lock:
+        _session_table_cache[filepath] = (version, tables)
+        while len(_session_table_cache) > RESULT_CACHE_SIZE:
+            _session_table_cache.popitem(last=False)
+    return tables
+
+# --- Rundendaten (Lap Store) ---
+# Rundendaten (iRacing lap_chart_data / lap_data, hochgeladen oder per API geholt) kommen pro Ergebnisdatei
+# in eine kompakte Binärdatei laps/<ergebnis>.laps: Header (Magic + Länge), JSON-Index, dann die Runden
+# als feste Records (LAP_DTYPE), nach Auto sortiert. Der Index hält pro Auto Offset und Anzahl - die Runden
+# eines Autos/Fahrers werden per seek + np.fromfile gelesen, ohne JSON zu parsen.
+# Das Auto ist die group_id aus iRacing (team_id bei Team-Events, sonst cust_id).
+LAPS_FOLDER = os.path.join(BASE_DATA_DIR, 'laps')
+LAP_STORE_MAGIC = b'RDFLAPS1'
+LAP_DTYPE = np.dtype([('lap', '<i2'), ('cust_id', '<i4'), ('lap_time', '<i4'), ('session_time', '<i4'),
+                      ('position', '<i2'), ('flags', '<u2'), ('incident', 'u1')])
+LAP_EVENT_FLAGS = {'pitted': 1, 'off track': 2, 'invalid': 4, 'black flag': 8, 'contact': 16,
+                   'car contact': 32, 'lost control': 64, 'tow': 128, 'discontinuity': 256}
+_lap_index_cache = {}
+
+def lap_store_path(result_filename):
+    stem = os.path.splitext(secure_filename(result_filename))[0]
+    return os.path.join(LAPS_FOLDER, f"{stem}.laps")
+
+def has_lap_data(result_filename):
+    return os.path.exists(lap_store_path(result_filename))
+
+def parse_lap_payload(payload):
+    """Runden-Liste aus einer Lap-Datei: Liste, {'laps': [...]}, {'lap_data': [...]} oder
+    iRacing-Antwort mit 'data'-Hülle (wie die Ergebnisdateien)."""
+    if isinstance(payload, dict) and isinstance(payload.get('data'), (dict, list)):
+        payload = payload['data']
+    if isinstance(payload, dict):
+        payload = payload.get('laps') or payload.get('lap_data') or payload.get('chunk_data') or []
+    if not isinstance(payload, list):
+        raise ValueError("Keine Rundenliste gefunden")
+    laps = [lap for lap in payload if isinstance(lap, dict) and 'lap_number' in lap]
+    if not laps:
+        raise ValueError("Datei enthält keine Runden (lap_number fehlt)")
+    return laps
+
+def lap_flags(lap):
+    flags = 0
+    for event in lap.get('lap_events') or []:
+        flags |= LAP_EVENT_FLAGS.get(str(event).lower(), 0)
+    return flags
+
+def write_lap_store(result_filename, laps, source):
+    """Schreibt den Lap Store für eine Ergebnisdatei (ersetzt einen vorhandenen atomar)."""
+    cars = {}
+    for lap in laps:
+        key = lap.get('group_id') or lap.get('team_id') or lap.get('cust_id')
+        if key is None:
+            continue
+        cars.setdefault(int(key), []).append(lap)
+
+    records = np.zeros(sum(len(c) for c in cars.values()), dtype=LAP_DTYPE)
+    index = {"version": 1, "result": secure_filename(result_filename), "source": source,
+             "created": datetime.now().isoformat(), "laps": len(records), "cars": {}}
+    offset = 0
+    for key, car_laps in cars.items():
+        car_laps.sort(key=lambda l: (l.get('lap_number') or 0, l.get('session_time') or 0))
+        block = records[offset:offset + len(car_laps)]
+        block['lap'] = [l.get('lap_number') or 0 for l in car_laps]
+        block['cust_id'] = [l.get('cust_id') or 0 for l in car_laps]
+        block['lap_time'] = [l.get('lap_time') if l.get('lap_time') is not None else -1 for l in car_laps]
+        block['session_time'] = [l.get('session_time') or 0 for l in car_laps]
+        block['position'] = [l.get('lap_position') or 0 for l in car_laps]
+        block['flags'] = [lap_flags(l) for l in car_laps]
+        block['incident'] = [1 if l.get('incident') else 0 for l in car_laps]
+        drivers = {}
+        for l in car_laps:
+            if l.get('cust_id'):
+                drivers.setdefault(str(l['cust_id']), l.get('display_name') or l.get('name') or '')
+        index['cars'][str(key)] = {"offset": offset, "count": len(car_laps), "drivers": drivers,
+                                   "name": car_laps[0].get('name') or car_laps[0].get('display_name') or str(key),
+                                   "car_number": car_laps[0].get('car_number')}
+        offset += len(car_laps)
+
+    header = json.dumps(index).encode('utf-8')
+    path = lap_store_path(result_filename)
+    os.makedirs(LAPS_FOLDER, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(LAP_STORE_MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        f.write(records.tobytes())
+    os.replace(tmp, path)
+    bump_generation('laps')
+    print(f"Lap Store {os.path.basename(path)}: {len(records)} Runden, {len(cars)} Autos ({source})")
+    # Stint-Analyse gleich vorberechnen, damit kein Seitenaufruf sie bauen muss
+    try:
+        stint_analysis(result_filename)
+    except Exception as e:
+        print(f"Stint-Analyse für {os.path.basename(path)} fehlgeschlagen: {e}")
+    return {"laps": len(records), "cars": len(cars)}
+
+def load_lap_index(result_filename):
+    """Index des Lap Stores (oder None), pro Prozess gecacht solange die Datei gleich ist."""
+    path = lap_store_path(result_filename)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = (st.st_mtime_ns, st.st_size)
+    entry = _lap_index_cache.get(path)
+    if entry and entry[0] == version:
+        return entry[1]
+    with open(path, 'rb') as f:
+        if f.read(len(LAP_STORE_MAGIC)) != LAP_STORE_MAGIC:
+            raise ValueError(f"{os.path.basename(path)} ist kein Lap Store")
+        length = int.from_bytes(f.read(4), 'little')
+        index = json.loads(f.read(length))
+    metric_inc('bytes_read', len(LAP_STORE_MAGIC) + 4 + length)
+    index['data_offset'] = len(LAP_STORE_MAGIC) + 4 + length
+    _lap_index_cache[path] = (version, index)
+    return index
+
+def load_car_laps(result_filename, car_key, index=None):
+    """Alle Runden eines Autos als strukturiertes Array (leer, wenn das Auto keine Runden hat)."""
+    index = index or load_lap_index(result_filename)
+    car = index['cars'].get(str(car_key)) if index else None
+    if not car:
+        return np.zeros(0, dtype=LAP_DTYPE)
+    metric_inc('bytes_read', car['count'] * LAP_DTYPE.itemsize)
+    with open(lap_store_path(result_filename), 'rb') as f:
+        f.seek(index['data_offset'] + car['offset'] * LAP_DTYPE.itemsize)
+        return np.fromfile(f, dtype=LAP_DTYPE, count=car['count'])
+
+def load_driver_laps(result_filename, cust_id):
+    """Runden eines Fahrers (bei Team-Events nur seine Stints im Team-Auto)."""
+    index = load_lap_index(result_filename)
+    if not index:
+        return np.zeros(0, dtype=LAP_DTYPE)
+    for key, car in index['cars'].items():
+        if str(cust_id) in car['drivers']:
+            laps = load_car_laps(result_filename, key, index)
+            return laps[laps['cust_id'] == int(cust_id)]
+    return np.zeros(0, dtype=LAP_DTYPE)
+
+def fetch_lap_data(subsession_id):
+    """Holt die Rundendaten aller Autos einer Subsession über iracingdataapi (Rennsession)."""
+    client_class = get_irdataclient_class()
+    if client_class is None:
+        raise RuntimeError("iracingdataapi ist nicht verfügbar")
+    if not IRACING_USER or not IRACING_PASSWORD:
+        raise RuntimeError("IRACING_USERNAME / IRACING_PASSWORD fehlen")
+    client = client_class(username=IRACING_USER, password=IRACING_PASSWORD)
+    metric_inc('iracing_calls')
+    return client.result_lap_chart_data(subsession_id=subsession_id, simsession_number=0)
+
+def ingest_lap_file(result_filename, file):
+    payload = json.load(file)
+    return write_lap_store(result_filename, parse_lap_payload(payload), 'upload')
+
+# --- Stint-Analyse ---
+# Teilt die Runden jedes Autos in Stints: neuer Stint bei Fahrerwechsel oder nach einer Boxenrunde.
+# Pro Stint Durchschnitt/Median der sauberen Runden, Reifenabbau (Steigung der Rundenzeit über den Stint,
+# Least Squares über bincount-Summen) und Konstanz (Standardabweichung). Out-Laps, Boxenrunden und Runden
+# über 107% der Auto-Pace zählen nicht. Das Ergebnis wird beim Ingest einmal als Artefakt berechnet.
+STINT_PACE_CUTOFF = 1.07
+
+def detect_stints(laps, drivers):
+    laps = laps[laps['lap'] > 0]
+    n = len(laps)
+    if not n:
+        return []
+    times = laps['lap_time'].astype(np.float64)
+    pitted = (laps['flags'] & LAP_EVENT_FLAGS['pitted']) != 0
+    starts = np.zeros(n, dtype=bool)
+    starts[0] = True
+    starts[1:] = (laps['cust_id'][1:] != laps['cust_id'][:-1]) | pitted[:-1]
+    stint_id = np.cumsum(starts) - 1
+    start_idx = np.flatnonzero(starts)
+    count = len(start_idx)
+
+    valid = (times > 0) & ~pitted & ~starts
+    if valid.any():
+        valid &= times <= np.median(times[valid]) * STINT_PACE_CUTOFF
+    x = (np.arange(n) - start_idx[stint_id]).astype(np.float64)
+    w = valid.astype(np.float64)
+    cnt = np.bincount(stint_id, w, count)
+    sum_t = np.bincount(stint_id, w * times, count)
+    sum_tt = np.bincount(stint_id, w * times * times, count)
+    sum_x = np.bincount(stint_id, w * x, count)
+    sum_xx = np.bincount(stint_id, w * x * x, count)
+    sum_xt = np.bincount(stint_id, w * x * times, count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sum_t / cnt
+        std = np.sqrt(np.maximum(sum_tt / cnt - mean * mean, 0))
+        denom = cnt * sum_xx - sum_x * sum_x
+        slope = np.where((cnt >= 3) & (denom > 0), (cnt * sum_xt - sum_x * sum_t) / denom, np.nan)
+    lap_count = np.bincount(stint_id, minlength=count)
+    incidents = np.bincount(stint_id, laps['incident'].astype(np.float64), count)
+
+    # Median braucht die Werte selbst: saubere Runden sind nach Stint sortiert, also an den Wechseln splitten
+    medians = np.full(count, np.nan)
+    sid_valid = stint_id[valid]
+    if len(sid_valid):
+        for group in np.split(np.flatnonzero(valid), np.flatnonzero(np.diff(sid_valid)) + 1):
+            medians[stint_id[group[0]]] = np.median(times[group])
+
+    end_idx = np.append(start_idx[1:], n) - 1
+    stints = []
+    for k in range(count):
+        cust_id = int(laps['cust_id'][start_idx[k]])
+        stints.append({
+            'number': k + 1,
+            'cust_id': cust_id,
+            'driver': drivers.get(str(cust_id), ''),
+            'start_lap': int(laps['lap'][start_idx[k]]),
+            'end_lap': int(laps['lap'][end_idx[k]]),
+            'laps': int(lap_count[k]),
+            'clean_laps': int(cnt[k]),
+            'avg_raw': float(mean[k]) if cnt[k] else 0.0,
+            'median_raw': float(medians[k]) if cnt[k] else 0.0,
+            'slope_raw': None if np.isnan(slope[k]) else float(slope[k]),
+            'std_raw': float(std[k]) if cnt[k] > 1 else None,
+            'incidents': int(incidents[k]),
+            'pit_end': bool(pitted[end_idx[k]]),
+        })
+    for stint in stints:
+        stint['avg'] = format_lap_time(int(round(stint['avg_raw'])))
+        stint['median'] = format_lap_time(int(round(stint['median_raw'])))
+        stint['slope'] = f"{stint['slope_raw'] / 10000:+.3f}s" if stint['slope_raw'] is not None else "-"
+        stint['consistency'] = f"{stint['std_raw'] / 10000:.3f}s" if stint['std_raw'] is not None else "-"
+    return stints
+
+def summarize_driver_stints(stints):
+    # Pro Fahrer: Stints, Runden und Pace über alle sauberen Runden (gewichtet)
+    summary = {}
+    for stint in stints:
+        entry = summary.setdefault(stint['cust_id'], {'cust_id': stint['cust_id'], 'driver': stint['driver'],
+                                                      'stints': 0, 'laps': 0, 'clean_laps': 0, '_sum': 0.0})
+        entry['stints'] += 1
+        entry['laps'] += stint['laps']
+        entry['clean_laps'] += stint['clean_laps']
+        entry['_sum'] += stint['avg_raw'] * stint['clean_laps']
+    for entry in summary.values():
+        total = entry.pop('_sum')
+        entry['avg'] = format_lap_time(int(round(total / entry['clean_laps']))) if entry['clean_laps'] else "-"
+    return list(summary.values())
+
+def build_stint_analysis(result_filename):
+    index = load_lap_index(result_filename)
+    cars = {}
+    for key, car in index['cars'].items():
+        stints = detect_stints(load_car_laps(result_filename, key, index), car['drivers'])
+        cars[key] = {'name': car['name'], 'stints': stints, 'drivers': summarize_driver_stints(stints),
+                     'pit_stops': sum(1 for s in stints if s['pit_end']),
+                     'driver_changes': sum(1 for a, b in zip(stints, stints[1:]) if a['cust_id'] != b['cust_id'])}
+    return {'cars': cars}
+
+def stint_analysis(result_filename):
+    """Stints aller Autos eines Ergebnisses (Artefakt, gültig solange der Lap Store gleich ist) oder None."""
+    try:
+        st = os.stat(lap_store_path(result_filename))
+    except FileNotFoundError:
+        return None
+    return cached_artifact(f"stints:{secure_filename(result_filename)}", (st.st_mtime_ns, st.st_size),
+                           lambda: build_stint_analysis(result_filename))
+
+# --- Single-Flight & Artefakt-Cache ---
+# Teure Builder (Ergebnisdatei parsen, Ergebnis-Tabellen, Fahrer-Historie) laufen über cached_artifact:
+# erst Speicher (LRU pro Prozess), dann Platte (cache/artifacts, gepickelt), erst dann wird gebaut.
+# Gleichzeitige Misses für denselben Key warten per single_flight auf EINE Berechnung - im Prozess über
+# einen Thread-Lock, über Worker hinweg über einen Lock-File. Wer wartet, findet danach das Artefakt vor.
+ARTIFACT_FOLDER = os.path.join(BASE_DATA_DIR, 'cache', 'artifacts')
+ARTIFACT_MEMORY_SIZE = int(os.environ.get('ARTIFACT_MEMORY_SIZE', '64'))
+ARTIFACT_DISK_MAX_MB = int(os.environ.get('ARTIFACT_DISK_MAX_MB', '512'))
+_artifact_memory = OrderedDict()
+_artifact_memory_lock = threading.Lock() # LRU wird auch vom Cache-Warmer-Thread benutzt
+_artifact_writes = 0
+_flight_locks = {}
+_flight_guard = threading.Lock()
+
+@contextmanager
+def single_flight(key):
+    with _flight_guard:
+        lock = _flight_locks.setdefault(key, threading.Lock())
+    with lock:
+        with file_lock(f"flight-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"):
+            yield
+
+def _artifact_path(key):
+    return os.path.join(ARTIFACT_FOLDER, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+
+def _remember_artifact(key, version, payload):
+    with _artifact_memory_lock:
+        _artifact_memory[key] = (version, payload)
+        _artifact_memory.move_to_end(key)
+        while len(_artifact_memory) > ARTIFACT_MEMORY_SIZE:
+            _artifact_memory.popitem(last=False)
+
+def _read_artifact(key, version, memory):
+    if memory:
+        with _artifact_memory_lock:
+            entry = _artifact_memory.get(key)
+            if entry and entry[0] == version:
+                _artifact_memory.move_to_end(key)
+            else:
+                entry = None
+        if entry:
+            return True, pickle.loads(entry[1])
+    try:
+        with open(_artifact_path(key), 'rb') as f:
+            stored_key, stored_version, payload = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return False, None
+    if stored_key != key or stored_version != version:
+        return False, None
+    if memory:
+        _remember_artifact(key, version, payload)
+    return True, pickle.loads(payload)
+
+def _write_artifact(key, version, payload):
+    global _artifact_writes
+    os.makedirs(ARTIFACT_FOLDER, exist_ok=True)
+    path = _artifact_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((key, version, payload), f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _artifact_writes += 1
+    if _artifact_writes % 20 == 0:
+        prune_artifacts()
+
+def prune_artifacts():
+    # Älteste Artefakte löschen, bis der Ordner unter ARTIFACT_DISK_MAX_MB liegt
+    try:
+        files = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(ARTIFACT_FOLDER) if e.name.endswith('.pickle')]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= ARTIFACT_DISK_MAX_MB * MB:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def cached_artifact(key, version, builder, memory=True):
+    """Liefert builder() für (key, version) - aus Speicher, Platte oder genau einer Berechnung.
+    version muss picklebar und vergleichbar sein (z.B. Tupel aus mtime/Generationen)."""
+    found, value = _read_artifact(key, version, memory)
+    if found:
+        return value
+    with single_flight(key):
+        # Ein anderer Thread/Worker kann das Artefakt gebaut haben, während wir gewartet haben
+        found, value = _read_artifact(key, version, memory)
+        if found:
+            return value
+        value = builder()
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        try:
+            _write_artifact(key, version, payload)
+        except OSError as e:
+            print(f"Artefakt {key} konnte nicht gespeichert werden: {e}")
+        if memory:
+            _remember_artifact(key, version, payload)
+    return value
+
+# --- Geteilte Read-Only Daten (Gunicorn Preload) ---
+# Daten, die sich selten ändern und von vielen Seiten gelesen werden (Autos, Ergebnis-Index, Event-Zeitleiste),
+# werden über einen Builder registriert. Mit preload_app baut der Gunicorn-Master sie vor dem Fork
+# (prepare_for_fork) und friert sie ein; die Worker teilen diese Seiten dann copy-on-write statt jeder
+# seine eigene Kopie zu parsen. Ändert sich eine abhängige Generation, baut der betroffene Worker den
+# Eintrag für sich neu. Die Werte sind unveränderlich (tuple / MappingProxyType).
+SHARED_BUILDERS = {}
+_shared_data = {}
+
+def shared_data(name, deps):
+    def decorator(builder):
+        SHARED_BUILDERS[name] = (builder, deps)
+        return builder
+    return decorator
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def get_shared(name):
+    builder, deps = SHARED_BUILDERS[name]
+    generations = tuple(GENERATIONS.get(dep) for dep in deps)
+    entry = _shared_data.get(name)
+    if entry is None or entry[0] != generations:
+        entry = (generations, freeze(builder()))
+        _shared_data[name] = entry
+    return entry[1]
+
+def prepare_for_fork():
+    """Wird im Gunicorn-Master nach dem Preload aufgerufen (gunicorn.conf.py -> when_ready)."""
+    started = time.perf_counter()
+    for name in SHARED_BUILDERS:
+        try:
+            get_shared(name)
+        except Exception as e:
+            print(f"Geteilte Daten '{name}' konnten nicht gebaut werden: {e}")
+    # Alles bis hierhin aus dem GC nehmen, sonst fasst der erste GC-Lauf im Worker jedes Objekt an
+    # und kopiert damit die geteilten Seiten
+    gc.collect()
+    gc.freeze()
+    print(f"Preload: {len(_shared_data)} geteilte Datensätze in {(time.perf_counter() - started) * 1000:.0f}ms, "
+          f"{gc.get_freeze_count()} Objekte eingefroren.")
+
 # ...
 
+@store_cached('results_meta')
 def load_results_meta():
     if not os.path.exists(RESULTS_META_FILE):
         return {}
     try:
+        note_file_read('store_loads', RESULTS_META_FILE)
         with open(RESULTS_META_FILE, 'r') as f:
             return json.load(f)
     except:
         return {}
 
 def save_results_meta(data):
+    metric_inc('store_saves')
     with open(RESULTS_META_FILE, 'w') as f:
         json.dump(data, f, indent=4)
+    bump_generation('results_meta')
 
 UPLOAD_FOLDER = os.path.join(BASE_DATA_DIR, 'static/uploads')
 RESULTS_FOLDER = os.path.join(BASE_DATA_DIR, 'static/results')
@@ -121,9 +996,300 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 LOCAL_STATIC_UPLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
 LOCAL_STATIC_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/results')
 
+# --- Ergebnis-Archiv (kompakt) ---
+# iRacing-Ergebnisse enthalten viel, was die Seite nie liest (driver_licenses, Helme, Lizenz-Änderungen, ...).
+# Im Kompakt-Modus landet beim Upload das Original gzip-komprimiert in result_archive/ (nicht öffentlich),
+# in static/results/ liegt nur eine schlanke Projektion als kompaktes JSON. Alle Seiten lesen die Projektion;
+# die Rohdaten-Bearbeitung im Admin arbeitet auf dem Original und erzeugt danach die Projektion neu.
+# Neue Felder, die die Seite liest, müssen hier eingetragen werden (dann RESULT_PROJECTION_VERSION erhöhen).
+# Die Projektion entsteht gestreamt aus dem Archiv; Kopfdaten stehen vorne, session_results am Ende, damit
+# read_result_fields dort aufhören kann.
+# Ohne Volume ist der Ergebnisordner das Repo (static/results ist eingecheckt) - dort wird nicht kompaktiert,
+# sonst stünden nach dem ersten lokalen Start verlustbehaftete Projektionen im Git-Baum.
+# RESULT_COMPACT=1/0 erzwingt bzw. verbietet es (z.B. für den Benchmark in einer Sandbox-Kopie).
+RESULT_COMPACT_ENABLED = os.environ.get(
+    'RESULT_COMPACT', '1' if os.path.abspath(RESULTS_FOLDER) != os.path.abspath(LOCAL_STATIC_RESULTS) else '0') != '0'
+RESULT_ARCHIVE_FOLDER = os.path.join(BASE_DATA_DIR, 'result_archive')
+RESULT_ARCHIVE_LEVEL = 6
+RESULT_PROJECTION_VERSION = 3
+RESULT_DATA_FIELDS = frozenset((
+    'subsession_id', 'associated_subsession_ids', 'session_splits', 'start_time', 'series_name', 'season_name',
+    'league_id', 'league_name', 'league_season_id', 'league_season_name', 'track', 'car_classes',
+    'event_strength_of_field', 'driver_changes'))
+RESULT_SESSION_FIELDS = ('simsession_number', 'simsession_type', 'simsession_type_name', 'simsession_name')
+RESULT_ENTRY_FIELDS = frozenset((
+    'cust_id', 'team_id', 'display_name', 'team_name', 'club_name', 'car_name', 'car_class_id', 'car_class_name', 'car_class_short_name',
+    'position', 'finish_position', 'finish_position_in_class', 'starting_position', 'starting_position_in_class',
+    'laps_complete', 'interval', 'class_interval', 'best_lap_time', 'average_lap', 'best_qual_lap_time',
+    'best_qual_lap_at', 'incidents', 'reason_out', 'oldi_rating', 'newi_rating', 'old_safety_rating',
+    'new_safety_rating', 'league_points', 'champ_points',
+    'drop_race', 'steward_note'))
+_COMPACT_PREFIX = re.compile(rb'\{"compact":(\d+)')
+
+def result_archive_path(filename):
+    return os.path.join(RESULT_ARCHIVE_FOLDER, secure_filename(filename) + '.gz')
+
+def _project_entry(entry):
+    slim = {k: v for k, v in entry.items() if k in RESULT_ENTRY_FIELDS}
+    # Von der Lackierung wird nur die Startnummer angezeigt
+    livery = entry.get('livery')
+    if isinstance(livery, dict) and 'car_number' in livery:
+        slim['livery'] = {'car_number': livery['car_number']}
+    if entry.get('driver_results') is not None:
+        slim['driver_results'] = [_project_entry(member) for member in entry['driver_results']]
+    return slim
+
+def _project_session(session):
+    return dict({k: session[k] for k in RESULT_SESSION_FIELDS if k in session},
+                results=[_project_entry(entry) for entry in session.get('results') or []])
+
+def project_result_stream(stream):
+    """Schlanke Fassung eines Ergebnisses direkt aus dem Stream: nur die Felder, die die Seite liest.
+    Nicht benötigte Werte (driver_licenses, weather, ...) werden übersprungen, Sessions einzeln gelesen."""
+    projected = {'compact': RESULT_PROJECTION_VERSION}
+    data = None
+    for key in stream.object_keys():
+        if key != 'data' or stream.peek() != '{':
+            projected[key] = stream.value()
+            continue
+        data, sessions = {}, []
+        for data_key in stream.object_keys():
+            if data_key == 'session_results' and stream.peek() == '[':
+                for _ in stream.array_items():
+                    sessions.append(_project_session(stream.value()))
+            elif data_key in RESULT_DATA_FIELDS:
+                data[data_key] = stream.value()
+            else:
+                stream.skip()
+        data['session_results'] = sessions
+    stream.finish()
+    if data is not None:
+        projected['data'] = data
+    return projected
+
+def _write_atomic(path, payload):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def _open_original(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+def store_result_file(filename, raw=None, source_path=None):
+    """Speichert ein Ergebnis aus dem Originalinhalt (raw) oder einer Datei mit dem Original (source_path,
+    auch ein .gz aus dem Archiv). Kompakt-Modus: Original ins Archiv, Projektion in den Ergebnisordner.
+    Wirft ValueError bei ungültigem JSON; der bisherige Stand bleibt dann erhalten."""
+    filepath = os.path.join(RESULTS_FOLDER, secure_filename(filename))
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    if not RESULT_COMPACT_ENABLED:
+        if raw is None:
+            with _open_original(source_path) as f:
+                raw = f.read()
+        json.loads(raw)
+        _write_atomic(filepath, raw)
+        if os.path.exists(result_archive_path(filename)):
+            os.remove(result_archive_path(filename))
+        return
+
+    os.makedirs(RESULT_ARCHIVE_FOLDER, exist_ok=True)
+    archive = result_archive_path(filename)
+    tmp_archive = f"{archive}.tmp-{os.getpid()}"
+    try:
+        with gzip.open(tmp_archive, 'wb', RESULT_ARCHIVE_LEVEL) as out:
+            if raw is not None:
+                out.write(raw)
+            else:
+                with _open_original(source_path) as src:
+                    shutil.copyfileobj(src, out)
+        # Original komplett prüfen: beim Streamen werden übersprungene Werte nicht validiert, und der
+        # Admin-Editor muss das Archiv später wieder laden können
+        with gzip.open(tmp_archive, 'rb') as f:
+            json.load(f)
+        # Projektion aus dem frisch geschriebenen Archiv streamen
+        with gzip.open(tmp_archive, 'rt', encoding='utf-8') as f:
+            projected = project_result_stream(JsonStream(f))
+    except (OSError, ValueError):
+        if os.path.exists(tmp_archive):
+            os.remove(tmp_archive)
+        raise
+    os.replace(tmp_archive, archive)
+    _write_atomic(filepath, json.dumps(projected, separators=(',', ':')).encode('utf-8'))
+
+def compact_result_version(filepath):
+    """Projektions-Version einer Datei im Ergebnisordner, 0 wenn sie noch das Original ist."""
+    with open(filepath, 'rb') as f:
+        match = _COMPACT_PREFIX.match(f.read(32))
+    return int(match.group(1)) if match else 0
+
+def load_result_original(filename):
+    """Originaltext eines Ergebnisses: aus dem Archiv, sonst die Datei im Ergebnisordner (nicht kompaktiert)."""
+    filepath = os.path.join(RESULTS_FOLDER, secure_filename(filename))
+    archive = result_archive_path(filename)
+    if os.path.exists(archive) and compact_result_version(filepath):
+        with gzip.open(archive, 'rt', encoding='utf-8') as f:
+            return f.read()
+    with open(filepath, 'r') as f:
+        return f.read()
+
+def read_result_fields(filepath, fields):
+    """Einzelne Felder aus 'data' einer Ergebnisdatei, ohne sie ganz zu parsen -> {feld: wert}.
+    In aktuellen Projektionen stehen die Sessions am Ende, dort wird vorher aufgehört; in Originalen
+    werden sie übersprungen."""
+    until = 'data.session_results' if compact_result_version(filepath) >= 2 else None
+    values = stream_json_values(filepath, [f"data.{field}" for field in fields], until=until)
+    return {path[5:]: value for path, value in values.items()}
+
+def result_sync_unchanged(src, dst, cached):
+    """Volume Sync: im Volume liegt die Projektion, verglichen wird das Repo-Original mit dem archivierten
+    Original. Dessen Hash steht im Sync-Manifest und wird nur neu berechnet, wenn sich das Archiv ändert."""
+    archive = result_archive_path(os.path.basename(dst))
+    if not RESULT_COMPACT_ENABLED or not os.path.exists(dst) or not os.path.exists(archive):
+        return None
+    archive_stat = os.stat(archive)
+    original = (cached or {}).get('original')
+    if not original or original.get('size') != archive_stat.st_size or original.get('mtime_ns') != archive_stat.st_mtime_ns:
+        digest = hashlib.sha256()
+        with gzip.open(archive, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        original = {"size": archive_stat.st_size, "mtime_ns": archive_stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    if original['sha256'] != file_sha256(src):
+        return None
+    dst_stat = os.stat(dst)
+    return {"size": dst_stat.st_size, "mtime_ns": dst_stat.st_mtime_ns, "sha256": None, "original": original}
+
+def load_result_head(filepath):
+    """'data' einer Ergebnisdatei ohne die Sessions (Serie, Strecke, Liga, Splits, ...)."""
+    return read_result_fields(filepath, RESULT_DATA_FIELDS)
+
+def compact_results(*filenames):
+    """Kompaktiert Ergebnisdateien, die noch im Original oder in einer älteren Projektion vorliegen (alle,
+    wenn keine angegeben). Liefert die Namen der umgeschriebenen Dateien."""
+    if not RESULT_COMPACT_ENABLED or not os.path.exists(RESULTS_FOLDER):
+        return []
+    filenames = filenames or sorted(f for f in os.listdir(RESULTS_FOLDER) if f.endswith('.json'))
+    compacted = []
+    for filename in filenames:
+        filepath = os.path.join(RESULTS_FOLDER, filename)
+        try:
+            version = compact_result_version(filepath)
+            if version == RESULT_PROJECTION_VERSION:
+                continue
+            archive = result_archive_path(filename)
+            store_result_file(filename, source_path=archive if version and os.path.exists(archive) else filepath)
+            compacted.append(filename)
+        except (OSError, ValueError) as e:
+            print(f"Ergebnis {filename} konnte nicht kompaktiert werden: {e}")
+    if compacted:
+        bump_generation('results')
+    return compacted
+
+@app.cli.command('compact-results')
+def compact_results_command():
+    """Teilt noch nicht kompaktierte Ergebnisse in Archiv-Original und schlanke Projektion auf."""
+    compacted = compact_results()
+    if compacted:
+        update_result_aggregates(*compacted)
+    click.echo(f"{len(compacted)} Ergebnisdateien kompaktiert")
+
+# --- Volume Sync ---
+# Beim ersten Boot eines Deploys liegen Uploads/Results aus dem Repo im Container und werden ins Volume
+# übernommen. Kopiert wird nur, was neu oder anders ist: gleiche Größe + mtime gilt als identisch, sonst
+# entscheidet der SHA-256. Die Hashes der Volume-Dateien stehen in sync_manifest_<name>.json, damit sie
+# nicht bei jedem Deploy neu berechnet werden. Große Ordner laufen über einen Thread-Pool.
+VOLUME_SYNC_WORKERS = int(os.environ.get('VOLUME_SYNC_WORKERS', '8'))
+VOLUME_SYNC_PARALLEL_MIN = 32 # Ab so vielen Dateien lohnt sich der Pool
+VOLUME_SYNC_REPORT_FILE = os.path.join(BASE_DATA_DIR, 'volume_sync_report.json')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _sync_file(src, dst, cached):
+    # -> (Aktion, Bytes, Manifest-Eintrag der Zieldatei)
+    src_stat = os.stat(src)
+    if os.path.exists(dst):
+        dst_stat = os.stat(dst)
+        if dst_stat.st_size == src_stat.st_size:
+            entry = {"size": dst_stat.st_size, "mtime_ns": dst_stat.st_mtime_ns, "sha256": None}
+            if cached and cached.get('size') == dst_stat.st_size and cached.get('mtime_ns') == dst_stat.st_mtime_ns:
+                entry['sha256'] = cached.get('sha256')
+            if dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                return 'skipped', 0, entry
+            if not entry['sha256']:
+                entry['sha256'] = file_sha256(dst)
+            if entry['sha256'] == file_sha256(src):
+                return 'skipped', 0, entry
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.sync-{os.getpid()}"
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return 'copied', src_stat.st_size, {"size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns, "sha256": None}
+
+def sync_directory(src_dir, dst_dir, name, unchanged=None):
+    # unchanged(src, dst, manifest_eintrag) -> Manifest-Eintrag, wenn die Zieldatei trotz anderem Inhalt als
+    # aktuell gilt (kompaktierte Ergebnisse), sonst None -> normaler Vergleich
+    started = time.perf_counter()
+    manifest_path = os.path.join(BASE_DATA_DIR, f"sync_manifest_{name}.json")
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs = []
+    for root, dirs, files in os.walk(src_dir):
+        for filename in files:
+            src = os.path.join(root, filename)
+            rel = os.path.relpath(src, src_dir)
+            jobs.append((rel, src, os.path.join(dst_dir, rel)))
+
+    def run(job):
+        rel, src, dst = job
+        try:
+            if unchanged:
+                entry = unchanged(src, dst, manifest.get(rel))
+                if entry:
+                    return rel, ('skipped', 0, entry)
+            return rel, _sync_file(src, dst, manifest.get(rel))
+        except OSError as e:
+            return rel, e
+
+    if len(jobs) >= VOLUME_SYNC_PARALLEL_MIN and VOLUME_SYNC_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=VOLUME_SYNC_WORKERS) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = [run(job) for job in jobs]
+
+    report = {"name": name, "files": len(jobs), "copied": 0, "skipped": 0, "bytes": 0, "errors": []}
+    for rel, result in results:
+        if isinstance(result, Exception):
+            report['errors'].append(f"{rel}: {result}")
+            continue
+        action, size, entry = result
+        report[action] += 1
+        report['bytes'] += size
+        manifest[rel] = entry
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    print(f"Volume Sync {name}: {report['copied']} kopiert ({report['bytes'] / 1024 / 1024:.1f} MB), "
+          f"{report['skipped']} unverändert, {len(report['errors'])} Fehler, {report['seconds']}s")
+    return report
+
 # Initialisierung der Daten
+# Läuft über init_persistence_once() unter file_lock('init_persistence'), damit sich Worker beim
+# Kopieren, rmtree und Symlink nicht in die Quere kommen.
 def init_persistence():
     print("Starte init_persistence...")
+    sync_reports = []
     # 1. Ordner erstellen
     if not os.path.exists(BASE_DATA_DIR):
         try:
@@ -133,7 +1299,7 @@ def init_persistence():
             print(f"Fehler beim Erstellen von {BASE_DATA_DIR}: {e}")
 
     # 2. Upload & Results Ordner im Persistenten Bereich erstellen
-    for folder in [UPLOAD_FOLDER, RESULTS_FOLDER]:
+    for folder in [UPLOAD_FOLDER, RESULTS_FOLDER] + ([RESULT_ARCHIVE_FOLDER] if RESULT_COMPACT_ENABLED else []):
         if not os.path.exists(folder):
             try:
                 os.makedirs(folder)
@@ -148,14 +1314,13 @@ def init_persistence():
             if os.path.islink(LOCAL_STATIC_UPLOADS):
                 print("Symlink uploads existiert bereits.")
             elif os.path.exists(LOCAL_STATIC_UPLOADS):
-                print("Kopiere bestehende Uploads ins Volume...")
-                for item in os.listdir(LOCAL_STATIC_UPLOADS):
-                    s = os.path.join(LOCAL_STATIC_UPLOADS, item)
-                    d = os.path.join(UPLOAD_FOLDER, item)
-                    if os.path.isfile(s):
-                        shutil.copy2(s, d)
-                shutil.rmtree(LOCAL_STATIC_UPLOADS)
-                print("Lokaler Upload Ordner bereinigt.")
+                print("Synchronisiere bestehende Uploads ins Volume...")
+                report = sync_directory(LOCAL_STATIC_UPLOADS, UPLOAD_FOLDER, 'uploads')
+                sync_reports.append(report)
+                # Lokalen Ordner nur entfernen, wenn alles angekommen ist
+                if not report['errors']:
+                    shutil.rmtree(LOCAL_STATIC_UPLOADS)
+                    print("Lokaler Upload Ordner bereinigt.")
             
             if not os.path.exists(LOCAL_STATIC_UPLOADS) and not os.path.islink(LOCAL_STATIC_UPLOADS):
                 os.symlink(UPLOAD_FOLDER, LOCAL_STATIC_UPLOADS)
@@ -169,14 +1334,18 @@ def init_persistence():
             if os.path.islink(LOCAL_STATIC_RESULTS):
                 print("Symlink results existiert bereits.")
             elif os.path.exists(LOCAL_STATIC_RESULTS):
-                print("Kopiere bestehende Results ins Volume...")
-                for item in os.listdir(LOCAL_STATIC_RESULTS):
-                    s = os.path.join(LOCAL_STATIC_RESULTS, item)
-                    d = os.path.join(RESULTS_FOLDER, item)
-                    if os.path.isfile(s):
-                        shutil.copy2(s, d)
-                shutil.rmtree(LOCAL_STATIC_RESULTS)
-                print("Lokaler Results Ordner bereinigt.")
+                print("Synchronisiere bestehende Results ins Volume...")
+                report = sync_directory(LOCAL_STATIC_RESULTS, RESULTS_FOLDER, 'results',
+                                        unchanged=result_sync_unchanged)
+                sync_reports.append(report)
+                if report['copied']:
+                    bump_generation('results')
+                    # Aus dem Repo kommen Originale - wieder ins Archiv + Projektion aufteilen
+                    compact_results()
+                # Lokalen Ordner nur entfernen, wenn alles angekommen ist
+                if not report['errors']:
+                    shutil.rmtree(LOCAL_STATIC_RESULTS)
+                    print("Lokaler Results Ordner bereinigt.")
             
             if not os.path.exists(LOCAL_STATIC_RESULTS) and not os.path.islink(LOCAL_STATIC_RESULTS):
                 os.symlink(RESULTS_FOLDER, LOCAL_STATIC_RESULTS)
@@ -204,9 +1373,34 @@ def init_persistence():
         except Exception as e:
             print(f"Fehler bei Datei {filename}: {e}")
 
+    if sync_reports:
+        try:
+            with open(VOLUME_SYNC_REPORT_FILE, 'w') as f:
+                json.dump({"date": datetime.now().isoformat(), "directories": sync_reports}, f, indent=4)
+        except OSError as e:
+            print(f"Sync-Report konnte nicht gespeichert werden: {e}")
+
     print("init_persistence abgeschlossen.")
 
-init_persistence()
+def persistence_marker_path():
+    # Marker im Container-/tmp: gilt für alle Worker dieses Containers, ein neuer Deploy startet ohne Marker.
+    # Lokal ohne Deployment-ID zählt der Stand von app.py als "Deploy".
+    deployment = os.environ.get('RAILWAY_DEPLOYMENT_ID') or str(os.stat(os.path.abspath(__file__)).st_mtime_ns)
+    key = hashlib.sha1(f"{BASE_DATA_DIR}|{deployment}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"rdf-persistence-{key}.done")
+
+def init_persistence_once():
+    marker = persistence_marker_path()
+    if os.path.exists(marker):
+        return False
+    with file_lock('init_persistence'):
+        # Nochmal prüfen: ein anderer Worker kann gerade fertig geworden sein
+        if os.path.exists(marker):
+            return False
+        init_persistence()
+        with open(marker, 'w') as f:
+            f.write(datetime.now().isoformat())
+    return True
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
@@ -217,61 +1411,79 @@ IRACING_PASSWORD = os.getenv('IRACING_PASSWORD', '')
 
 # --- Hilfsfunktionen ---
 
+@store_cached('messages')
 def load_messages():
     if not os.path.exists(MESSAGES_FILE):
         return []
     try:
+        note_file_read('store_loads', MESSAGES_FILE)
         with open(MESSAGES_FILE, 'r') as f:
             return json.load(f)
     except:
         return []
 
 def save_messages(data):
+    metric_inc('store_saves')
     with open(MESSAGES_FILE, 'w') as f:
         json.dump(data, f, indent=4)
+    bump_generation('messages')
 
+@store_cached('liveries')
 def load_liveries():
     if not os.path.exists(LIVERIES_FILE):
         return []
     try:
+        note_file_read('store_loads', LIVERIES_FILE)
         with open(LIVERIES_FILE, 'r') as f:
             return json.load(f)
     except:
         return []
 
 def save_liveries(data):
+    metric_inc('store_saves')
     with open(LIVERIES_FILE, 'w') as f:
         json.dump(data, f, indent=4)
+    bump_generation('liveries')
 
+@store_cached('setups')
 def load_setups():
     if not os.path.exists(SETUPS_FILE):
         return []
     try:
+        note_file_read('store_loads', SETUPS_FILE)
         with open(SETUPS_FILE, 'r') as f:
             return json.load(f)
     except:
         return []
 
 def save_setups(data):
+    metric_inc('store_saves')
     with open(SETUPS_FILE, 'w') as f:
         json.dump(data, f, indent=4)
+    bump_generation('setups')
 
+@store_cached('applications')
 def load_applications():
     if not os.path.exists(APPLICATIONS_FILE):
         return []
     try:
+        note_file_read('store_loads', APPLICATIONS_FILE)
         with open(APPLICATIONS_FILE, 'r') as f:
             return json.load(f)
     except:
         return []
 
 def save_applications(data):
+    metric_inc('store_saves')
     with open(APPLICATIONS_FILE, 'w') as f:
         json.dump(data, f, indent=4)
+    bump_generation('applications')
 
+@store_cached('events')
 def load_events():
     if not os.path.exists(EVENTS_FILE):
         return []
+    note_file_read('store_loads', EVENTS_FILE)
     with open(EVENTS_FILE, 'r') as f:
         try:
             events = json.load(f)
@@ -282,12 +1494,16 @@ def load_events():
             return []
 
 def save_events(events):
+    metric_inc('store_saves')
     with open(EVENTS_FILE, 'w') as f:
         json.dump(events, f, indent=4)
+    bump_generation('events')
 
+@store_cached('news')
 def load_news():
     if not os.path.exists(NEWS_FILE):
         return []
+    note_file_read('store_loads', NEWS_FILE)
     with open(NEWS_FILE, 'r') as f:
         try:
             news = json.load(f)
@@ -299,40 +1515,49 @@ def load_news():
             return []
 
 def save_news(news):
+    metric_inc('store_saves')
     with open(NEWS_FILE, 'w') as f:
         json.dump(news, f, indent=4)
+    bump_generation('news')
+
+@shared_data('event_timeline', deps=('events',))
+def build_event_timeline():
+    # Events nach Datum mit vorberechnetem Live-Fenster (Start bis Ende + 2h Puffer)
+    timeline = []
+    for event in load_events():
+        start_time = end_time = None
+        if event.get('date'):
+            try:
+                start_time = datetime.fromisoformat(event['date'])
+                duration_hours = float(event.get('duration', 1)) # Default 1h
+                end_time = start_time + timedelta(hours=duration_hours + 2) # +2h Puffer
+            except ValueError:
+                pass
+        timeline.append({"event": event, "start": start_time, "end": end_time})
+    return timeline
 
 def get_next_event():
-    events = load_events()
+    timeline = get_shared('event_timeline')
     now = datetime.now()
     now_iso = now.isoformat()
     
     # 1. Prüfen ob ein Event GERADE läuft (Start <= Jetzt < Ende + 2h Puffer)
-    for event in events:
-        if not event.get('date'): continue
-        
-        try:
-            start_time = datetime.fromisoformat(event['date'])
-            duration_hours = float(event.get('duration', 1)) # Default 1h
-            end_time = start_time + timedelta(hours=duration_hours + 2) # +2h Puffer
-            
-            if start_time <= now < end_time:
-                event['is_live'] = True # Markierung für Frontend
-                return event
-        except ValueError:
-            continue
-
-    # 2. Wenn keins läuft, nimm das nächste zukünftige
-    # Filtere Events, die in der Zukunft liegen (Start > Jetzt)
-    future_events = [e for e in events if e.get('date') > now_iso]
-    
-    if future_events:
-        return future_events[0] # Das nächste Event
+    for entry in timeline:
+        if entry['start'] and entry['start'] <= now < entry['end']:
+            return dict(entry['event'], is_live=True) # Markierung für Frontend
+
+    # 2. Wenn keins läuft, nimm das nächste zukünftige (Start > Jetzt)
+    for entry in timeline:
+        if (entry['event'].get('date') or '') > now_iso:
+            return dict(entry['event']) # Das nächste Event
     return None # Keine Events geplant
 
+@store_cached('cars')
+@shared_data('cars', deps=('cars',))
 def load_cars():
     if not os.path.exists(CARS_FILE):
         return {}
+    note_file_read('store_loads', CARS_FILE)
     with open(CARS_FILE, 'r') as f:
         try:
             return json.load(f)
@@ -343,9 +1568,11 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@store_cached('config')
 def load_config():
     if not os.path.exists(CONFIG_FILE):
         return {} # Fallback, sollte nicht passieren
+    note_file_read('store_loads', CONFIG_FILE)
     with open(CONFIG_FILE, 'r') as f:
         try:
             return json.load(f)
@@ -353,8 +1580,10 @@ def load_config():
             return {}
 
 def save_config(config):
+    metric_inc('store_saves')
     with open(CONFIG_FILE, 'w') as f:
         json.dump(config, f, indent=4)
+    bump_generation('config')
 
 # Context Processor: Macht 'config' in allen Templates verfügbar
 @app.context_processor
@@ -380,9 +1609,11 @@ def driver_login_required(f):
 
 # ... (Rest der Funktionen load_drivers, get_client etc. bleiben gleich)
 
+@store_cached('drivers')
 def load_drivers():
     if not os.path.exists(DRIVERS_FILE):
         return []
+    note_file_read('store_loads', DRIVERS_FILE)
     with open(DRIVERS_FILE, 'r') as f:
         try:
             return json.load(f)
@@ -390,44 +1621,1634 @@ def load_drivers():
             return []
 
 def save_drivers(drivers):
+    metric_inc('store_saves')
     with open(DRIVERS_FILE, 'w') as f:
         json.dump(drivers, f, indent=4)
+    bump_generation('drivers')
+
+@contextmanager
+def file_lock(name):
+    # Exklusiver Lock über alle Gunicorn Worker hinweg (flock auf locks/<name>.lock)
+    os.makedirs(LOCKS_FOLDER, exist_ok=True)
+    with open(os.path.join(LOCKS_FOLDER, f"{name}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# --- Request Metriken ---
+# Jeder Request zählt in g.metrics mit (Store-Loads/Saves, gelesene Bytes, geparste Ergebnisdateien,
+# iRacing API Calls, Template-Renderzeit). Pro Worker wird im Speicher aggregiert und alle
+# METRICS_FLUSH_SECONDS als Stunden-Buckets in metrics.sqlite addiert (geteilt über alle Worker).
+# Die Stunden-Buckets (Admin-Seite) werden nach METRICS_RETENTION_DAYS gelöscht; /metrics liest die
+# Summen aus request_totals, die nie gekürzt werden, damit Prometheus-Counter nur wachsen.
+METRICS_DB = os.path.join(BASE_DATA_DIR, 'metrics.sqlite')
+METRICS_FLUSH_SECONDS = int(os.environ.get('METRICS_FLUSH_SECONDS', '30'))
+METRICS_RETENTION_DAYS = int(os.environ.get('METRICS_RETENTION_DAYS', '7'))
+# Ohne METRICS_TOKEN ist /metrics nur mit Admin-Session erreichbar
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRIC_COUNTERS = ('store_loads', 'store_saves', 'bytes_read', 'result_files', 'iracing_calls', 'render_ms')
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_metrics_lock = threading.Lock()
+_metrics_pending = {}
+_metrics_last_flush = time.time()
+
+def metric_inc(name, amount=1):
+    # Außerhalb eines Requests (CLI, Threads) wird nichts gezählt
+    if has_request_context() and 'metrics' in g:
+        g.metrics[name] += amount
+
+def note_file_read(counter, path):
+    metric_inc(counter)
+    try:
+        metric_inc('bytes_read', os.path.getsize(path))
+    except OSError:
+        pass
 
-# --- Daten-Migration (Quick Fix) ---
-def run_migrations():
-    print("Starte Daten-Migration...")
+def _bucket_columns():
+    return [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ['le_inf']
+
+def _metrics_db():
+    conn = sqlite3.connect(METRICS_DB, timeout=5)
+    columns = ', '.join(f"{c} INTEGER DEFAULT 0" for c in ('count',) + METRIC_COUNTERS + tuple(_bucket_columns()))
+    conn.execute(f"CREATE TABLE IF NOT EXISTS request_metrics (hour TEXT, endpoint TEXT, sum_ms REAL DEFAULT 0, "
+                 f"max_ms REAL DEFAULT 0, {columns}, PRIMARY KEY (hour, endpoint))")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS request_totals (endpoint TEXT PRIMARY KEY, sum_ms REAL DEFAULT 0, "
+                 f"{columns})")
+    return conn
+
+def record_request_metrics(endpoint, duration_ms, counters):
+    hour = datetime.now().strftime('%Y-%m-%d %H:00')
+    with _metrics_lock:
+        row = _metrics_pending.setdefault((hour, endpoint), {
+            'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            **{name: 0 for name in METRIC_COUNTERS}})
+        row['count'] += 1
+        row['sum_ms'] += duration_ms
+        row['max_ms'] = max(row['max_ms'], duration_ms)
+        index = next((i for i, b in enumerate(LATENCY_BUCKETS_MS) if duration_ms <= b), len(LATENCY_BUCKETS_MS))
+        row['buckets'][index] += 1
+        for name in METRIC_COUNTERS:
+            row[name] += counters.get(name, 0)
+
+def flush_metrics():
+    global _metrics_last_flush
+    with _metrics_lock:
+        pending = dict(_metrics_pending)
+        _metrics_pending.clear()
+        _metrics_last_flush = time.time()
+    if not pending:
+        return
+    bucket_cols = _bucket_columns()
+    columns = ['hour', 'endpoint', 'count', 'sum_ms'] + list(METRIC_COUNTERS) + bucket_cols
+    updates = ', '.join(f"{c} = {c} + excluded.{c}" for c in columns[2:])
+    sql = (f"INSERT INTO request_metrics ({', '.join(columns)}, max_ms) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+           f"ON CONFLICT(hour, endpoint) DO UPDATE SET {updates}, max_ms = MAX(max_ms, excluded.max_ms)")
+    totals_sql = (f"INSERT INTO request_totals ({', '.join(columns[1:])}) VALUES ({', '.join('?' * (len(columns) - 1))}) "
+                  f"ON CONFLICT(endpoint) DO UPDATE SET {updates}")
     try:
-        events = load_events()
-        changed = False
-        
-        # 1. IEC Imola
-        imola = next((e for e in events if str(e.get('id')) == "1771600365"), None)
-        if imola:
-            if not imola.get('result_file'):
-                print("Migriere IEC Imola Event...")
-                imola['result_file'] = "iec_imola_result.json"
-                imola['result'] = "P8"
-                imola['title'] = "IEC Ligarennen 6"
-                changed = True
-        
-        # 2. Daytona
-        daytona = next((e for e in events if str(e.get('id')) == "1"), None)
-        if daytona:
-            if not daytona.get('result_file'):
-                print("Migriere Daytona Event...")
-                daytona['result_file'] = "daytona24_result.json"
-                changed = True
-                
-        if changed:
-            save_events(events)
-            print("Migration gespeichert.")
-        else:
-            print("Keine Migration notwendig.")
+        conn = _metrics_db()
+        with conn:
+            for (hour, endpoint), row in pending.items():
+                values = [row['count'], row['sum_ms']] + [row[name] for name in METRIC_COUNTERS] + row['buckets']
+                conn.execute(sql, [hour, endpoint] + values + [row['max_ms']])
+                conn.execute(totals_sql, [endpoint] + values)
+            cutoff = (datetime.now() - timedelta(days=METRICS_RETENTION_DAYS)).strftime('%Y-%m-%d %H:00')
+            conn.execute("DELETE FROM request_metrics WHERE hour < ?", (cutoff,))
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Metriken konnten nicht gespeichert werden: {e}")
+
+def load_metrics(hours=24):
+    flush_metrics()
+    cutoff = (datetime.now() - timedelta(hours=hours)).strftime('%Y-%m-%d %H:00')
+    try:
+        conn = _metrics_db()
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM request_metrics WHERE hour >= ?", (cutoff,)).fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Metriken konnten nicht gelesen werden: {e}")
+        return []
+
+    routes = {}
+    for r in rows:
+        route = routes.setdefault(r['endpoint'], {'endpoint': r['endpoint'], 'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0,
+                                                  'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                                                  **{name: 0 for name in METRIC_COUNTERS}})
+        route['count'] += r['count']
+        route['sum_ms'] += r['sum_ms']
+        route['max_ms'] = max(route['max_ms'], r['max_ms'])
+        for i, col in enumerate(_bucket_columns()):
+            route['buckets'][i] += r[col]
+        for name in METRIC_COUNTERS:
+            route[name] += r[name]
+
+    for route in routes.values():
+        count = max(route['count'], 1)
+        route['avg_ms'] = route['sum_ms'] / count
+        route['p50_ms'] = _bucket_quantile(route['buckets'], 0.5)
+        route['p95_ms'] = _bucket_quantile(route['buckets'], 0.95)
+        route['p99_ms'] = _bucket_quantile(route['buckets'], 0.99)
+        for name in METRIC_COUNTERS:
+            route[f"avg_{name}"] = route[name] / count
+    return sorted(routes.values(), key=lambda r: r['sum_ms'], reverse=True)
+
+def load_metric_totals():
+    """Summen pro Endpoint seit Anlegen der Datenbank (monoton, für /metrics)."""
+    flush_metrics()
+    try:
+        conn = _metrics_db()
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM request_totals ORDER BY endpoint").fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Metriken konnten nicht gelesen werden: {e}")
+        return []
+    return [dict(r, buckets=[r[col] for col in _bucket_columns()]) for r in rows]
+
+def _bucket_quantile(buckets, q):
+    # Obergrenze des Buckets, in dem das Quantil liegt (wie histogram_quantile, ohne Interpolation)
+    total = sum(buckets)
+    if not total:
+        return 0
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= q * total:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float('inf')
+    return float('inf')
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.metrics = dict.fromkeys(METRIC_COUNTERS, 0)
+    g.render_started = []
+
+@app.after_request
+def finish_request_metrics(response):
+    if 'metrics' in g and not request.environ.get(WARMUP_ENVIRON_KEY):
+        duration_ms = (time.perf_counter() - g.request_started) * 1000
+        record_request_metrics(request.endpoint or 'not_found', duration_ms, g.metrics)
+        if time.time() - _metrics_last_flush > METRICS_FLUSH_SECONDS:
+            flush_metrics()
+    return response
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    if 'render_started' in g:
+        g.render_started.append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    if g.get('render_started'):
+        metric_inc('render_ms', (time.perf_counter() - g.render_started.pop()) * 1000)
+
+atexit.register(flush_metrics)
+
+# --- Profiling auf Abruf ---
+# Admins hängen ?_profile=1 (oder Header X-Profile: 1) an eine beliebige URL. Nur dieser Request läuft
+# mit sys.setprofile; Ergebnis ist ein Call-Tree (JSON) und ein Folded-Stack-Dump für flamegraph.pl /
+# speedscope unter profiles/. Ohne Flag kostet das nur die Prüfung im before_request.
+PROFILES_FOLDER = os.path.join(BASE_DATA_DIR, 'profiles')
+PROFILES_KEEP = int(os.environ.get('PROFILES_KEEP', '50'))
+PROFILE_MIN_SHARE = 0.002 # Knoten unter 0,2% der Gesamtzeit landen nicht im gespeicherten Baum
+
+class RequestProfiler:
+    def __init__(self):
+        self.stack = []
+        self.totals = {}
+        self.started = None
+        self.duration = 0
+
+    def _trace(self, frame, event, arg):
+        if event == 'call':
+            code = frame.f_code
+            self.stack.append((f"{frame.f_globals.get('__name__', '?')}:{code.co_name}:{code.co_firstlineno}", time.perf_counter()))
+        elif event == 'c_call':
+            self.stack.append((f"<{getattr(arg, '__qualname__', repr(arg))}>", time.perf_counter()))
+        elif event in ('return', 'c_return', 'c_exception') and self.stack:
+            now = time.perf_counter()
+            path = tuple(name for name, _ in self.stack)
+            _, start = self.stack.pop()
+            self.totals[path] = self.totals.get(path, 0.0) + (now - start)
+
+    def start(self):
+        self.started = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def stop(self):
+        sys.setprofile(None)
+        self.duration = time.perf_counter() - self.started
+        # Frames, die beim Stop noch offen sind (View -> after_request), bis jetzt abschließen
+        now = time.perf_counter()
+        while self.stack:
+            path = tuple(name for name, _ in self.stack)
+            _, start = self.stack.pop()
+            self.totals[path] = self.totals.get(path, 0.0) + (now - start)
+
+    def folded(self):
+        # Self-Time = eigene Zeit minus Zeit der direkten Kinder (Mikrosekunden, Format "a;b;c 123")
+        child_time = {}
+        for path, seconds in self.totals.items():
+            if len(path) > 1:
+                child_time[path[:-1]] = child_time.get(path[:-1], 0.0) + seconds
+        lines = []
+        for path, seconds in self.totals.items():
+            self_us = int((seconds - child_time.get(path, 0.0)) * 1_000_000)
+            if self_us > 0:
+                lines.append(f"{';'.join(path)} {self_us}")
+        return "\n".join(sorted(lines)) + "\n"
+
+    def tree(self):
+        root = {'name': 'request', 'ms': self.duration * 1000, 'children': {}}
+        for path, seconds in sorted(self.totals.items(), key=lambda item: len(item[0])):
+            if seconds < self.duration * PROFILE_MIN_SHARE:
+                continue
+            node = root
+            for name in path[:-1]:
+                node = node['children'].get(name)
+                if node is None:
+                    break
+            else:
+                node['children'][path[-1]] = {'name': path[-1], 'ms': seconds * 1000, 'children': {}}
+
+        def to_list(node):
+            children = sorted(node['children'].values(), key=lambda c: c['ms'], reverse=True)
+            return {'name': node['name'], 'ms': round(node['ms'], 3), 'children': [to_list(c) for c in children]}
+        return to_list(root)
+
+def profiling_requested():
+    flag = request.args.get('_profile') or request.headers.get('X-Profile')
+    return flag in ('1', 'true') and 'admin_logged_in' in session
+
+def save_profile(profiler):
+    os.makedirs(PROFILES_FOLDER, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{secure_filename(request.endpoint or 'unknown')}_{uuid.uuid4().hex[:6]}"
+    with open(os.path.join(PROFILES_FOLDER, f"{name}.folded"), 'w') as f:
+        f.write(profiler.folded())
+    with open(os.path.join(PROFILES_FOLDER, f"{name}.json"), 'w') as f:
+        json.dump({
+            "name": name,
+            "path": request.full_path.rstrip('?'),
+            "endpoint": request.endpoint,
+            "date": datetime.now().isoformat(),
+            "duration_ms": round(profiler.duration * 1000, 2),
+            "tree": profiler.tree()
+        }, f)
+
+    profiles = sorted(f for f in os.listdir(PROFILES_FOLDER) if f.endswith('.json'))
+    for old in profiles[:-PROFILES_KEEP]:
+        for ext in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILES_FOLDER, old[:-5] + ext))
+            except OSError:
+                pass
+    return name
+
+def load_profiles():
+    if not os.path.exists(PROFILES_FOLDER):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(PROFILES_FOLDER), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(PROFILES_FOLDER, filename), 'r') as f:
+                data = json.load(f)
+            data.pop('tree', None)
+            profiles.append(data)
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+@app.before_request
+def start_profiling():
+    if profiling_requested():
+        g.profiler = RequestProfiler()
+        g.profiler.start()
+
+@app.after_request
+def finish_profiling(response):
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.stop()
+        try:
+            response.headers['X-Profile-Name'] = save_profile(profiler)
+        except OSError as e:
+            print(f"Profil konnte nicht gespeichert werden: {e}")
+    return response
+
+@app.teardown_request
+def stop_profiling(exc):
+    # Bei Exceptions läuft after_request nicht -> Profiler trotzdem abschalten
+    if g.pop('profiler', None):
+        sys.setprofile(None)
+
+# --- Upload Blob Store (Content-Addressed) ---
+# Uploads werden unter ihrem SHA-256 gespeichert (uploads/blobs/<sha>.<ext>). Identische Dateien
+# liegen nur einmal auf der Platte. blobs.json zählt die Referenzen ("livery:<id>", "driver:<id>", ...),
+# eine Datei wird erst gelöscht, wenn nichts mehr auf sie zeigt.
+BLOB_SUBFOLDER = 'blobs'
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+@store_cached('blobs')
+def load_blobs():
+    if not os.path.exists(BLOBS_FILE):
+        return {}
+    try:
+        note_file_read('store_loads', BLOBS_FILE)
+        with open(BLOBS_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_blobs(data):
+    metric_inc('store_saves')
+    with open(BLOBS_FILE, 'w') as f:
+        json.dump(data, f, indent=4)
+    bump_generation('blobs')
+
+# --- Streaming Uploads ---
+# Datei-Parts aus multipart/form-data werden nicht mehr von Werkzeug gespoolt und dann per
+# file.save() kopiert, sondern direkt in Chunks auf das Volume geschrieben (incoming/) und dabei
+# gehasht. Pro Route gibt es eine Größenbegrenzung und eine Liste erlaubter Dateitypen, die geprüft
+# wird, bevor der Inhalt der Datei gelesen wird.
+IMAGE_EXTENSIONS = ALLOWED_EXTENSIONS
+LIVERY_EXTENSIONS = {'tga', 'mip', 'psd', 'dds', 'png', 'jpg', 'jpeg', 'zip'}
+SETUP_EXTENSIONS = {'sto', 'htm', 'html', 'zip'}
+MB = 1024 * 1024
+
+# endpoint -> (max. Request-Größe in Bytes, erlaubte Endungen oder None für alle)
+UPLOAD_LIMITS = {
+    'upload_livery': (100 * MB, LIVERY_EXTENSIONS),
+    'upload_setup': (20 * MB, SETUP_EXTENSIONS),
+    'save_rig': (40 * MB, IMAGE_EXTENSIONS),
+    'save_profil': (16 * MB, IMAGE_EXTENSIONS),
+    'admin_driver_save': (16 * MB, IMAGE_EXTENSIONS),
+    'admin_event_save': (16 * MB, IMAGE_EXTENSIONS),
+    'admin_news_save': (16 * MB, IMAGE_EXTENSIONS),
+    'admin_settings_save': (16 * MB, IMAGE_EXTENSIONS),
+    'update_hero': (16 * MB, IMAGE_EXTENSIONS),
+    'admin_results_upload': (50 * MB, {'json'}),
+    'admin_results_laps': (100 * MB, {'json'}),
+}
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16 * MB))
+
+# Letzte Uploads für die Durchsatz-Statistik
+UPLOAD_STATS = deque(maxlen=200)
+# Summen pro Endpoint seit Prozessstart: [Bytes, Sekunden]
+UPLOAD_TOTALS = {}
+
+class StreamingUpload:
+    """Ziel für einen Datei-Part: schreibt direkt nach incoming/ und berechnet dabei den SHA-256."""
+    def __init__(self, endpoint, filename):
+        os.makedirs(UPLOAD_INCOMING_FOLDER, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=UPLOAD_INCOMING_FOLDER, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self.endpoint = endpoint
+        self.filename = filename
+        self.size = 0
+        self._started = time.perf_counter()
+        self._finished = False
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def seek(self, offset, whence=0):
+        # Werkzeug spult nach dem letzten Chunk zurück -> Upload ist vollständig
+        if not self._finished:
+            self._finish()
+        return self._file.seek(offset, whence)
+
+    def _finish(self):
+        self._finished = True
+        self._file.flush()
+        seconds = max(time.perf_counter() - self._started, 1e-6)
+        UPLOAD_STATS.append({
+            "endpoint": self.endpoint,
+            "filename": self.filename,
+            "bytes": self.size,
+            "seconds": round(seconds, 4),
+            "mb_per_s": round(self.size / MB / seconds, 2),
+            "date": datetime.now().isoformat()
+        })
+        totals = UPLOAD_TOTALS.setdefault(self.endpoint, [0, 0.0])
+        totals[0] += self.size
+        totals[1] += seconds
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def move_to(self, target):
+        self._file.flush()
+        os.replace(self.path, target)
+        self.path = None
+
+    def close(self):
+        self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        # read, tell, flush, readable, ... an die echte Datei weiterreichen
+        return getattr(self._file, name)
+
+class UploadRequest(Request):
+    @property
+    def max_content_length(self):
+        limit = UPLOAD_LIMITS.get(self.endpoint)
+        if limit:
+            return limit[0]
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        
+        limit = UPLOAD_LIMITS.get(self.endpoint)
+        if limit:
+            max_size, extensions = limit
+            ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+            # Abbrechen bevor der Datei-Inhalt gelesen wird
+            if extensions is not None and ext not in extensions:
+                raise UnsupportedMediaType(f"Dateityp .{ext or '?'} ist hier nicht erlaubt.")
+            if content_length and content_length > max_size:
+                raise RequestEntityTooLarge()
+        return StreamingUpload(self.endpoint, filename)
+
+app.request_class = UploadRequest
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = request.max_content_length or 0
+    flash(f"Datei zu groß (max. {limit // MB} MB).", "error")
+    return redirect(request.referrer or url_for('index'))
+
+@app.errorhandler(UnsupportedMediaType)
+def upload_wrong_type(e):
+    flash(e.description, "error")
+    return redirect(request.referrer or url_for('index'))
+
+def save_upload_to(file, filepath):
+    # Gestreamte Uploads liegen schon auf dem Volume -> umbenennen statt kopieren
+    if isinstance(file.stream, StreamingUpload):
+        try:
+            file.stream.move_to(filepath)
+            return
+        except OSError:
+            file.stream.seek(0)
+    file.save(filepath)
+
+def upload_url(rel_path):
+    return url_for('static', filename=f'uploads/{rel_path}')
+
+def upload_rel_path(url):
+    # /static/uploads/blobs/abc.png -> blobs/abc.png
+    if not url:
+        return None
+    marker = '/uploads/'
+    if marker in url:
+        return url.split(marker, 1)[1]
+    # Bereits relativ (z.B. stored_filename bei Setups)
+    return url
+
+def store_upload(file, ref):
+    """Speichert einen Upload content-addressed und gibt den Pfad relativ zu UPLOAD_FOLDER zurück."""
+    ext = secure_filename(file.filename.rsplit('.', 1)[1].lower()) if '.' in file.filename else ''
+    ext = ext or 'bin'
+    streamed = isinstance(file.stream, StreamingUpload)
+    
+    # 1. Hash: bei StreamingUpload schon beim Empfang berechnet, sonst in Chunks nachholen
+    if streamed:
+        sha = file.stream.hexdigest()
+        size = file.stream.size
+    else:
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+        sha = digest.hexdigest()
+    
+    blob_folder = os.path.join(app.config['UPLOAD_FOLDER'], BLOB_SUBFOLDER)
+    os.makedirs(blob_folder, exist_ok=True)
+    
+    with file_lock('blobs'):
+        blobs = load_blobs()
+        entry = blobs.get(sha)
+        
+        # 2. Nur schreiben, wenn der Inhalt noch nicht existiert (Dublette = kein Schreibzugriff)
+        if not entry or not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], entry['file'])):
+            rel_path = f"{BLOB_SUBFOLDER}/{sha}.{ext}"
+            if streamed:
+                # Liegt schon komplett auf dem Volume -> nur umbenennen
+                file.stream.move_to(os.path.join(app.config['UPLOAD_FOLDER'], rel_path))
+            else:
+                tmp_path = os.path.join(blob_folder, f".{sha}.{uuid.uuid4().hex}.tmp")
+                file.stream.seek(0)
+                try:
+                    with open(tmp_path, 'wb') as out:
+                        shutil.copyfileobj(file.stream, out, UPLOAD_CHUNK_SIZE)
+                    os.replace(tmp_path, os.path.join(app.config['UPLOAD_FOLDER'], rel_path))
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            entry = {
+                "file": rel_path,
+                "size": size,
+                "refs": (entry or {}).get('refs', []),
+                "created": datetime.now().isoformat()
+            }
+        
+        entry['refs'].append(ref)
+        blobs[sha] = entry
+        save_blobs(blobs)
+    
+    return entry['file']
+
+def release_upload(url, ref, delete_legacy=False):
+    """Entfernt eine Referenz. Blobs ohne Referenz werden gelöscht.
+    Alte Uploads (vor dem Blob Store) werden nur bei delete_legacy=True entfernt."""
+    rel_path = upload_rel_path(url)
+    if not rel_path:
+        return False
+    
+    if not rel_path.startswith(f"{BLOB_SUBFOLDER}/"):
+        if delete_legacy:
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(rel_path))
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                return True
+        return False
+    
+    sha = rel_path.split('/', 1)[1].split('.', 1)[0]
+    with file_lock('blobs'):
+        blobs = load_blobs()
+        entry = blobs.get(sha)
+        if not entry:
+            return False
+        if ref in entry['refs']:
+            entry['refs'].remove(ref)
+        if entry['refs']:
+            save_blobs(blobs)
+            return False
+        
+        del blobs[sha]
+        save_blobs(blobs)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], entry['file'])
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return True
+
+def add_upload_ref(url, ref):
+    rel_path = upload_rel_path(url)
+    if not rel_path or not rel_path.startswith(f"{BLOB_SUBFOLDER}/"):
+        return
+    sha = rel_path.split('/', 1)[1].split('.', 1)[0]
+    with file_lock('blobs'):
+        blobs = load_blobs()
+        if sha in blobs:
+            blobs[sha]['refs'].append(ref)
+            save_blobs(blobs)
+
+# --- Upload Garbage Collector ---
+# Findet Dateien in UPLOAD_FOLDER, auf die kein Store mehr zeigt (z.B. alte Rig-Bilder, ersetzte
+# Liveries/Setups aus der Zeit vor dem Blob Store) und löscht bzw. verschiebt sie in die Quarantäne.
+UPLOAD_QUARANTINE_FOLDER = os.path.join(BASE_DATA_DIR, 'upload_quarantine')
+UPLOAD_GC_REPORT_FILE = os.path.join(BASE_DATA_DIR, 'upload_gc_report.json')
+UPLOAD_GC_GRACE_HOURS = float(os.getenv('UPLOAD_GC_GRACE_HOURS', '24'))
+UPLOAD_GC_INTERVAL_HOURS = float(os.getenv('UPLOAD_GC_INTERVAL_HOURS', '24')) # 0 = kein automatischer Lauf
+UPLOAD_QUARANTINE_DAYS = float(os.getenv('UPLOAD_QUARANTINE_DAYS', '14'))
+
+def _collect_upload_refs(value, refs):
+    if isinstance(value, dict):
+        for v in value.values():
+            _collect_upload_refs(v, refs)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_upload_refs(v, refs)
+    elif isinstance(value, str) and '/uploads/' in value:
+        refs.add(upload_rel_path(value))
+
+def collect_referenced_uploads():
+    # Ein Durchlauf über alle Stores, jede URL die auf /uploads/ zeigt zählt als Referenz
+    refs = set()
+    for data in (load_drivers(), load_events(), load_config(), load_news(), load_liveries(), load_messages()):
+        _collect_upload_refs(data, refs)
+    for setup in load_setups():
+        for file_info in setup.get('files', []):
+            if file_info.get('stored_filename'):
+                refs.add(file_info['stored_filename'])
+    return refs
+
+def load_upload_gc_report():
+    if not os.path.exists(UPLOAD_GC_REPORT_FILE):
+        return {}
+    try:
+        with open(UPLOAD_GC_REPORT_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_upload_gc_report(data):
+    with open(UPLOAD_GC_REPORT_FILE, 'w') as f:
+        json.dump(data, f, indent=4)
+
+def _collect_upload_garbage(grace_hours, quarantine, dry_run):
+    # Scan und Entfernen unter dem Blob-Lock: store_upload hängt eine Dublette an einen bestehenden Blob
+    # (alte mtime, die Schonfrist greift nicht), bevor der zugehörige Store gespeichert ist. Solche Blobs
+    # sind nur über ihre refs in blobs.json als benutzt erkennbar.
+    with file_lock('blobs'):
+        return _collect_upload_garbage_locked(grace_hours, quarantine, dry_run)
+
+def _collect_upload_garbage_locked(grace_hours, quarantine, dry_run):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    blobs = load_blobs()
+    referenced = collect_referenced_uploads()
+    referenced.update(entry['file'] for entry in blobs.values() if entry.get('refs') and entry.get('file'))
+    cutoff = time.time() - grace_hours * 3600
+    started = datetime.now()
+    quarantine_dir = os.path.join(UPLOAD_QUARANTINE_FOLDER, started.strftime('%Y%m%d-%H%M%S'))
+    
+    report = {
+        "date": started.isoformat(),
+        "dry_run": dry_run,
+        "quarantine": quarantine,
+        "grace_hours": grace_hours,
+        "scanned": 0,
+        "removed": 0,
+        "quarantined": 0,
+        "bytes_reclaimed": 0,
+        "bytes_quarantined": 0,
+        "quarantine_purged": 0,
+        "files": []
+    }
+    removed_blobs = set()
+    
+    for root, dirs, files in os.walk(upload_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, upload_folder).replace(os.sep, '/')
+            report['scanned'] += 1
+            if rel_path in referenced:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # Frische Dateien (Upload läuft noch / Store noch nicht gespeichert) nicht anfassen
+            if st.st_mtime > cutoff:
+                continue
             
+            if not dry_run:
+                try:
+                    if quarantine:
+                        target = os.path.join(quarantine_dir, rel_path)
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.move(path, target)
+                    else:
+                        os.remove(path)
+                except OSError as e:
+                    print(f"Upload GC: Fehler bei {rel_path}: {e}")
+                    continue
+            
+            if rel_path.startswith(f"{BLOB_SUBFOLDER}/"):
+                removed_blobs.add(rel_path)
+            report['removed'] += 1
+            # Quarantäne belegt weiter Platz - frei wird er erst beim Löschen des Laufs
+            if quarantine:
+                report['quarantined'] += 1
+                report['bytes_quarantined'] += st.st_size
+            else:
+                report['bytes_reclaimed'] += st.st_size
+            report['files'].append(rel_path)
+    
+    # Blob-Index an die Platte angleichen (nur referenzlose Einträge wurden entfernt)
+    if removed_blobs and not dry_run:
+        for sha in [sha for sha, entry in blobs.items() if entry.get('file') in removed_blobs]:
+            del blobs[sha]
+        save_blobs(blobs)
+    
+    # Alte Quarantäne-Läufe endgültig löschen
+    if not dry_run and os.path.exists(UPLOAD_QUARANTINE_FOLDER):
+        quarantine_cutoff = time.time() - UPLOAD_QUARANTINE_DAYS * 86400
+        for name in os.listdir(UPLOAD_QUARANTINE_FOLDER):
+            path = os.path.join(UPLOAD_QUARANTINE_FOLDER, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < quarantine_cutoff:
+                for root, dirs, files in os.walk(path):
+                    for filename in files:
+                        try:
+                            report['bytes_reclaimed'] += os.path.getsize(os.path.join(root, filename))
+                        except OSError:
+                            pass
+                shutil.rmtree(path, ignore_errors=True)
+                report['quarantine_purged'] += 1
+    
+    if not dry_run:
+        save_upload_gc_report(report)
+    print(f"Upload GC: {report['removed']} von {report['scanned']} Dateien entfernt "
+          f"({report['quarantined']} in Quarantäne, {report['bytes_quarantined'] / 1024 / 1024:.1f} MB), "
+          f"{report['bytes_reclaimed'] / 1024 / 1024:.1f} MB frei{' (Dry Run)' if dry_run else ''}.")
+    return report
+
+def collect_upload_garbage(grace_hours=None, quarantine=False, dry_run=False):
+    if grace_hours is None:
+        grace_hours = UPLOAD_GC_GRACE_HOURS
+    with file_lock('upload_gc'):
+        return _collect_upload_garbage(grace_hours, quarantine, dry_run)
+
+def run_scheduled_upload_gc():
+    # Jeder Worker hat diesen Thread, der Lock + Zeitstempel sorgen dafür, dass nur einer pro Intervall läuft
+    while True:
+        time.sleep(600)
+        try:
+            with file_lock('upload_gc'):
+                last_run = load_upload_gc_report().get('date')
+                if last_run and datetime.now() - datetime.fromisoformat(last_run) < timedelta(hours=UPLOAD_GC_INTERVAL_HOURS):
+                    continue
+                with app.app_context():
+                    _collect_upload_garbage(UPLOAD_GC_GRACE_HOURS, quarantine=True, dry_run=False)
+        except Exception as e:
+            print(f"Upload GC Fehler: {e}")
+
+_upload_gc_thread = None
+
+def start_upload_gc_scheduler():
+    global _upload_gc_thread
+    if UPLOAD_GC_INTERVAL_HOURS <= 0 or _upload_gc_thread is not None:
+        return
+    _upload_gc_thread = threading.Thread(target=run_scheduled_upload_gc, name='upload-gc', daemon=True)
+    _upload_gc_thread.start()
+
+# --- Cache Warmer ---
+# Nach dem Worker-Start und sobald sich relevante Daten ändern (Generationen von Events, Ergebnissen, ...),
+# ruft ein Hintergrund-Thread mit niedriger Priorität die wichtigsten öffentlichen Seiten intern auf: Startseite,
+# Team, Kalender, Ergebnisliste, nächstes Event, die WARM_RESULTS neuesten Ergebnisse und alle Fahrerseiten.
+# Das füllt Store-Cache, Ergebnis-Cache, Artefakte, geteilte Daten und kompilierte Templates, bevor der erste
+# Besucher kommt. /ready meldet den Stand dieses Workers.
+CACHE_WARMER_ENABLED = os.environ.get('CACHE_WARMER', '1') != '0'
+WARM_RESULTS = int(os.environ.get('WARM_RESULTS', '5'))
+WARMER_POLL_SECONDS = 5
+WARM_GENERATIONS = ('drivers', 'config', 'events', 'news', 'results', 'results_meta', 'standings')
+# Markierung der Warmer-Requests im WSGI-Environ (nicht per Header setzbar) - sie zählen nicht in den Metriken
+WARMUP_ENVIRON_KEY = 'rdf.warmup'
+WARMER_STATUS = {"state": "cold", "pages": 0, "errors": [], "started": None, "finished": None, "seconds": None}
+_warmer_thread = None
+
+def warm_pages():
+    pages = ['/', '/team', '/calendar', '/results', '/standings']
+    next_ev = get_next_event()
+    if next_ev:
+        pages.append(f"/event/{next_ev['id']}")
+    for res in get_shared('result_index')[:WARM_RESULTS]:
+        pages.append(f"/results/view/{res['filename']}")
+    for driver in load_drivers():
+        if driver.get('id'):
+            pages.append(f"/driver/{driver['id']}")
+    return pages
+
+def warm_caches():
+    started = time.perf_counter()
+    WARMER_STATUS.update(state="warming", started=datetime.now().isoformat(), errors=[])
+    try:
+        # Ergebnisdateien, die am Upload vorbei kamen (Volume Sync, manuell kopiert), in Statistik und Tabelle
+        refresh_result_aggregates()
     except Exception as e:
-        print(f"Fehler bei Migration: {e}")
+        WARMER_STATUS['errors'].append(f"result_aggregates: {e}")
+    client = app.test_client()
+    pages = 0
+    for path in warm_pages():
+        try:
+            resp = client.get(path, environ_overrides={WARMUP_ENVIRON_KEY: True})
+            resp.close()
+            if resp.status_code >= 500:
+                WARMER_STATUS['errors'].append(f"{path}: HTTP {resp.status_code}")
+            pages += 1
+        except Exception as e:
+            WARMER_STATUS['errors'].append(f"{path}: {e}")
+        time.sleep(0.02) # Zwischen den Seiten den GIL für echte Requests freigeben
+    seconds = round(time.perf_counter() - started, 2)
+    WARMER_STATUS.update(state="warm", pages=pages, finished=datetime.now().isoformat(), seconds=seconds)
+    print(f"Cache Warmer (pid {os.getpid()}): {pages} Seiten in {seconds}s, {len(WARMER_STATUS['errors'])} Fehler")
+
+def run_cache_warmer():
+    try:
+        # Unter Linux wirkt setpriority mit der Thread-ID nur auf diesen Thread
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+    seen = None
+    while True:
+        current = tuple(GENERATIONS.get(name) for name in WARM_GENERATIONS)
+        if current != seen:
+            seen = current
+            try:
+                warm_caches()
+            except Exception as e:
+                WARMER_STATUS.update(state="error", errors=[str(e)])
+                print(f"Cache Warmer Fehler: {e}")
+        time.sleep(WARMER_POLL_SECONDS)
+
+def start_cache_warmer():
+    global _warmer_thread
+    if not CACHE_WARMER_ENABLED or _warmer_thread is not None:
+        return
+    _warmer_thread = threading.Thread(target=run_cache_warmer, name='cache-warmer', daemon=True)
+    _warmer_thread.start()
+
+def start_background_jobs():
+    start_upload_gc_scheduler()
+    start_cache_warmer()
+
+@app.route('/ready')
+def readiness():
+    # Bereit, sobald dieser Worker einmal warm war (ein Nachwärmen nach Änderungen zählt weiter als bereit)
+    ready = not CACHE_WARMER_ENABLED or WARMER_STATUS['finished'] is not None
+    status = dict(WARMER_STATUS, ready=ready, pid=os.getpid(), warmer_enabled=CACHE_WARMER_ENABLED)
+    return status, 200 if ready else 503
+
+@app.before_request
+def ensure_background_jobs():
+    # Erst im Worker starten (nach dem Fork), nicht beim Import. Unter Gunicorn passiert das schon in
+    # post_worker_init, hier ist der Fallback für flask run / andere Server.
+    start_background_jobs()
+
+@app.cli.command('gc-uploads')
+@click.option('--grace-hours', type=float, default=None, help='Nur Dateien älter als X Stunden (Default: UPLOAD_GC_GRACE_HOURS).')
+@click.option('--quarantine', is_flag=True, help='Verschieben statt löschen.')
+@click.option('--dry-run', is_flag=True, help='Nur anzeigen, nichts ändern.')
+def gc_uploads_command(grace_hours, quarantine, dry_run):
+    """Entfernt nicht mehr referenzierte Dateien aus dem Upload-Ordner."""
+    report = collect_upload_garbage(grace_hours=grace_hours, quarantine=quarantine, dry_run=dry_run)
+    for rel_path in report['files']:
+        click.echo(rel_path)
+
+# --- Fahrer-Statistiken (Aggregate) ---
+# Karriere- und Saisonwerte pro Fahrer (iRacing cust_id), materialisiert in driver_stats.json.
+# Gespeichert werden nur Summen; jede Ergebnisdatei merkt sich ihren Beitrag pro Fahrer. Beim Hochladen,
+# Bearbeiten oder Entfernen einer Datei wird der alte Beitrag abgezogen und der neue addiert - es wird nie
+# über alle Ergebnisse neu gerechnet. Positionen zählen in der Klasse (Multi-Class).
+STAT_FIELDS = ('starts', 'wins', 'podiums', 'top5', 'start_count', 'sum_start', 'sum_finish',
+               'laps', 'incidents', 'irating_delta', 'irating_races')
+
+def result_season(data, file_meta):
+    # Saison: Liga-Saison, wenn iRacing eine liefert, sonst das Jahr; Serie aus den Metadaten oder der Datei
+    date = file_meta.get('date') or data.get('start_time') or ''
+    season = data.get('league_season_name') or (date[:4] if date[:4].isdigit() else 'Unbekannt')
+    series = file_meta.get('series') or data.get('series_name') or data.get('league_name') or 'Unbekannt'
+    return str(season), str(series)
+
+def result_contributions(filename, filepath):
+    """Beitrag einer Ergebnisdatei: {cust_id: {name, season, series, <STAT_FIELDS>}} aus der Rennsession."""
+    race_table, _ = load_session_tables(filepath)
+    if not race_table:
+        return {}
+    data, file_meta = load_result_head(filepath), load_results_meta().get(filename, {})
+    season, series = result_season(data, file_meta)
+    # Einzelwerte für den Ergebnis-Index (Fahrervergleich), werden nicht aufsummiert
+    event = {'date': file_meta.get('date') or data.get('start_time') or '',
+             'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
+             'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}"}
+    class_positions = (race_table.class_position + 1).tolist()
+    contributions = {}
+    for i, entry in enumerate(race_table.rows):
+        start = entry.get('starting_position_in_class', entry.get('starting_position'))
+        # Bei Team-Events zählt jeder Fahrer mit der Team-Platzierung, aber seinen eigenen Runden/Incidents
+        members = entry.get('driver_results') or [entry]
+        for member in members:
+            cust_id = member.get('cust_id')
+            if not cust_id:
+                continue
+            old_ir, new_ir = member.get('oldi_rating') or 0, member.get('newi_rating') or 0
+            contributions[str(cust_id)] = {
+                'name': member.get('display_name'), 'season': season, 'series': series,
+                'starts': 1, 'wins': int(class_positions[i] == 1), 'podiums': int(class_positions[i] <= 3),
+                'top5': int(class_positions[i] <= 5),
+                'start_count': int(start is not None and start >= 0), 'sum_start': start + 1 if start is not None and start >= 0 else 0,
+                'sum_finish': class_positions[i], 'laps': member.get('laps_complete') or 0,
+                'incidents': member.get('incidents') or 0,
+                'irating_delta': new_ir - old_ir if old_ir > 0 and new_ir > 0 else 0,
+                'irating_races': int(old_ir > 0 and new_ir > 0),
+                'filename': filename, 'date': event['date'], 'track': event['track'], 'title': event['title'],
+                'car': entry.get('car_name'), 'class_name': entry.get('car_class_short_name'),
+                'class_pos': class_positions[i], 'best_lap_time': member.get('best_lap_time') or 0,
+            }
+    return contributions
+
+def _apply_contribution(stats, cust_id, contribution, sign):
+    driver = stats['drivers'].setdefault(cust_id, {'name': contribution['name'], 'career': {}, 'seasons': {}})
+    if contribution.get('name'):
+        driver['name'] = contribution['name']
+    season_key = f"{contribution['season']}|{contribution['series']}"
+    season = driver['seasons'].setdefault(season_key, {'season': contribution['season'], 'series': contribution['series']})
+    for row in (driver['career'], season):
+        for field in STAT_FIELDS:
+            row[field] = row.get(field, 0) + sign * contribution[field]
+    if not season.get('starts'):
+        del driver['seasons'][season_key]
+    if not driver['career'].get('starts'):
+        del stats['drivers'][cust_id]
+
+@store_cached('driver_stats')
+def load_driver_stats():
+    if not os.path.exists(DRIVER_STATS_FILE):
+        return {"results": {}, "drivers": {}}
+    try:
+        note_file_read('store_loads', DRIVER_STATS_FILE)
+        with open(DRIVER_STATS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"results": {}, "drivers": {}}
+
+def save_driver_stats(data):
+    metric_inc('store_saves')
+    tmp_path = DRIVER_STATS_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, DRIVER_STATS_FILE)
+    bump_generation('driver_stats')
+
+def _update_result_stats(stats, filename):
+    # Alten Beitrag der Datei abziehen, aktuellen (falls die Datei noch existiert) addieren
+    old = stats['results'].pop(filename, None)
+    if old:
+        for cust_id, contribution in old['contributions'].items():
+            _apply_contribution(stats, cust_id, contribution, -1)
+    filepath = os.path.join(RESULTS_FOLDER, filename)
+    if os.path.exists(filepath):
+        st = os.stat(filepath)
+        contributions = result_contributions(filename, filepath)
+        for cust_id, contribution in contributions.items():
+            _apply_contribution(stats, cust_id, contribution, 1)
+        stats['results'][filename] = {'stat': [st.st_mtime_ns, st.st_size], 'contributions': contributions}
+
+def update_driver_stats(*filenames):
+    """Nach Upload/Bearbeiten/Löschen von Ergebnisdateien: nur deren Beiträge neu verrechnen."""
+    with file_lock('driver_stats'):
+        stats = load_driver_stats()
+        for filename in filenames:
+            try:
+                _update_result_stats(stats, secure_filename(filename))
+            except Exception as e:
+                print(f"Fahrer-Statistik für {filename} fehlgeschlagen: {e}")
+        save_driver_stats(stats)
+
+def changed_result_files(recorded):
+    # Ergebnisdateien, deren stat nicht zum gespeicherten Stand passt, plus gelöschte
+    present = {}
+    if os.path.exists(RESULTS_FOLDER):
+        for filename in os.listdir(RESULTS_FOLDER):
+            if filename.endswith('.json'):
+                st = os.stat(os.path.join(RESULTS_FOLDER, filename))
+                present[filename] = [st.st_mtime_ns, st.st_size]
+    changed = [f for f, stat in present.items() if recorded.get(f, {}).get('stat') != stat]
+    return changed + [f for f in recorded if f not in present]
+
+def refresh_driver_stats(rebuild=False):
+    """Gleicht driver_stats.json mit dem Ergebnisordner ab (neue, geänderte, gelöschte Dateien).
+    rebuild=True rechnet alles neu."""
+    if rebuild:
+        with file_lock('driver_stats'):
+            save_driver_stats({"results": {}, "drivers": {}})
+    changed = changed_result_files(load_driver_stats()['results'])
+    if changed:
+        update_driver_stats(*changed)
+    return changed
+
+def _stat_row(row):
+    starts = row.get('starts', 0)
+    return dict(row,
+                avg_start=f"{row['sum_start'] / row['start_count']:.1f}" if row.get('start_count') else "-",
+                avg_finish=f"{row['sum_finish'] / starts:.1f}" if starts else "-",
+                inc_per_lap=f"{row['incidents'] / row['laps']:.3f}" if row.get('laps') else "-",
+                irating=f"{row['irating_delta']:+d}" if row.get('irating_races') else "-")
+
+def driver_cust_id(driver):
+    """iRacing cust_id eines Team-Fahrers: iracing_id, falls dazu Ergebnisse existieren, sonst die interne ID."""
+    known = load_driver_stats()['drivers']
+    candidates = [str(c) for c in (driver.get('iracing_id'), driver.get('id')) if c]
+    return next((c for c in candidates if c in known), candidates[0] if candidates else None)
+
+def get_driver_stats(cust_id):
+    """Karriere + Saisons (neueste zuerst) eines Fahrers, fertig für das Template, oder None."""
+    driver = load_driver_stats()['drivers'].get(str(cust_id))
+    if not driver:
+        return None
+    seasons = [_stat_row(row) for row in driver['seasons'].values()]
+    seasons.sort(key=lambda r: (r['season'], r['series']), reverse=True)
+    return {'career': _stat_row(driver['career']), 'seasons': seasons}
+
+@app.cli.command('driver-stats')
+@click.option('--rebuild', is_flag=True, help='Alle Aggregate neu aus den Ergebnisdateien berechnen.')
+def driver_stats_command(rebuild):
+    """Gleicht die Fahrer-Statistiken mit den Ergebnisdateien ab."""
+    changed = refresh_driver_stats(rebuild=rebuild)
+    click.echo(f"{len(changed)} Ergebnisdateien verrechnet, {len(load_driver_stats()['drivers'])} Fahrer")
+
+# --- Fahrervergleich ---
+# Head-to-Head für zwei oder mehr Fahrer. Grundlage ist der Ergebnis-Index cust_id -> Einzelergebnisse
+# (aus den Beiträgen in driver_stats.json, als geteilte Daten) plus die Karriere-Aggregate - es wird keine
+# Ergebnisdatei geöffnet.
+@shared_data('driver_results_index', deps=('driver_stats',))
+def build_driver_results_index():
+    index = {}
+    for result in load_driver_stats()['results'].values():
+        for cust_id, entry in result['contributions'].items():
+            if entry.get('filename'):
+                index.setdefault(cust_id, []).append(entry)
+    for entries in index.values():
+        entries.sort(key=lambda e: e['date'])
+    return index
+
+def build_comparison(cust_ids, track=None):
+    index = get_shared('driver_results_index')
+    by_driver = {cid: {e['filename']: e for e in index.get(cid, ()) if not track or e['track'] == track}
+                 for cid in cust_ids}
+    shared = set.intersection(*(set(results) for results in by_driver.values())) if by_driver else set()
+    events = sorted(shared, key=lambda f: by_driver[cust_ids[0]][f]['date'])
+
+    # Matrix Events x Fahrer: Klassenplatz und beste Runde, Deltas spaltenweise
+    positions = np.array([[by_driver[cid][f]['class_pos'] for cid in cust_ids] for f in events], dtype=np.int64).reshape(len(events), len(cust_ids))
+    best = np.array([[by_driver[cid][f]['best_lap_time'] for cid in cust_ids] for f in events], dtype=np.float64).reshape(len(events), len(cust_ids))
+    best[best <= 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        fastest = np.nanmin(np.where(np.isnan(best), np.inf, best), axis=1, keepdims=True)
+        fastest[np.isinf(fastest)] = np.nan
+        pace_pct = (best / fastest - 1) * 100
+    relative = positions - positions.min(axis=1, keepdims=True) if len(events) else positions
+
+    rows = []
+    for e, filename in enumerate(events):
+        first = by_driver[cust_ids[0]][filename]
+        rows.append({'filename': filename, 'date': first['date'][:10], 'title': first['title'], 'track': first['track'],
+                     'drivers': [{'pos': int(positions[e, d]), 'relative': int(relative[e, d]),
+                                  'best_lap': format_lap_time(by_driver[cid][filename]['best_lap_time']),
+                                  'delta': "-" if np.isnan(best[e, d]) or best[e, d] == fastest[e, 0]
+                                           else f"+{(best[e, d] - fastest[e, 0]) / 10000:.3f}s",
+                                  'car': by_driver[cid][filename]['car']}
+                                 for d, cid in enumerate(cust_ids)]})
+
+    summaries = []
+    for d, cid in enumerate(cust_ids):
+        stats = get_driver_stats(cid)
+        valid = ~np.isnan(pace_pct[:, d]) if len(events) else np.zeros(0, dtype=bool)
+        trend = None
+        if valid.sum() >= 3:
+            trend = float(np.polyfit(np.flatnonzero(valid), pace_pct[valid, d], 1)[0])
+        summaries.append({
+            'cust_id': cid,
+            'name': next((e['name'] for e in index.get(cid, ())), cid),
+            'ahead': int((relative[:, d] == 0).sum()) if len(events) else 0,
+            'avg_pos': f"{positions[:, d].mean():.1f}" if len(events) else "-",
+            'avg_pace': f"+{np.nanmean(pace_pct[valid, d]):.2f}%" if valid.any() else "-",
+            'trend': f"{trend:+.2f}% / Rennen" if trend is not None else "-",
+            'trend_raw': trend,
+            'career': stats['career'] if stats else None,
+        })
+    tracks = sorted({e['track'] for cid in cust_ids for e in index.get(cid, ()) if e.get('track')})
+    return {'events': rows, 'summaries': summaries, 'tracks': tracks}
+
+@app.route('/compare')
+def driver_compare():
+    drivers = load_drivers()
+    selected_ids = request.args.getlist('d')
+    selected = [d for d in drivers if str(d.get('id')) in selected_ids]
+    track = request.args.get('track') or None
+    comparison = None
+    if len(selected) >= 2:
+        comparison = build_comparison([driver_cust_id(d) for d in selected], track)
+    elif selected_ids:
+        flash("Bitte mindestens zwei Fahrer auswählen.", "info")
+    return render_template('compare.html', drivers=drivers, selected_ids=selected_ids, selected=selected,
+                           track=track, comparison=comparison)
+
+# --- Bestzeiten (Team-Referenzen) ---
+# Beste Renn- und Qualirunde pro (Strecke, Layout, Auto) und Fahrer, mit Ergebnisdatei und Datum der Runde.
+# personal_bests.json hält pro Ergebnisdatei die extrahierten Runden und pro Kombination die fertige Bestenliste
+# ('boards', Schlüssel "Strecke|Layout|Auto") - Abfragen sind ein Dict-Zugriff. Beim Upload werden nur die
+# Kombinationen neu bestimmt, die in den geänderten Dateien vorkommen (aus den gespeicherten Runden, ohne
+# Ergebnisdateien erneut zu lesen). Gespeichert werden alle Fahrer; die Team-Sicht filtert beim Anzeigen.
+def pb_key(track, config, car):
+    return f"{track or ''}|{config or ''}|{car or ''}"
+
+def result_lap_records(filename, filepath):
+    """Beste Renn-/Qualirunde je Fahrer einer Ergebnisdatei, mit Kombination und Herkunft."""
+    race_table, quali_table = load_session_tables(filepath)
+    if not race_table:
+        return None
+    data, file_meta = load_result_head(filepath), load_results_meta().get(filename, {})
+    track = data.get('track', {})
+    record = {'date': file_meta.get('date') or data.get('start_time') or '',
+              'title': file_meta.get('title') or f"{data.get('series_name')} @ {track.get('track_name')}",
+              'track': track.get('track_name') or file_meta.get('track'), 'config': track.get('config_name') or '',
+              'laps': []}
+    for entry in race_table.rows:
+        for member in entry.get('driver_results') or [entry]:
+            cust_id = member.get('cust_id')
+            if not cust_id:
+                continue
+            qual = member.get('best_qual_lap_time') or 0
+            if quali_table and qual <= 0:
+                q_row, q_driver = quali_table.locate(cust_id)
+                if q_row is not None:
+                    qual = (q_driver or quali_table.rows[q_row]).get('best_lap_time') or 0
+            race = member.get('best_lap_time') or 0
+            if race > 0 or qual > 0:
+                record['laps'].append({'key': pb_key(record['track'], record['config'], entry.get('car_name')),
+                                       'car': entry.get('car_name'), 'cust_id': str(cust_id),
+                                       'name': member.get('display_name'),
+                                       'race': max(race, 0), 'qual': max(qual, 0)})
+    return record
+
+@store_cached('personal_bests')
+def load_personal_bests():
+    if not os.path.exists(PERSONAL_BESTS_FILE):
+        return {"results": {}, "boards": {}}
+    try:
+        note_file_read('store_loads', PERSONAL_BESTS_FILE)
+        with open(PERSONAL_BESTS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"results": {}, "boards": {}}
+
+def save_personal_bests(data):
+    metric_inc('store_saves')
+    tmp_path = PERSONAL_BESTS_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, PERSONAL_BESTS_FILE)
+    bump_generation('personal_bests')
+
+def _rebuild_boards(store, keys):
+    boards = {key: {} for key in keys}
+    for filename, record in store['results'].items():
+        for lap in record.get('laps', ()):
+            drivers = boards.get(lap['key'])
+            if drivers is None:
+                continue
+            best = drivers.setdefault(lap['cust_id'], {'name': lap['name'], 'race': None, 'qual': None})
+            for kind in ('race', 'qual'):
+                if lap[kind] > 0 and (best[kind] is None or lap[kind] < best[kind]['time']):
+                    best[kind] = {'time': lap[kind], 'filename': filename, 'date': record['date'], 'title': record['title']}
+                    best['name'] = lap['name']
+    for key, drivers in boards.items():
+        if not drivers:
+            store['boards'].pop(key, None)
+            continue
+        track, config, car = key.split('|', 2)
+        store['boards'][key] = {'track': track, 'config': config, 'car': car, 'drivers': drivers}
+
+def update_personal_bests(*filenames):
+    """Runden der angegebenen Ergebnisdateien neu extrahieren und betroffene Bestenlisten neu bestimmen."""
+    with file_lock('personal_bests'):
+        store = load_personal_bests()
+        touched = set()
+        for filename in filenames:
+            filename = secure_filename(filename)
+            old = store['results'].pop(filename, None)
+            touched.update(lap['key'] for lap in (old or {}).get('laps', ()))
+            filepath = os.path.join(RESULTS_FOLDER, filename)
+            if not os.path.exists(filepath):
+                continue
+            try:
+                st = os.stat(filepath)
+                record = result_lap_records(filename, filepath) or {'laps': []}
+                store['results'][filename] = dict(record, stat=[st.st_mtime_ns, st.st_size])
+                touched.update(lap['key'] for lap in record['laps'])
+            except Exception as e:
+                print(f"Bestzeiten für {filename} fehlgeschlagen: {e}")
+        _rebuild_boards(store, touched)
+        save_personal_bests(store)
+
+def _team_cust_ids():
+    ids = {}
+    for driver in load_drivers():
+        for candidate in (driver.get('iracing_id'), driver.get('id')):
+            if candidate:
+                ids[str(candidate)] = driver
+    return ids
+
+@shared_data('team_bests', deps=('personal_bests', 'drivers'))
+def build_team_bests():
+    """Bestenlisten nur mit Team-Fahrern, schnellste Rennrunde zuerst. Schlüssel wie in personal_bests.json."""
+    team = _team_cust_ids()
+    boards = {}
+    for key, board in load_personal_bests()['boards'].items():
+        # iracing_id und interne ID können beide Runden haben - pro Team-Fahrer die jeweils schnellere nehmen
+        merged = {}
+        for cust_id, best in board['drivers'].items():
+            if cust_id not in team:
+                continue
+            driver = team[cust_id]
+            row = merged.setdefault(driver.get('id'), {'driver_id': driver.get('id'), 'name': driver.get('name') or best['name'],
+                                                       'race': None, 'qual': None})
+            for kind in ('race', 'qual'):
+                if best[kind] and (row[kind] is None or best[kind]['time'] < row[kind]['time']):
+                    row[kind] = dict(best[kind], lap=format_lap_time(best[kind]['time']))
+        rows = list(merged.values())
+        if not rows:
+            continue
+        rows.sort(key=lambda r: (r['race']['time'] if r['race'] else float('inf'),
+                                 r['qual']['time'] if r['qual'] else float('inf')))
+        boards[key] = {'key': key, 'track': board['track'], 'config': board['config'], 'car': board['car'], 'rows': rows}
+    return boards
+
+def setup_matches_track(setup, track):
+    """Setup-Strecke (Freitext, z.B. 'Spa Francorchamps') gegen iRacing Streckenname vergleichen."""
+    def simple(text):
+        return re.sub(r'[^a-z0-9]', '', (text or '').lower())
+    wanted, given = simple(track), simple(setup.get('track'))
+    return bool(given) and (given in wanted or wanted in given)
+
+def team_references(track, config, car):
+    """Team-Bestzeiten für genau eine Kombination (oder None)."""
+    return get_shared('team_bests').get(pb_key(track, config, car))
+
+@app.route('/boxengasse/referenzen')
+@driver_login_required
+def boxengasse_references():
+    boards = get_shared('team_bests')
+    track = request.args.get('track') or None
+    config = request.args.get('config') or None
+    car = request.args.get('car') or None
+    configs = sorted({b['config'] for b in boards.values() if b['track'] == track and b['config']})
+    if config not in configs:
+        # Variante gehört zu einer vorher gewählten Strecke
+        config = None
+    if track and config and car:
+        board = team_references(track, config, car)
+        selected = [board] if board else []
+    else:
+        selected = [b for b in boards.values()
+                    if (not track or b['track'] == track) and (not config or b['config'] == config)
+                    and (not car or b['car'] == car)]
+        selected.sort(key=lambda b: (b['track'], b['config'], b['car']))
+    # Passende Setups zur Auswahl gleich mit anzeigen (Strecke ist beim Setup Freitext)
+    setups = [s for s in load_setups() if s.get('car') == car and (not track or setup_matches_track(s, track))] if car else []
+    return render_template('boxengasse_references.html', boards=selected, setups=setups, track=track, config=config, car=car,
+                           tracks=sorted({b['track'] for b in boards.values()}),
+                           configs=configs,
+                           cars=sorted({b['car'] for b in boards.values()}))
+
+# --- Meisterschaftsstand ---
+# Liga-Ergebnisse (league_id + league_season_id in der Datei) werden pro Ergebnisdatei einmal zu kompakten
+# Einträgen (Fahrer/Team, Klasse, Klassenplatz, league/champ points, drop_race) in standings.json extrahiert -
+# inkrementell wie die Fahrer-Statistik. Die Tabellen selbst entstehen aus diesen Einträgen im Shared-Data
+# Builder 'standings' (neu nur wenn sich Einträge oder die Punkte-Konfiguration ändern).
+# Punkte und Streichresultate kommen aus site_config['standings'].
+DEFAULT_POINTS_TABLE = (25, 18, 15, 12, 10, 8, 6, 4, 2, 1)
+POINTS_SYSTEMS = {'auto': "Automatisch (Liga-Punkte, sonst Tabelle)", 'league': "Liga-Punkte (league_points)",
+                  'champ': "Champ Points (champ_points)", 'table': "Eigene Punktetabelle"}
+DROP_RULES = {'none': "Keine Streichresultate", 'iracing': "Streichresultate aus iRacing (drop_race)",
+              'worst': "Schlechteste N Ergebnisse streichen"}
+
+def standings_settings(config=None):
+    settings = dict((config or load_config()).get('standings') or {})
+    try:
+        table = tuple(int(p) for p in str(settings.get('points_table') or '').split(',') if p.strip())
+    except ValueError:
+        table = ()
+    return {'points_system': settings.get('points_system') if settings.get('points_system') in POINTS_SYSTEMS else 'auto',
+            'points_table': table or DEFAULT_POINTS_TABLE,
+            'drop_rule': settings.get('drop_rule') if settings.get('drop_rule') in DROP_RULES else 'none',
+            'drop_count': max(int(settings.get('drop_count') or 0), 0)}
+
+def result_standings_entries(filename, filepath):
+    """Liga-Saison und Einträge einer Ergebnisdatei, oder None wenn es kein Liga-Ergebnis ist."""
+    data = load_result_head(filepath)
+    if not data.get('league_id') or not data.get('league_season_id'):
+        return None
+    race_table, _ = load_session_tables(filepath)
+    if not race_table:
+        return None
+    file_meta = load_results_meta().get(filename, {})
+    class_positions = (race_table.class_position + 1).tolist()
+    entries = []
+    for i, entry in enumerate(race_table.rows):
+        base = {'class_id': entry.get('car_class_id'), 'class_name': entry.get('car_class_short_name') or "Unknown",
+                'class_pos': class_positions[i], 'drop': bool(entry.get('drop_race'))}
+        members = entry.get('driver_results')
+        if entry.get('team_id') and members is not None:
+            entries.append(dict(base, kind='team', id=str(entry['team_id']), name=entry.get('display_name'),
+                                league_points=entry.get('league_points') or 0, champ_points=entry.get('champ_points') or 0))
+            # Fahrer bekommen die Team-Platzierung, sofern sie mindestens eine Runde gefahren sind
+            for member in members:
+                if member.get('cust_id') and (member.get('laps_complete') or 0) > 0:
+                    entries.append(dict(base, kind='driver', id=str(member['cust_id']), name=member.get('display_name'),
+                                        team=entry.get('display_name'),
+                                        league_points=entry.get('league_points') or 0,
+                                        champ_points=entry.get('champ_points') or 0))
+        elif entry.get('cust_id'):
+            entries.append(dict(base, kind='driver', id=str(entry['cust_id']), name=entry.get('display_name'), team=None,
+                                league_points=entry.get('league_points') or 0, champ_points=entry.get('champ_points') or 0))
+    return {
+        'season': f"{data['league_id']}-{data['league_season_id']}",
+        'league_name': data.get('league_name'),
+        'season_name': data.get('league_season_name') or str(data['league_season_id']),
+        'date': file_meta.get('date') or data.get('start_time') or '',
+        'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
+        'entries': entries,
+    }
+
+@store_cached('standings')
+def load_standings_store():
+    if not os.path.exists(STANDINGS_FILE):
+        return {"results": {}}
+    try:
+        note_file_read('store_loads', STANDINGS_FILE)
+        with open(STANDINGS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"results": {}}
+
+def save_standings_store(data):
+    metric_inc('store_saves')
+    tmp_path = STANDINGS_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, STANDINGS_FILE)
+    bump_generation('standings')
+
+def update_standings(*filenames):
+    """Einträge nur für die angegebenen Ergebnisdateien neu extrahieren (oder entfernen)."""
+    with file_lock('standings'):
+        store = load_standings_store()
+        for filename in filenames:
+            filename = secure_filename(filename)
+            store['results'].pop(filename, None)
+            filepath = os.path.join(RESULTS_FOLDER, filename)
+            if not os.path.exists(filepath):
+                continue
+            try:
+                st = os.stat(filepath)
+                extracted = result_standings_entries(filename, filepath)
+                # Auch Nicht-Liga-Dateien merken, damit der Abgleich sie nicht jedes Mal neu liest
+                store['results'][filename] = dict(extracted or {}, stat=[st.st_mtime_ns, st.st_size])
+            except Exception as e:
+                print(f"Meisterschaftsstand für {filename} fehlgeschlagen: {e}")
+        save_standings_store(store)
+
+def _entry_points(entry, system, table):
+    if system == 'league':
+        return entry['league_points']
+    if system == 'champ':
+        return entry['champ_points']
+    return table[entry['class_pos'] - 1] if 0 < entry['class_pos'] <= len(table) else 0
+
+def _standings_table(competitors, rounds, settings):
+    rows = []
+    for competitor in competitors.values():
+        results = competitor['results']
+        dropped = set()
+        if settings['drop_rule'] == 'iracing':
+            dropped = {r for r, res in results.items() if res['drop']}
+        elif settings['drop_rule'] == 'worst' and settings['drop_count'] and len(results) > settings['drop_count']:
+            worst = sorted(results, key=lambda r: (results[r]['points'], -results[r]['class_pos']))
+            dropped = set(worst[:settings['drop_count']])
+        finishes = [res['class_pos'] for res in results.values()]
+        rows.append({
+            'id': competitor['id'], 'name': competitor['name'], 'team': competitor.get('team'),
+            'points': sum(res['points'] for r, res in results.items() if r not in dropped),
+            'races': len(results), 'wins': finishes.count(1), 'podiums': sum(1 for p in finishes if p <= 3),
+            'best': min(finishes) if finishes else None,
+            'rounds': [dict(results[r], dropped=r in dropped) if r in results else None for r in rounds],
+        })
+    rows.sort(key=lambda r: (-r['points'], -r['wins'], -r['podiums'], r['best'] or 999, r['name'] or ''))
+    for pos, row in enumerate(rows, 1):
+        row['pos'] = pos
+        row['gap'] = rows[0]['points'] - row['points']
+    return rows
+
+@shared_data('standings', deps=('standings', 'config'))
+def build_standings():
+    settings = standings_settings()
+    seasons = {}
+    for filename, result in load_standings_store()['results'].items():
+        if not result.get('season'):
+            continue
+        season = seasons.setdefault(result['season'], {'key': result['season'], 'league_name': result['league_name'],
+                                                       'season_name': result['season_name'], 'results': []})
+        season['results'].append(dict(result, filename=filename))
+
+    output = []
+    for season in seasons.values():
+        season['results'].sort(key=lambda r: r['date'])
+        rounds = [r['filename'] for r in season['results']]
+        system = settings['points_system']
+        if system == 'auto':
+            has_league_points = any(e['league_points'] for r in season['results'] for e in r['entries'])
+            system = 'league' if has_league_points else 'table'
+
+        classes = {}
+        for result in season['results']:
+            for entry in result['entries']:
+                cls = classes.setdefault(entry['class_id'], {'id': entry['class_id'], 'name': entry['class_name'],
+                                                             'driver': {}, 'team': {}})
+                competitors = cls[entry['kind']]
+                competitor = competitors.setdefault(entry['id'], {'id': entry['id'], 'name': entry['name'], 'results': {}})
+                competitor['name'] = entry['name']
+                if entry.get('team'):
+                    competitor['team'] = entry['team']
+                competitor['results'][result['filename']] = {
+                    'points': _entry_points(entry, system, settings['points_table']),
+                    'class_pos': entry['class_pos'], 'drop': entry['drop']}
+
+        output.append({
+            'key': season['key'], 'league_name': season['league_name'], 'season_name': season['season_name'],
+            'system': POINTS_SYSTEMS[system], 'drop_rule': DROP_RULES[settings['drop_rule']],
+            'rounds': [{'filename': r['filename'], 'date': r['date'][:10], 'track': r['track']} for r in season['results']],
+            'last_date': season['results'][-1]['date'],
+            'classes': [{'id': c['id'], 'name': c['name'],
+                         'drivers': _standings_table(c['driver'], rounds, settings),
+                         'teams': _standings_table(c['team'], rounds, settings)}
+                        for c in sorted(classes.values(), key=lambda c: c['name'])],
+        })
+    output.sort(key=lambda s: s['last_date'], reverse=True)
+    return output
+
+def update_result_aggregates(*filenames):
+    # Alles, was aus Ergebnisdateien vorberechnet wird, für diese Dateien nachziehen
+    update_driver_stats(*filenames)
+    update_standings(*filenames)
+    update_personal_bests(*filenames)
+
+def refresh_result_aggregates():
+    """Abgleich aller vorberechneten Ergebnis-Daten mit dem Ergebnisordner (Warmer, CLI)."""
+    changed_stats = changed_result_files(load_driver_stats()['results'])
+    changed_standings = changed_result_files(load_standings_store()['results'])
+    changed_bests = changed_result_files(load_personal_bests()['results'])
+    if changed_stats:
+        update_driver_stats(*changed_stats)
+    if changed_standings:
+        update_standings(*changed_standings)
+    if changed_bests:
+        update_personal_bests(*changed_bests)
+    return sorted(set(changed_stats) | set(changed_standings) | set(changed_bests))
+
+@app.route('/standings')
+@app.route('/standings/<season_key>')
+def public_standings(season_key=None):
+    seasons = get_shared('standings')
+    if not seasons:
+        return render_template('standings.html', seasons=seasons, season=None)
+    season = next((s for s in seasons if s['key'] == season_key), None) if season_key else seasons[0]
+    if not season:
+        flash("Meisterschaft nicht gefunden.", "error")
+        return redirect(url_for('public_standings'))
+    return render_template('standings.html', seasons=seasons, season=season)
+
+# --- Daten-Migrationen ---
+# Geordnete, idempotente Migrationen. Der erreichte Stand steht in schema_version.json im Datenverzeichnis;
+# beim Boot wird nur die Version verglichen. Ist sie veraltet, laufen die fehlenden Migrationen unter
+# einem File-Lock (nur ein Worker), jede wird mit Dauer in der History protokolliert.
+SCHEMA_VERSION_FILE = os.path.join(BASE_DATA_DIR, 'schema_version.json')
+MIGRATIONS = []
+
+def migration(version, description):
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return f
+    return decorator
+
+def load_schema_version():
+    if not os.path.exists(SCHEMA_VERSION_FILE):
+        return {"version": 0, "history": []}
+    try:
+        with open(SCHEMA_VERSION_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 0, "history": []}
+
+def save_schema_version(data):
+    tmp_path = SCHEMA_VERSION_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, SCHEMA_VERSION_FILE)
+
+def latest_schema_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+@migration(1, "Ergebnisdateien für IEC Imola und Daytona verknüpfen")
+def migrate_link_legacy_results():
+    events = load_events()
+    changed = False
+
+    imola = next((e for e in events if str(e.get('id')) == "1771600365"), None)
+    if imola and not imola.get('result_file'):
+        imola['result_file'] = "iec_imola_result.json"
+        imola['result'] = "P8"
+        imola['title'] = "IEC Ligarennen 6"
+        changed = True
+
+    daytona = next((e for e in events if str(e.get('id')) == "1"), None)
+    if daytona and not daytona.get('result_file'):
+        daytona['result_file'] = "daytona24_result.json"
+        changed = True
+
+    if changed:
+        save_events(events)
+
+@migration(2, "Fahrerliste von reinen iRacing IDs auf Fahrer-Objekte umstellen")
+def migrate_driver_ids_to_objects():
+    drivers = load_drivers()
+    if not any(not isinstance(d, dict) for d in drivers):
+        return
+    save_drivers([d if isinstance(d, dict) else {"id": str(d), "iracing_id": str(d), "name": f"Driver {d}"}
+                  for d in drivers])
+
+@migration(3, "Fahrer-Statistiken aus allen Ergebnisdateien aufbauen")
+def migrate_build_driver_stats():
+    refresh_driver_stats(rebuild=True)
+
+@migration(4, "Meisterschaftsstand aus allen Liga-Ergebnissen aufbauen")
+def migrate_build_standings():
+    update_standings(*changed_result_files({}))
+
+@migration(5, "Fahrer-Statistiken um Einzelergebnisse für den Fahrervergleich erweitern")
+def migrate_driver_stats_entries():
+    refresh_driver_stats(rebuild=True)
+
+@migration(6, "Bestzeiten pro Strecke und Auto aus allen Ergebnissen aufbauen")
+def migrate_build_personal_bests():
+    update_personal_bests(*changed_result_files({}))
+
+@migration(7, "Ergebnisse ins Archiv (gzip) + schlanke Projektion aufteilen")
+def migrate_compact_results():
+    compacted = compact_results()
+    if compacted:
+        update_result_aggregates(*compacted)
+
+@migration(8, "Projektionen neu schreiben: Kopfdaten vorne für gestreamtes Lesen")
+def migrate_reorder_projections():
+    compacted = compact_results()
+    if compacted:
+        update_result_aggregates(*compacted)
+
+@migration(9, "Projektionen neu schreiben: Safety Rating, Club und Teamname wieder enthalten")
+def migrate_projection_sr_club():
+    compacted = compact_results()
+    if compacted:
+        update_result_aggregates(*compacted)
+
+def run_migrations():
+    # Schneller Pfad beim Boot: nur die Version vergleichen
+    if load_schema_version().get('version', 0) >= latest_schema_version():
+        return 0
+
+    applied = 0
+    with file_lock('migrations'):
+        state = load_schema_version() # Nochmal lesen, ein anderer Worker kann schon migriert haben
+        for version, description, func in MIGRATIONS:
+            if version <= state.get('version', 0):
+                continue
+            print(f"Migration {version}: {description}...")
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                print(f"Fehler bei Migration {version}: {e}")
+                break
+            state['version'] = version
+            state.setdefault('history', []).append({
+                "version": version,
+                "description": description,
+                "date": datetime.now().isoformat(),
+                "ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+            save_schema_version(state)
+            applied += 1
+    print(f"{applied} Migration(en) ausgeführt, Schema-Version {state.get('version', 0)}.")
+    return applied
+
+@app.cli.command('migrate')
+@click.option('--status', is_flag=True, help='Nur den aktuellen Stand anzeigen.')
+def migrate_command(status):
+    """Führt ausstehende Daten-Migrationen aus."""
+    current = load_schema_version().get('version', 0)
+    for version, description, _ in MIGRATIONS:
+        click.echo(f"{'x' if version <= current else ' '} {version}: {description}")
+    if not status:
+        run_migrations()
+
+with startup_phase('init_persistence') as phase:
+    if not init_persistence_once():
+        phase['note'] = "bereits erledigt"
+
+with startup_phase('run_migrations') as phase:
+    if not run_migrations():
+        phase['note'] = f"Schema {latest_schema_version()}"
 
-run_migrations()
 
 @app.context_processor
 def inject_config():
@@ -603,25 +3424,15 @@ def get_drivers_data():
                                 res_path = os.path.join(app.config['RESULTS_FOLDER'], filename)
                                 if os.path.exists(res_path):
                                     try:
-                                        with open(res_path, 'r') as f:
-                                            res_data = json.load(f)
-                                            # ... (find driver in result logic similar to before)
-                                            sessions = res_data.get('data', {}).get('session_results', [])
-                                            race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), sessions[-1] if sessions else None)
-                                            if race_session:
-                                                # Look for driver ID
-                                                d_res = next((r for r in race_session.get('results', []) if r.get('cust_id') == cust_id), None)
-                                                if d_res:
-                                                    # Found him!
-                                                    def format_time(val):
-                                                        if val <= 0: return "-"
-                                                        seconds = val / 10000
-                                                        minutes = int(seconds // 60)
-                                                        rem_seconds = seconds % 60
-                                                        return f"{minutes}:{rem_seconds:06.3f}"
-                                                        
-                                                    driver_entry['best_lap'] = format_time(d_res.get('best_lap_time', 0))
-                                                    driver_entry['inc'] = d_res.get('incidents', 0)
+                                        # ... (find driver in result logic similar to before)
+                                        race_session, _ = stream_result_sessions(res_path)
+                                        if race_session:
+                                            # Look for driver ID
+                                            d_res = next((r for r in race_session.get('results', []) if r.get('cust_id') == cust_id), None)
+                                            if d_res:
+                                                # Found him!
+                                                driver_entry['best_lap'] = format_lap_time(d_res.get('best_lap_time', 0))
+                                                driver_entry['inc'] = d_res.get('incidents', 0)
                                     except: pass
                                 break
                     except: pass
@@ -686,15 +3497,7 @@ def upload_setup():
         
         for file in files:
             if file and file.filename != '':
-                filename = secure_filename(file.filename)
-                ts = int(datetime.now().timestamp())
-                stored_filename = f"setup_{ts}_{filename}"
-                
-                if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                    os.makedirs(app.config['UPLOAD_FOLDER'])
-                    
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], stored_filename)
-                file.save(filepath)
+                stored_filename = store_upload(file, f"setup:{entry_id}")
                 
                 saved_files.append({
                     "filename": file.filename,
@@ -720,6 +3523,98 @@ def upload_setup():
             
     return redirect(url_for('boxengasse'))
 
+# --- Setup ZIP Streaming ---
+# Multi-File Setups werden nicht mehr komplett im Speicher gebaut, sondern Datei für Datei
+# in Chunks gestreamt. Parallel wird das Archiv in den Cache geschrieben, damit der nächste
+# Download direkt von Platte kommt.
+SETUP_ZIP_CACHE_FOLDER = os.path.join(BASE_DATA_DIR, 'cache', 'setup_zips')
+ZIP_CHUNK_SIZE = 64 * 1024
+
+class ZipChunkBuffer:
+    """Nicht-seekbares Ziel für zipfile: sammelt nur die Bytes seit dem letzten pop()."""
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def setup_zip_cache_path(setup):
+    # Cache-Key: Setup-ID + Name/Größe/mtime jeder Datei -> ändert sich eine Datei, gibt es ein neues Archiv
+    key = hashlib.sha1()
+    for file_info in setup.get('files', []):
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_info['stored_filename'])
+        try:
+            st = os.stat(filepath)
+            key.update(f"{file_info['stored_filename']}|{file_info['filename']}|{st.st_size}|{st.st_mtime_ns};".encode('utf-8'))
+        except OSError:
+            key.update(f"{file_info['stored_filename']}|missing;".encode('utf-8'))
+    return os.path.join(SETUP_ZIP_CACHE_FOLDER, f"{secure_filename(setup['id'])}_{key.hexdigest()[:16]}.zip")
+
+def remove_setup_zip_cache(setup_id, keep=None):
+    if not os.path.exists(SETUP_ZIP_CACHE_FOLDER):
+        return
+    prefix = f"{secure_filename(setup_id)}_"
+    for name in os.listdir(SETUP_ZIP_CACHE_FOLDER):
+        path = os.path.join(SETUP_ZIP_CACHE_FOLDER, name)
+        if name.startswith(prefix) and name.endswith('.zip') and path != keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Fehler beim Löschen des ZIP-Caches {name}: {e}")
+
+def stream_setup_zip(setup_id, files, cache_path):
+    # Pfade vorher auflösen, der Generator läuft ausserhalb des Request-Kontexts
+    sources = [(os.path.join(app.config['UPLOAD_FOLDER'], f['stored_filename']), f['filename']) for f in files]
+    os.makedirs(SETUP_ZIP_CACHE_FOLDER, exist_ok=True)
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    buffer = ZipChunkBuffer()
+    try:
+        with open(tmp_path, 'wb') as cache_file:
+            with zipfile.ZipFile(buffer, 'w') as zf:
+                for filepath, arcname in sources:
+                    if not os.path.exists(filepath):
+                        continue
+                    zinfo = zipfile.ZipInfo.from_file(filepath, arcname=arcname)
+                    with open(filepath, 'rb') as src, zf.open(zinfo, 'w') as dst:
+                        while True:
+                            chunk = src.read(ZIP_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            dst.write(chunk)
+                            data = buffer.pop()
+                            if data:
+                                cache_file.write(data)
+                                yield data
+                    # Data Descriptor der Datei
+                    data = buffer.pop()
+                    if data:
+                        cache_file.write(data)
+                        yield data
+            # Central Directory
+            data = buffer.pop()
+            cache_file.write(data)
+            yield data
+        os.replace(tmp_path, cache_path)
+        remove_setup_zip_cache(setup_id, keep=cache_path)
+    finally:
+        # Abgebrochener Download -> halbes Archiv nicht im Cache lassen
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 @app.route('/boxengasse/setup/download/<setup_id>')
 @driver_login_required
 def download_setup(setup_id):
@@ -745,16 +3640,16 @@ def download_setup(setup_id):
              return redirect(url_for('boxengasse'))
     
     else:
-        memory_file = io.BytesIO()
-        with zipfile.ZipFile(memory_file, 'w') as zf:
-            for file_info in files:
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_info['stored_filename'])
-                if os.path.exists(filepath):
-                    zf.write(filepath, arcname=file_info['filename'])
+        zip_filename = secure_filename(f"Setups_{setup['car']}_{setup['track']}.zip".replace(" ", "_"))
+        cache_path = setup_zip_cache_path(setup)
         
-        memory_file.seek(0)
-        zip_filename = f"Setups_{setup['car']}_{setup['track']}.zip".replace(" ", "_")
-        return send_file(memory_file, mimetype='application/zip', as_attachment=True, download_name=zip_filename)
+        # Schon einmal gebaut (und keine Datei hat sich seitdem geändert) -> direkt von Platte
+        if os.path.exists(cache_path):
+            return send_file(cache_path, mimetype='application/zip', as_attachment=True, download_name=zip_filename)
+        
+        response = Response(stream_setup_zip(setup_id, files, cache_path), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=zip_filename)
+        return response
 
 @app.route('/boxengasse/setup/delete/<setup_id>')
 @driver_login_required
@@ -769,12 +3664,11 @@ def delete_setup(setup_id):
         if is_admin or str(setup.get('uploader_id')) == driver_id:
             for file_info in setup.get('files', []):
                 try:
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_info['stored_filename'])
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
+                    release_upload(file_info['stored_filename'], f"setup:{setup_id}", delete_legacy=True)
                 except Exception as e:
                     print(f"Error deleting file: {e}")
             
+            remove_setup_zip_cache(setup_id)
             setups.remove(setup)
             save_setups(setups)
             flash("Setup gelöscht.", "success")
@@ -796,7 +3690,7 @@ def boxengasse():
     # Liveries und Autos laden
     liveries = load_liveries()
     setups = load_setups()
-    cars = load_cars()
+    cars = get_shared('cars')
     
     # Events laden (eigene)
     all_events = load_events()
@@ -814,6 +3708,11 @@ def boxengasse():
 
 @app.route('/results')
 def public_results():
+    results = [dict(res) for res in get_shared('result_index')]
+    return render_template('public_results.html', results=results)
+
+@shared_data('result_index', deps=('results', 'results_meta'))
+def build_result_index():
     results = []
     meta = load_results_meta()
     
@@ -837,26 +3736,25 @@ def public_results():
                     # But for existing files:
                     filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
                     try:
-                        with open(filepath, 'r') as f:
-                            data = json.load(f)
-                            track_name = data.get('data', {}).get('track', {}).get('track_name', 'Unknown Track')
-                            start_time = data.get('data', {}).get('start_time', 'Unknown Date')
-                            series_name = data.get('data', {}).get('series_name', 'Unknown Series')
+                        data = read_result_fields(filepath, ('track', 'start_time', 'series_name'))
+                        track_name = data.get('track', {}).get('track_name', 'Unknown Track')
+                        start_time = data.get('start_time', 'Unknown Date')
+                        series_name = data.get('series_name', 'Unknown Series')
                             
-                            try:
-                                 dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                                 date_str = dt.strftime('%d.%m.%Y %H:%M')
-                            except:
-                                date_str = start_time
+                        try:
+                             dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                             date_str = dt.strftime('%d.%m.%Y %H:%M')
+                        except:
+                            date_str = start_time
                                 
-                            results.append({
-                                'filename': filename,
-                                'track': track_name,
-                                'date': date_str,
-                                'series': series_name,
-                                'title': f"{series_name} @ {track_name}",
-                                'id': filename
-                            })
+                        results.append({
+                            'filename': filename,
+                            'track': track_name,
+                            'date': date_str,
+                            'series': series_name,
+                            'title': f"{series_name} @ {track_name}",
+                            'id': filename
+                        })
                     except: pass
                     
     # Sort by date descending (try to parse date)
@@ -872,29 +3770,177 @@ def public_results():
     for res in results[:10]: # Limit to last 10 for performance
         try:
             filepath = os.path.join(app.config['RESULTS_FOLDER'], res['filename'])
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                sessions = data.get('data', {}).get('session_results', [])
-                race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), None)
-                if race_session:
-                    # Look for RaceDayFriends result
-                    # Try to find RaceDayFriends
-                    rdf_result = None
-                    for r in race_session.get('results', []):
-                        name = (r.get('display_name') or "").lower().replace(" ", "")
-                        team = (r.get('team_name') or "").lower().replace(" ", "")
+            race_session, _ = stream_result_sessions(filepath)
+            if race_session and race_session.get('simsession_type_name') != 'Race':
+                race_session = None
+            if race_session:
+                # Look for RaceDayFriends result
+                # Try to find RaceDayFriends
+                rdf_result = None
+                for r in race_session.get('results', []):
+                    name = (r.get('display_name') or "").lower().replace(" ", "")
+                    team = (r.get('team_name') or "").lower().replace(" ", "")
                         
-                        # Match "racedayfriends"
-                        if "racedayfriends" in name or "racedayfriends" in team:
-                            # IMPORTANT: Check if there is ACTUALLY a note!
-                            note = r.get('steward_note')
-                            # Check if note is not None AND not empty string AND not just whitespace
-                            if note and str(note).strip():
-                                res['rdf_note'] = note
-                                break
+                    # Match "racedayfriends"
+                    if "racedayfriends" in name or "racedayfriends" in team:
+                        # IMPORTANT: Check if there is ACTUALLY a note!
+                        note = r.get('steward_note')
+                        # Check if note is not None AND not empty string AND not just whitespace
+                        if note and str(note).strip():
+                            res['rdf_note'] = note
+                            break
         except: pass
 
-    return render_template('public_results.html', results=results)
+    return results
+
+def build_result_view(filepath, file_meta):
+    # Tabellen für die Ergebnis-Ansicht (Rennen + Quali je Klasse), als Artefakt gecacht
+    data = load_result_head(filepath)
+    race_table, quali_table = load_session_tables(filepath)
+        
+    # --- RACE RESULTS ---
+    class_results = {}
+    all_drivers_combined = [] 
+
+    if race_table:
+        # Abstände, Runden-Rückstand und Zeiten für alle Zeilen auf einmal
+        class_gaps = race_table.class_gaps()
+        overall_gaps = race_table.overall_gaps()
+        best_laps = race_table.best_laps()
+        avg_laps = race_table.avg_laps()
+        class_positions = (race_table.class_position + 1).tolist()
+        overall_positions = (race_table.finish_position + 1).tolist()
+        laps = race_table.laps_complete.tolist()
+        class_intervals = race_table.class_interval.tolist()
+
+        for i, entry in enumerate(race_table.rows):
+            cid = entry.get('car_class_id')
+            cname = entry.get('car_class_short_name') or "Unknown"
+                
+            if cid not in class_results:
+                class_results[cid] = {
+                    'id': cid,
+                    'name': cname,
+                    'full_name': entry.get('car_class_name'),
+                    'drivers': []
+                }
+
+            # Team Drivers
+            team_drivers = []
+            team_drivers_detailed = []
+                
+            if entry.get('driver_results'):
+                for d in entry.get('driver_results'):
+                    team_drivers.append(d.get('display_name'))
+                    team_drivers_detailed.append({
+                        'name': d.get('display_name'),
+                        'laps': d.get('laps_complete', 0),
+                        'best_lap': format_lap_time(d.get('best_lap_time', 0)),
+                        'avg_lap': format_lap_time(d.get('average_lap', 0)),
+                        'inc': d.get('incidents', 0),
+                        'irating': d.get('oldi_rating', 0),
+                        'new_irating': d.get('newi_rating', 0),
+                        'sr': d.get('old_safety_rating', 0),
+                        'new_sr': d.get('new_safety_rating', 0)
+                    })
+                
+            driver_data = {
+                'pos': class_positions[i], 
+                'overall_pos': overall_positions[i],
+                'car_number': entry.get('livery', {}).get('car_number', '#'),
+                'name': entry.get('display_name'),
+                'team_drivers': team_drivers,
+                'team_drivers_detailed': team_drivers_detailed,
+                'laps': laps[i],
+                'gap_raw': class_intervals[i], 
+                'gap': class_gaps[i], 
+                'overall_gap': overall_gaps[i],
+                'best_lap': best_laps[i],
+                'avg_lap': avg_laps[i],
+                'inc': entry.get('incidents'),
+                'car_name': entry.get('car_name'),
+                'class_name': cname, 
+                'class_id': cid, 
+                'club': entry.get('club_name'), 
+                'id': entry.get('cust_id'),
+                'steward_note': entry.get('steward_note')
+            }
+                
+            class_results[cid]['drivers'].append(driver_data)
+            all_drivers_combined.append(driver_data)
+
+    # Post-Process Race: Sort per Class
+    sorted_classes = []
+    for cid, data in class_results.items():
+        data['drivers'].sort(key=lambda x: x['pos'])
+        sorted_classes.append(data)
+        
+    sorted_classes.sort(key=lambda x: x['name'])
+    all_drivers_combined.sort(key=lambda x: x['overall_pos'])
+
+    # --- QUALI RESULTS ---
+    quali_class_results = {}
+    quali_all_drivers = []
+        
+    if quali_table:
+        best_laps = quali_table.best_laps()
+        pole_gaps = quali_table.gaps_to_pole()
+        best_lap_raws = quali_table.best_lap_time.tolist()
+
+        for i, entry in enumerate(quali_table.rows):
+            cid = entry.get('car_class_id')
+            cname = entry.get('car_class_short_name') or "Unknown"
+                
+            if cid not in quali_class_results:
+                quali_class_results[cid] = {
+                    'id': cid,
+                    'name': cname,
+                    'full_name': entry.get('car_class_name'),
+                    'drivers': []
+                }
+                
+            driver_data = {
+                'pos': entry.get('finish_position_in_class', 0) + 1,
+                'overall_pos': entry.get('finish_position', 0) + 1,
+                'car_number': entry.get('livery', {}).get('car_number', '#'),
+                'name': entry.get('display_name'),
+                'best_lap_raw': best_lap_raws[i],
+                'best_lap': best_laps[i],
+                'gap': pole_gaps[i],
+                'inc': entry.get('incidents', 0),
+                'car_name': entry.get('car_name'),
+                'class_name': cname,
+                'class_id': cid,
+                'steward_note': entry.get('steward_note')
+            }
+            quali_class_results[cid]['drivers'].append(driver_data)
+            quali_all_drivers.append(driver_data)
+        
+    # Post-Process Quali
+    sorted_quali_classes = []
+    for cid, data in quali_class_results.items():
+        data['drivers'].sort(key=lambda x: x['pos'])
+        sorted_quali_classes.append(data)
+        
+    sorted_quali_classes.sort(key=lambda x: x['name'])
+    quali_all_drivers.sort(key=lambda x: x['overall_pos'])
+
+    result_info = {
+        'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
+        'config': data.get('track', {}).get('config_name'),
+        'series': file_meta.get('series') or data.get('series_name'),
+        'date': file_meta.get('date') or 'Unknown Date',
+        'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}",
+        'description': file_meta.get('description', '')
+    }
+                
+    return {
+        'info': result_info,
+        'classes': sorted_classes,
+        'overall': all_drivers_combined,
+        'quali_classes': sorted_quali_classes,
+        'quali_overall': quali_all_drivers
+    }
 
 @app.route('/results/view/<filename>')
 def public_result_detail(filename):
@@ -907,227 +3953,284 @@ def public_result_detail(filename):
     file_meta = meta.get(filename, {})
     
     try:
-        with open(filepath, 'r') as f:
-            full_data = json.load(f)
-            data = full_data.get('data', {})
-            
-            # Sessions find race
-            sessions = data.get('session_results', [])
-            race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), sessions[-1] if sessions else None)
-            quali_session = next((s for s in sessions if 'Qualify' in s.get('simsession_type_name', '')), None)
-            
-            # --- RACE RESULTS ---
-            class_results = {}
-            all_drivers_combined = [] 
-            
-            # Helper for time formatting
-            def format_time(val):
-                if val <= 0: return "-"
-                seconds = val / 10000
-                minutes = int(seconds // 60)
-                rem_seconds = seconds % 60
-                return f"{minutes}:{rem_seconds:06.3f}"
-
-            if race_session:
-                # ... (Existing Race Logic, kept but slightly refactored to use helper) ...
-                # 1. Identify Class Winners
-                class_winners = {} 
-                for entry in race_session.get('results', []):
-                    cid = entry.get('car_class_id')
-                    laps = entry.get('laps_complete', 0)
-                    if cid not in class_winners or laps > class_winners[cid]:
-                        class_winners[cid] = laps
-
-                for entry in race_session.get('results', []):
-                    cid = entry.get('car_class_id')
-                    cname = entry.get('car_class_short_name') or "Unknown"
-                    
-                    if cid not in class_results:
-                        class_results[cid] = {
-                            'id': cid,
-                            'name': cname,
-                            'full_name': entry.get('car_class_name'),
-                            'drivers': []
-                        }
-                    
-                    # Format Gap
-                    interval = entry.get('interval', 0)
-                    class_interval = entry.get('class_interval', 0)
-                    laps_complete = entry.get('laps_complete', 0)
-                    
-                    gap_str = "-"
-                    # (Simplified gap logic for readability)
-                    
-                    overall_gap_str = "-"
-                    if interval > 0:
-                        seconds = interval / 10000
-                        if seconds > 60:
-                             overall_gap_str = f"+{int(seconds//60)}:{seconds%60:05.2f}"
-                        else:
-                             overall_gap_str = f"+{seconds:.3f}s"
-                        
-                    best_lap_str = format_time(entry.get('best_lap_time', 0))
-                    avg_lap_str = format_time(entry.get('average_lap', 0))
-
-                    # Team Drivers
-                    team_drivers = []
-                    team_drivers_detailed = []
-                    
-                    if entry.get('driver_results'):
-                        for d in entry.get('driver_results'):
-                            team_drivers.append(d.get('display_name'))
-                            team_drivers_detailed.append({
-                                'name': d.get('display_name'),
-                                'laps': d.get('laps_complete', 0),
-                                'best_lap': format_time(d.get('best_lap_time', 0)),
-                                'avg_lap': format_time(d.get('average_lap', 0)),
-                                'inc': d.get('incidents', 0),
-                                'irating': d.get('oldi_rating', 0),
-                                'new_irating': d.get('newi_rating', 0),
-                                'sr': d.get('old_safety_rating', 0),
-                                'new_sr': d.get('new_safety_rating', 0)
-                            })
-                    
-                    driver_data = {
-                        'pos': entry.get('finish_position_in_class', entry.get('position', 0) + 1) + 1, 
-                        'overall_pos': entry.get('finish_position', 0) + 1,
-                        'car_number': entry.get('livery', {}).get('car_number', '#'),
-                        'name': entry.get('display_name'),
-                        'team_drivers': team_drivers,
-                        'team_drivers_detailed': team_drivers_detailed,
-                        'laps': laps_complete,
-                        'gap_raw': class_interval, 
-                        'gap': gap_str, 
-                        'overall_gap': overall_gap_str,
-                        'best_lap': best_lap_str,
-                        'avg_lap': avg_lap_str,
-                        'inc': entry.get('incidents'),
-                        'car_name': entry.get('car_name'),
-                        'class_name': cname, 
-                        'class_id': cid, 
-                        'club': entry.get('club_name'), 
-                        'id': entry.get('cust_id'),
-                        'steward_note': entry.get('steward_note')
-                    }
-                    
-                    class_results[cid]['drivers'].append(driver_data)
-                    all_drivers_combined.append(driver_data)
-
-            # Post-Process Race: Sort and Fix Gaps per Class
-            sorted_classes = []
-            for cid, data in class_results.items():
-                data['drivers'].sort(key=lambda x: x['pos'])
-                class_winner_laps = data['drivers'][0]['laps'] if data['drivers'] else 0
-                
-                for d in data['drivers']:
-                    if d['laps'] < class_winner_laps:
-                        diff = class_winner_laps - d['laps']
-                        d['gap'] = f"+{diff} Lap{'s' if diff > 1 else ''}"
-                    elif d['gap_raw'] > 0:
-                        seconds = d['gap_raw'] / 10000
-                        if seconds > 60:
-                             d['gap'] = f"+{int(seconds//60)}:{seconds%60:05.2f}"
-                        else:
-                             d['gap'] = f"+{seconds:.3f}s"
-                    else:
-                        d['gap'] = "-" # Winner
-                sorted_classes.append(data)
-            
-            sorted_classes.sort(key=lambda x: x['name'])
-            all_drivers_combined.sort(key=lambda x: x['overall_pos'])
-            
-            if all_drivers_combined:
-                overall_winner_laps = all_drivers_combined[0]['laps']
-                for d in all_drivers_combined:
-                     if d['laps'] < overall_winner_laps:
-                        diff = overall_winner_laps - d['laps']
-                        d['overall_gap'] = f"+{diff} Lap{'s' if diff > 1 else ''}"
-                     elif d['overall_pos'] == 1:
-                        d['overall_gap'] = "-"
-
-            # --- QUALI RESULTS ---
-            quali_class_results = {}
-            quali_all_drivers = []
-            
-            if quali_session:
-                for entry in quali_session.get('results', []):
-                    cid = entry.get('car_class_id')
-                    cname = entry.get('car_class_short_name') or "Unknown"
-                    
-                    if cid not in quali_class_results:
-                        quali_class_results[cid] = {
-                            'id': cid,
-                            'name': cname,
-                            'full_name': entry.get('car_class_name'),
-                            'drivers': []
-                        }
-                    
-                    best_lap_raw = entry.get('best_lap_time', 0)
-                    best_lap_str = format_time(best_lap_raw)
-                    
-                    driver_data = {
-                        'pos': entry.get('finish_position_in_class', 0) + 1,
-                        'overall_pos': entry.get('finish_position', 0) + 1,
-                        'car_number': entry.get('livery', {}).get('car_number', '#'),
-                        'name': entry.get('display_name'),
-                        'best_lap_raw': best_lap_raw,
-                        'best_lap': best_lap_str,
-                        'gap': '-', # To be calc
-                        'inc': entry.get('incidents', 0),
-                        'car_name': entry.get('car_name'),
-                        'class_name': cname,
-                        'class_id': cid,
-                        'steward_note': entry.get('steward_note')
-                    }
-                    quali_class_results[cid]['drivers'].append(driver_data)
-                    quali_all_drivers.append(driver_data)
-            
-            # Post-Process Quali
-            sorted_quali_classes = []
-            for cid, data in quali_class_results.items():
-                data['drivers'].sort(key=lambda x: x['pos'])
-                
-                # Calc Gap to Pole
-                pole_lap = 0
-                for i, d in enumerate(data['drivers']):
-                    if i == 0:
-                        pole_lap = d['best_lap_raw']
-                        d['gap'] = "-"
-                    elif d['best_lap_raw'] > 0 and pole_lap > 0:
-                        diff = d['best_lap_raw'] - pole_lap
-                        seconds = diff / 10000
-                        d['gap'] = f"+{seconds:.3f}s"
-                    else:
-                        d['gap'] = "-"
-                
-                sorted_quali_classes.append(data)
-            
-            sorted_quali_classes.sort(key=lambda x: x['name'])
-            quali_all_drivers.sort(key=lambda x: x['overall_pos'])
-
-            result_info = {
-                'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
-                'config': data.get('track', {}).get('config_name'),
-                'series': file_meta.get('series') or data.get('series_name'),
-                'date': file_meta.get('date') or 'Unknown Date',
-                'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}",
-                'description': file_meta.get('description', '')
-            }
-                    
-            return render_template('boxengasse_result_detail.html', 
-                                 info=result_info, 
-                                 classes=sorted_classes,
-                                 overall=all_drivers_combined,
-                                 quali_classes=sorted_quali_classes, # NEW
-                                 quali_overall=quali_all_drivers,    # NEW
-                                 filename=filename,
-                                 meta=file_meta,
-                                 public=True)
+        st = os.stat(filepath)
+        view = cached_artifact(f"result-view:{secure_filename(filename)}",
+                               (st.st_mtime_ns, st.st_size, GENERATIONS.get('results_meta')),
+                               lambda: build_result_view(filepath, file_meta))
+        return render_template('boxengasse_result_detail.html', 
+                             filename=filename,
+                             meta=file_meta,
+                             public=True,
+                             has_laps=has_lap_data(filename),
+                             split_event=split_event_key(result_header(filepath)),
+                             **view)
                                  
     except Exception as e:
         flash(f"Fehler beim Lesen der Datei: {e}", "error")
         return redirect(url_for('public_results'))
 
+PACE_CHART_WIDTH = 900
+PACE_CHART_HEIGHT = 320
+PACE_MAX_CARS = 12
+PACE_COLORS = ('#4fd1c5', '#f59e0b', '#ef4444', '#3b82f6', '#10b981', '#a855f7',
+               '#ec4899', '#eab308', '#14b8a6', '#f97316', '#6366f1', '#84cc16')
+
+def clean_lap_mask(laps, cutoff=None):
+    # Gezeitete Runden ohne Box; optional nur bis cutoff (Safety Car, Dreher, Out-Laps raus)
+    mask = (laps['lap'] > 0) & (laps['lap_time'] > 0) & ((laps['flags'] & LAP_EVENT_FLAGS['pitted']) == 0)
+    if cutoff is not None:
+        mask &= laps['lap_time'] <= cutoff
+    return mask
+
+def build_pace_view(filename, filepath, file_meta):
+    # Pace-Grafik je Klasse (SVG-Polylines) und Pace-Tabelle je Auto aus dem Lap Store
+    index = load_lap_index(filename)
+    stints = stint_analysis(filename) or {'cars': {}}
+    race_table, _ = load_session_tables(filepath)
+    data = load_result_head(filepath)
+    rows = race_table.rows if race_table else []
+
+    classes = {}
+    for i, entry in enumerate(rows):
+        key = entry.get('team_id') or entry.get('cust_id')
+        if str(key) not in index['cars']:
+            continue
+        cid = entry.get('car_class_id')
+        cls = classes.setdefault(cid, {'id': cid, 'name': entry.get('car_class_short_name') or "Unknown", 'cars': []})
+        cls['cars'].append({'key': str(key), 'name': entry.get('display_name'),
+                            'car_number': entry.get('livery', {}).get('car_number', '#'),
+                            'pos': int(race_table.class_position[i]) + 1, 'laps_data': load_car_laps(filename, key, index)})
+
+    for cls in classes.values():
+        cls['cars'].sort(key=lambda c: c['pos'])
+        clean = [c['laps_data'][clean_lap_mask(c['laps_data'])]['lap_time'] for c in cls['cars']]
+        bests = [int(times.min()) for times in clean if len(times)]
+        # Y-Achse: schnellste Runde der Klasse bis +12%, langsamere Runden unterbrechen die Linie
+        y_min = min(bests) if bests else 0
+        y_max = int(y_min * 1.12) if y_min else 1
+        max_lap = max((int(c['laps_data']['lap'].max()) for c in cls['cars'] if len(c['laps_data'])), default=1)
+
+        lines = []
+        for n, car in enumerate(cls['cars']):
+            laps = car['laps_data']
+            times = clean[n]
+            median = int(np.median(times)) if len(times) else 0
+            steady = times[times <= median * 1.07] if median else times
+            car.update({
+                'best': format_lap_time(int(times.min())) if len(times) else "-",
+                'median': format_lap_time(median),
+                'stddev': f"{steady.std() / 10000:.3f}s" if len(steady) > 1 else "-",
+                'clean_laps': int(len(times)),
+                'total_laps': int((laps['lap'] > 0).sum()),
+                'pits': int(((laps['flags'] & LAP_EVENT_FLAGS['pitted']) != 0).sum()),
+            })
+            # Stint-Leiste: Breite nach Runden, Farbe nach Fahrer
+            car_stints = stints['cars'].get(car['key'], {}).get('stints', [])
+            total = sum(st['laps'] for st in car_stints) or 1
+            driver_order = list(dict.fromkeys(st['cust_id'] for st in car_stints))
+            car['timeline'] = [{'driver': st['driver'], 'laps': st['laps'], 'start_lap': st['start_lap'],
+                                'end_lap': st['end_lap'], 'pct': round(st['laps'] / total * 100, 2),
+                                'color': PACE_COLORS[driver_order.index(st['cust_id']) % len(PACE_COLORS)]}
+                               for st in car_stints]
+            car['driver_changes'] = stints['cars'].get(car['key'], {}).get('driver_changes', 0)
+            if n >= PACE_MAX_CARS or not y_min:
+                continue
+            mask = clean_lap_mask(laps, y_max)
+            xs = laps['lap'] / max(max_lap, 1) * PACE_CHART_WIDTH
+            ys = (laps['lap_time'] - y_min) / max(y_max - y_min, 1) * PACE_CHART_HEIGHT
+            segments, current = [], []
+            for ok, x, y in zip(mask.tolist(), xs.tolist(), ys.tolist()):
+                if ok:
+                    current.append(f"{x:.1f},{y:.1f}")
+                elif current:
+                    segments.append(" ".join(current))
+                    current = []
+            if current:
+                segments.append(" ".join(current))
+            lines.append({'key': car['key'], 'name': car['name'], 'color': PACE_COLORS[n % len(PACE_COLORS)],
+                          'segments': [s for s in segments if ' ' in s]})
+
+        cls['chart'] = {
+            'width': PACE_CHART_WIDTH, 'height': PACE_CHART_HEIGHT, 'lines': lines, 'max_lap': max_lap,
+            'y_ticks': [{'y': round(PACE_CHART_HEIGHT * f, 1), 'label': format_lap_time(int(y_min + (y_max - y_min) * f))}
+                        for f in (0, 0.25, 0.5, 0.75, 1)] if y_min else [],
+        }
+        for car in cls['cars']:
+            del car['laps_data']
+
+    return {
+        'info': {
+            'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}",
+            'date': file_meta.get('date') or 'Unknown Date',
+            'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
+        },
+        'classes': sorted(classes.values(), key=lambda c: c['name']),
+        'lap_count': index['laps'],
+        'source': index.get('source'),
+    }
+
+def build_car_lap_list(filename, car_key):
+    # Rundenliste eines Autos mit Fahrer, Zeit, Position und Ereignissen
+    index = load_lap_index(filename)
+    car = index['cars'].get(str(car_key))
+    if not car:
+        return None
+    laps = load_car_laps(filename, car_key, index)
+    times = format_lap_times(laps['lap_time'])
+    flag_names = [(bit, name) for name, bit in LAP_EVENT_FLAGS.items()]
+    lap_list = []
+    for lap, time_str, cust_id, position, flags, incident in zip(laps['lap'].tolist(), times, laps['cust_id'].tolist(),
+                                                                laps['position'].tolist(), laps['flags'].tolist(),
+                                                                laps['incident'].tolist()):
+        lap_list.append({'lap': lap, 'time': time_str, 'driver': car['drivers'].get(str(cust_id), ''),
+                         'position': position, 'incident': bool(incident),
+                         'events': [name for bit, name in flag_names if flags & bit]})
+    return {'key': str(car_key), 'name': car['name'], 'car_number': car.get('car_number'), 'laps': lap_list}
+
+@app.route('/results/view/<filename>/pace')
+def public_result_pace(filename):
+    filepath = os.path.join(app.config['RESULTS_FOLDER'], secure_filename(filename))
+    if not os.path.exists(filepath) or not has_lap_data(filename):
+        flash("Für dieses Ergebnis gibt es keine Rundendaten.", "error")
+        return redirect(url_for('public_result_detail', filename=filename))
+
+    file_meta = load_results_meta().get(filename, {})
+    try:
+        st = os.stat(filepath)
+        lap_st = os.stat(lap_store_path(filename))
+        view = cached_artifact(f"result-pace:{secure_filename(filename)}",
+                               (st.st_mtime_ns, st.st_size, lap_st.st_mtime_ns, lap_st.st_size,
+                                GENERATIONS.get('results_meta')),
+                               lambda: build_pace_view(filename, filepath, file_meta))
+        selected = build_car_lap_list(filename, request.args['car']) if request.args.get('car') else None
+        selected_stints = (stint_analysis(filename) or {'cars': {}})['cars'].get(selected['key']) if selected else None
+        return render_template('result_pace.html', filename=filename, selected=selected,
+                               selected_stints=selected_stints, **view)
+    except Exception as e:
+        flash(f"Fehler beim Lesen der Rundendaten: {e}", "error")
+        return redirect(url_for('public_result_detail', filename=filename))
+
+# --- Splits zusammenführen ---
+# Große Special Events (Daytona 24h, ...) laufen in mehreren Splits, jede Split ist eine eigene Ergebnisdatei.
+# Dateien mit denselben associated_subsession_ids bilden ein virtuelles Event. Die zusammengeführte Ansicht
+# (Klassenwertung über alle Splits nach Runden und Renndauer, SOF je Split) wird als Artefakt gebaut und
+# bleibt gültig, bis sich eine der Dateien oder die Fahrerliste ändert.
+def result_header(filepath):
+    """Kopfdaten einer Ergebnisdatei (Subsession, Splits, SOF), als Artefakt. Gelesen werden nur die Kopffelder."""
+    st = os.stat(filepath)
+    def build():
+        data = load_result_head(filepath)
+        return {'subsession_id': data.get('subsession_id'),
+                'associated': sorted(data.get('associated_subsession_ids') or []),
+                'splits': [{'subsession_id': s.get('subsession_id'), 'sof': s.get('event_strength_of_field')}
+                           for s in data.get('session_splits') or []],
+                'sof': data.get('event_strength_of_field'),
+                'class_sof': {c.get('car_class_id'): c.get('strength_of_field') for c in data.get('car_classes') or []},
+                'series': data.get('league_name') or data.get('series_name'),
+                'track': data.get('track', {}).get('track_name'),
+                'start_time': data.get('start_time')}
+    return cached_artifact(f"result-header:{os.path.basename(filepath)}", (st.st_mtime_ns, st.st_size), build)
+
+def split_event_key(header):
+    return f"{header['associated'][0]}-{len(header['associated'])}" if len(header['associated']) > 1 else None
+
+@shared_data('split_events', deps=('results',))
+def build_split_events():
+    # Event-Key -> Ergebnisdateien der Splits, die wir haben (nach Split-Nummer sortiert)
+    events = {}
+    if os.path.exists(RESULTS_FOLDER):
+        for filename in sorted(os.listdir(RESULTS_FOLDER)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                header = result_header(os.path.join(RESULTS_FOLDER, filename))
+            except Exception as e:
+                print(f"Kopfdaten von {filename} nicht lesbar: {e}")
+                continue
+            key = split_event_key(header)
+            if key:
+                events.setdefault(key, {'key': key, 'subsession_ids': header['associated'], 'files': {}})
+                events[key]['files'][str(header['subsession_id'])] = filename
+    return events
+
+def build_split_view(event):
+    files = [(sid, event['files'].get(str(sid))) for sid in event['subsession_ids']]
+    rdf_names = {d.get('name') for d in load_drivers()}
+    splits, tables = [], []
+    first_header = None
+    for number, (sid, filename) in enumerate(files, 1):
+        header = result_header(os.path.join(RESULTS_FOLDER, filename)) if filename else None
+        first_header = first_header or header
+        split_sof = next((s['sof'] for s in header['splits'] if s['subsession_id'] == sid), None) if header else None
+        splits.append({'number': number, 'subsession_id': sid, 'filename': filename,
+                       'sof': split_sof or (header or {}).get('sof'), 'class_sof': (header or {}).get('class_sof', {})})
+        if filename:
+            race_table, _ = load_session_tables(os.path.join(RESULTS_FOLDER, filename))
+            if race_table and len(race_table):
+                tables.append((number, race_table))
+    if not tables:
+        return {'splits': splits, 'classes': [], 'info': {}}
+
+    # Alle Splits zu einer Tabelle: Runden absteigend, dann geschätzte Renndauer (Ø Runde x Runden)
+    split_no = np.concatenate([np.full(len(t), n) for n, t in tables])
+    row_no = np.concatenate([np.arange(len(t)) for _, t in tables])
+    laps = np.concatenate([t.laps_complete for _, t in tables])
+    class_id = np.concatenate([t.car_class_id for _, t in tables])
+    race_time = np.concatenate([t.average_lap * t.laps_complete for _, t in tables])
+    race_time = np.where(race_time > 0, race_time, np.iinfo(np.int64).max)
+    order = np.lexsort((race_time, -laps, class_id))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = class_id[order][1:] != class_id[order][:-1]
+    group = np.cumsum(first) - 1
+    leader = order[np.flatnonzero(first)][group]
+    laps_down = laps[leader] - laps[order]
+    time_gap = np.where(race_time[order] < np.iinfo(np.int64).max, race_time[order] - race_time[leader], 0)
+    gap_text = format_gaps(time_gap)
+    position = np.arange(len(order)) - np.flatnonzero(first)[group] + 1
+
+    table_by_split = dict(tables)
+    classes = {}
+    for k, idx in enumerate(order.tolist()):
+        table = table_by_split[int(split_no[idx])]
+        entry = table.rows[int(row_no[idx])]
+        cid = entry.get('car_class_id')
+        cls = classes.setdefault(cid, {'id': cid, 'name': entry.get('car_class_short_name') or "Unknown", 'rows': []})
+        names = {entry.get('display_name')} | {d.get('display_name') for d in entry.get('driver_results') or []}
+        down = int(laps_down[k])
+        cls['rows'].append({
+            'pos': int(position[k]), 'split': int(split_no[idx]),
+            'split_pos': int(table.class_position[int(row_no[idx])]) + 1,
+            'split_sof': splits[int(split_no[idx]) - 1]['class_sof'].get(cid) or splits[int(split_no[idx]) - 1]['sof'],
+            'name': entry.get('display_name'), 'car_number': entry.get('livery', {}).get('car_number', '#'),
+            'laps': int(laps[idx]),
+            'gap': "-" if position[k] == 1 else (format_laps_down(down) if down > 0 else gap_text[k]),
+            'best_lap': format_lap_time(entry.get('best_lap_time', 0)),
+            'avg_lap': format_lap_time(entry.get('average_lap', 0)),
+            'inc': entry.get('incidents', 0),
+            'is_rdf': bool(names & rdf_names) or "RaceDayFriends" in str(entry.get('display_name')),
+        })
+
+    return {'splits': splits, 'classes': sorted(classes.values(), key=lambda c: c['name']),
+            'info': {'series': first_header['series'], 'track': first_header['track'],
+                     'date': (first_header['start_time'] or '')[:10]}}
+
+@app.route('/results/event/<event_key>')
+def public_split_event(event_key):
+    event = get_shared('split_events').get(event_key)
+    if not event:
+        flash("Event nicht gefunden.", "error")
+        return redirect(url_for('public_results'))
+    try:
+        version = [GENERATIONS.get('drivers')]
+        for filename in event['files'].values():
+            st = os.stat(os.path.join(RESULTS_FOLDER, filename))
+            version.append((filename, st.st_mtime_ns, st.st_size))
+        view = cached_artifact(f"split-event:{event_key}", tuple(version), lambda: build_split_view(event))
+        return render_template('result_splits.html', event_key=event_key, **view)
+    except Exception as e:
+        flash(f"Fehler beim Zusammenführen der Splits: {e}", "error")
+        return redirect(url_for('public_results'))
+
 @app.route('/results/view/<filename>/driver/<int:cust_id>')
 def public_result_driver(filename, cust_id):
     filepath = os.path.join(app.config['RESULTS_FOLDER'], secure_filename(filename))
@@ -1139,63 +4242,53 @@ def public_result_driver(filename, cust_id):
     file_meta = meta.get(filename, {})
     
     try:
-        with open(filepath, 'r') as f:
-            full_data = json.load(f)
-            data = full_data.get('data', {})
+        data = load_result_head(filepath)
             
-            # Basic Info
-            result_info = {
-                'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
-                'config': data.get('track', {}).get('config_name'),
-                'series': file_meta.get('series') or data.get('series_name'),
-                'date': file_meta.get('date') or 'Unknown Date',
-                'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}"
-            }
+        # Basic Info
+        result_info = {
+            'track': file_meta.get('track') or data.get('track', {}).get('track_name'),
+            'config': data.get('track', {}).get('config_name'),
+            'series': file_meta.get('series') or data.get('series_name'),
+            'date': file_meta.get('date') or 'Unknown Date',
+            'title': file_meta.get('title') or f"{data.get('series_name')} @ {data.get('track', {}).get('track_name')}"
+        }
             
-            # Find Race Session
-            sessions = data.get('session_results', [])
-            race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), sessions[-1] if sessions else None)
+        # Find Race Session
+        race_table, _ = load_session_tables(filepath)
             
-            if not race_session:
-                flash("Keine Rennsession gefunden.", "error")
-                return redirect(url_for('public_result_detail', filename=filename))
+        if not race_table:
+            flash("Keine Rennsession gefunden.", "error")
+            return redirect(url_for('public_result_detail', filename=filename))
                 
-            # Find Driver Result
-            driver_result = next((r for r in race_session.get('results', []) if r.get('cust_id') == cust_id), None)
+        # Find Driver Result (nur Einzelfahrer-Zeilen, wie bisher)
+        row, team_driver = race_table.locate(cust_id)
+        driver_result = race_table.rows[row] if row is not None and team_driver is None else None
             
-            if not driver_result:
-                flash("Fahrer in diesem Ergebnis nicht gefunden.", "error")
-                return redirect(url_for('public_result_detail', filename=filename))
+        if not driver_result:
+            flash("Fahrer in diesem Ergebnis nicht gefunden.", "error")
+            return redirect(url_for('public_result_detail', filename=filename))
                 
-            # Helper for time formatting
-            def format_time(val):
-                if val <= 0: return "-"
-                seconds = val / 10000
-                minutes = int(seconds // 60)
-                rem_seconds = seconds % 60
-                return f"{minutes}:{rem_seconds:06.3f}"
-            
-            # Statistics from driver_result
-            stats = {
-                'pos': driver_result.get('finish_position', 0) + 1,
-                'class_pos': driver_result.get('finish_position_in_class', 0) + 1,
-                'car': driver_result.get('car_name', 'Unknown'),
-                'number': driver_result.get('livery', {}).get('car_number', '#'),
-                'laps_completed': driver_result.get('laps_complete', 0),
-                'inc': driver_result.get('incidents', 0),
-                'best_lap': format_time(driver_result.get('best_lap_time', 0)),
-                'avg_lap': format_time(driver_result.get('average_lap', 0)),
-                'qual_lap': format_time(driver_result.get('best_qual_lap_at', 0)), # might be 0 if no qual
-                'reason_out': driver_result.get('reason_out', 'Running'),
-                'champ_points': driver_result.get('champ_points', 0)
-            }
+        # Statistics from driver_result
+        stats = {
+            'pos': driver_result.get('finish_position', 0) + 1,
+            'class_pos': driver_result.get('finish_position_in_class', 0) + 1,
+            'car': driver_result.get('car_name', 'Unknown'),
+            'number': driver_result.get('livery', {}).get('car_number', '#'),
+            'laps_completed': driver_result.get('laps_complete', 0),
+            'inc': driver_result.get('incidents', 0),
+            'best_lap': format_lap_time(driver_result.get('best_lap_time', 0)),
+            'avg_lap': format_lap_time(driver_result.get('average_lap', 0)),
+            'qual_lap': format_lap_time(driver_result.get('best_qual_lap_time', 0)), # might be 0 if no qual
+            'reason_out': driver_result.get('reason_out', 'Running'),
+            'champ_points': driver_result.get('champ_points', 0)
+        }
             
-            return render_template('boxengasse_result_driver.html', 
-                                 info=result_info, 
-                                 stats=stats,
-                                 driver_name=driver_result.get('display_name'),
-                                 filename=filename,
-                                 public=True) # Flag for template to adjust links
+        return render_template('boxengasse_result_driver.html', 
+                             info=result_info, 
+                             stats=stats,
+                             driver_name=driver_result.get('display_name'),
+                             filename=filename,
+                             public=True) # Flag for template to adjust links
                                  
     except Exception as e:
         flash(f"Fehler: {e}", "error")
@@ -1264,21 +4357,14 @@ def upload_livery():
         file = request.files['livery_file']
         if file and file.filename != '':
             # Erlaube auch .tga, .mip, .psd etc.
-            filename = secure_filename(file.filename)
-            ts = int(datetime.now().timestamp())
-            filename = f"livery_{ts}_{filename}"
-            
-            if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                os.makedirs(app.config['UPLOAD_FOLDER'])
-                
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            livery_id = str(uuid.uuid4())
+            stored_filename = store_upload(file, f"livery:{livery_id}")
             
             liveries = load_liveries()
             new_livery = {
-                "id": str(uuid.uuid4()),
+                "id": livery_id,
                 "filename": file.filename, # Original Name für Anzeige
-                "url": url_for('static', filename=f'uploads/{filename}'),
+                "url": upload_url(stored_filename),
                 "car_model": car_model,
                 "uploaded_by": driver['name'],
                 "uploader_id": str(driver_id),
@@ -1306,11 +4392,7 @@ def delete_livery(livery_id):
         if is_admin or str(livery.get('uploader_id')) == driver_id:
             # Datei löschen
             try:
-                # URL parsen um Dateinamen zu bekommen
-                filename = livery['url'].split('/')[-1]
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+                release_upload(livery['url'], f"livery:{livery_id}", delete_legacy=True)
             except Exception as e:
                 print(f"Fehler beim Löschen der Livery Datei: {e}")
                 
@@ -1342,8 +4424,12 @@ def new_team_message():
             "content": content,
             "date": datetime.now().isoformat()
         }
+        # Die Nachricht zeigt auf das Profilbild -> Referenz halten, falls das Bild später ersetzt wird
+        add_upload_ref(new_msg['driver_image'], f"message:{new_msg['id']}")
         
         msgs.insert(0, new_msg)
+        for old_msg in msgs[50:]:
+            release_upload(old_msg.get('driver_image'), f"message:{old_msg.get('id')}")
         msgs = msgs[:50]
         save_messages(msgs)
         flash("Nachricht gepostet!", "success")
@@ -1360,6 +4446,7 @@ def delete_team_message(msg_id):
     
     if msg:
         if str(msg.get('driver_id')) == driver_id:
+            release_upload(msg.get('driver_image'), f"message:{msg_id}")
             msgs.remove(msg)
             save_messages(msgs)
             flash("Nachricht gelöscht.", "success")
@@ -1397,19 +4484,12 @@ def save_rig():
         
         for file in files:
             if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                ts = int(datetime.now().timestamp())
-                filename = f"rig_{driver_id}_{ts}_{filename}"
-                
-                if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                    os.makedirs(app.config['UPLOAD_FOLDER'])
-                    
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                new_images.append(url_for('static', filename=f'uploads/{filename}'))
+                new_images.append(upload_url(store_upload(file, f"driver:{driver_id}")))
         
         # Nur ersetzen, wenn neue Bilder hochgeladen wurden
         if new_images:
+            for old_url in driver['rig'].get('images', []):
+                release_upload(old_url, f"driver:{driver_id}")
             driver['rig']['images'] = new_images
 
     save_drivers(drivers)
@@ -1431,10 +4511,7 @@ def delete_rig_image():
     
     if driver and 'rig' in driver and 'images' in driver['rig']:
         if 0 <= index < len(driver['rig']['images']):
-            # Optional: Datei vom Server löschen (wenn man ganz sauber sein will)
-            # image_path = ...
-            # os.remove(image_path)
-            
+            release_upload(driver['rig']['images'][index], f"driver:{driver_id}")
             del driver['rig']['images'][index]
             save_drivers(drivers)
             flash("Bild gelöscht!", "success")
@@ -1475,18 +4552,14 @@ def save_profil():
     if 'driver_image' in request.files:
         file = request.files['driver_image']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            ts = int(datetime.now().timestamp())
-            filename = f"driver_{driver_id}_{ts}_{filename}"
+            stored_filename = store_upload(file, f"driver:{driver_id}")
             
-            if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                os.makedirs(app.config['UPLOAD_FOLDER'])
-                
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Ein noch nicht freigegebenes Bild wird ersetzt
+            if driver.get('pending_image_url'):
+                release_upload(driver['pending_image_url'], f"driver:{driver_id}")
             
             # NICHT sofort live schalten, sondern als Pending markieren
-            driver['pending_image_url'] = url_for('static', filename=f'uploads/{filename}')
+            driver['pending_image_url'] = upload_url(stored_filename)
             flash("Profilbild hochgeladen! Es wird vom Admin geprüft und dann freigeschaltet.", "info")
     
     save_drivers(drivers)
@@ -1597,7 +4670,9 @@ def approve_image(driver_id):
     driver = next((d for d in drivers if str(d['id']) == str(driver_id)), None)
     
     if driver and driver.get('pending_image_url'):
-        # Pending -> Live
+        # Pending -> Live (Referenz auf das alte Bild freigeben)
+        if driver.get('image_url'):
+            release_upload(driver['image_url'], f"driver:{driver_id}")
         driver['image_url'] = driver['pending_image_url']
         del driver['pending_image_url']
         save_drivers(drivers)
@@ -1616,14 +4691,8 @@ def reject_image(driver_id):
     if driver and driver.get('pending_image_url'):
         # Datei auch vom Server löschen
         try:
-            pending_url = driver['pending_image_url']
-            # URL ist z.B. /static/uploads/filename.png -> wir brauchen nur filename
-            filename = pending_url.split('/')[-1]
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f"Gelöscht: {filepath}")
+            if release_upload(driver['pending_image_url'], f"driver:{driver_id}", delete_legacy=True):
+                print(f"Gelöscht: {driver['pending_image_url']}")
         except Exception as e:
             print(f"Fehler beim Löschen der Datei: {e}")
 
@@ -1636,11 +4705,98 @@ def reject_image(driver_id):
         
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/uploads/gc')
+@login_required
+def admin_upload_gc():
+    dry_run = request.args.get('dry_run') == '1'
+    try:
+        report = collect_upload_garbage(quarantine=True, dry_run=dry_run)
+        mb = report['bytes_quarantined'] / 1024 / 1024
+        if dry_run:
+            flash(f"Aufräumen (Test): {report['removed']} ungenutzte Dateien ({mb:.1f} MB) gefunden.", "info")
+        else:
+            flash(f"Aufräumen: {report['removed']} ungenutzte Dateien ({mb:.1f} MB) in die Quarantäne verschoben, "
+                  f"{report['bytes_reclaimed'] / 1024 / 1024:.1f} MB aus alter Quarantäne freigegeben.", "success")
+    except Exception as e:
+        flash(f"Fehler beim Aufräumen: {e}", "error")
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    hours = request.args.get('hours', 24, type=int)
+    routes = load_metrics(hours=hours)
+    uploads = list(UPLOAD_STATS)[::-1]
+    return render_template('admin_metrics.html', routes=routes, hours=hours, uploads=uploads,
+                           buckets=LATENCY_BUCKETS_MS, startup=STARTUP_TIMINGS)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Admin-Session oder Token (X-API-Key / Bearer), Token nur wenn METRICS_TOKEN gesetzt ist
+    token = request.headers.get('X-API-Key') or request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+    token_ok = bool(METRICS_TOKEN and token) and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+    if 'admin_logged_in' not in session and not token_ok:
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+
+    def label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+    lines = ["# HELP rdf_request_duration_ms Request-Latenz pro Endpoint.", "# TYPE rdf_request_duration_ms histogram"]
+    routes = load_metric_totals()
+    for r in routes:
+        cumulative = 0
+        for le, n in zip([str(b) for b in LATENCY_BUCKETS_MS] + ['+Inf'], r['buckets']):
+            cumulative += n
+            lines.append(f'rdf_request_duration_ms_bucket{{endpoint="{label(r["endpoint"])}",le="{le}"}} {cumulative}')
+        lines.append(f'rdf_request_duration_ms_sum{{endpoint="{label(r["endpoint"])}"}} {r["sum_ms"]:.3f}')
+        lines.append(f'rdf_request_duration_ms_count{{endpoint="{label(r["endpoint"])}"}} {r["count"]}')
+    for name in METRIC_COUNTERS:
+        lines.append(f"# TYPE rdf_{name}_total counter")
+        for r in routes:
+            lines.append(f'rdf_{name}_total{{endpoint="{label(r["endpoint"])}"}} {r[name]:g}')
+
+    # Upload-Durchsatz: Zähler dieses Workers seit Prozessstart (Reset beim Neustart erkennt Prometheus)
+    lines.append("# TYPE rdf_upload_bytes_total counter")
+    lines.append("# TYPE rdf_upload_seconds_total counter")
+    for endpoint, (size, seconds) in sorted(UPLOAD_TOTALS.items()):
+        lines.append(f'rdf_upload_bytes_total{{endpoint="{label(endpoint)}",worker="{os.getpid()}"}} {size}')
+        lines.append(f'rdf_upload_seconds_total{{endpoint="{label(endpoint)}",worker="{os.getpid()}"}} {seconds:.3f}')
+    lines.append("# TYPE rdf_startup_phase_ms gauge")
+    for t in STARTUP_TIMINGS:
+        lines.append(f'rdf_startup_phase_ms{{phase="{label(t["phase"])}"}} {t["ms"]}')
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    return render_template('admin_profiles.html', profiles=load_profiles(), profile=None)
+
+@app.route('/admin/profiles/<name>')
+@login_required
+def admin_profile_detail(name):
+    filepath = os.path.join(PROFILES_FOLDER, secure_filename(name) + '.json')
+    if not os.path.exists(filepath):
+        flash("Profil nicht gefunden.", "error")
+        return redirect(url_for('admin_profiles'))
+    with open(filepath, 'r') as f:
+        profile = json.load(f)
+    return render_template('admin_profiles.html', profiles=load_profiles(), profile=profile)
+
+@app.route('/admin/profiles/<name>/folded')
+@login_required
+def admin_profile_folded(name):
+    filepath = os.path.join(PROFILES_FOLDER, secure_filename(name) + '.folded')
+    if not os.path.exists(filepath):
+        flash("Profil nicht gefunden.", "error")
+        return redirect(url_for('admin_profiles'))
+    return send_file(filepath, mimetype='text/plain', as_attachment=True, download_name=f"{secure_filename(name)}.folded")
+
 @app.route('/admin/settings')
 @login_required
 def admin_settings():
     config = load_config()
-    return render_template('admin_settings.html', config=config)
+    return render_template('admin_settings.html', config=config, standings=standings_settings(config),
+                           points_systems=POINTS_SYSTEMS, drop_rules=DROP_RULES)
 
 @app.route('/admin/settings/save', methods=['POST'])
 @login_required
@@ -1659,7 +4815,7 @@ def admin_settings_save():
                 os.makedirs(app.config['UPLOAD_FOLDER'])
                 
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            save_upload_to(file, filepath)
             
             config['nav_logo_url'] = url_for('static', filename=f'uploads/{filename}')
             flash("Nav Logo aktualisiert!", "success")
@@ -1670,6 +4826,15 @@ def admin_settings_save():
     config['social_twitter'] = request.form.get('social_twitter')
     config['social_twitch'] = request.form.get('social_twitch')
     config['social_youtube'] = request.form.get('social_youtube')
+
+    # Meisterschaft: Punktesystem und Streichresultate
+    if 'standings_points_system' in request.form:
+        config['standings'] = {
+            'points_system': request.form.get('standings_points_system'),
+            'points_table': request.form.get('standings_points_table', ''),
+            'drop_rule': request.form.get('standings_drop_rule'),
+            'drop_count': request.form.get('standings_drop_count', type=int, default=0),
+        }
             
     save_config(config)
     return redirect(url_for('admin_settings'))
@@ -1805,17 +4970,10 @@ def admin_event_save():
     if 'event_image' in request.files:
         file = request.files['event_image']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            ts = int(datetime.now().timestamp())
-            filename = f"event_{event_id}_{ts}_{filename}"
-            
-            if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                os.makedirs(app.config['UPLOAD_FOLDER'])
-                
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            event['image_url'] = url_for('static', filename=f'uploads/{filename}')
+            stored_filename = store_upload(file, f"event:{event_id}")
+            if event.get('image_url'):
+                release_upload(event['image_url'], f"event:{event_id}")
+            event['image_url'] = upload_url(stored_filename)
     
     # Drivers
     event['drivers'] = request.form.getlist('driver_ids')
@@ -1828,6 +4986,9 @@ def admin_event_save():
 @login_required
 def admin_event_delete(event_id):
     events = load_events()
+    for e in events:
+        if e['id'] == event_id and e.get('image_url'):
+            release_upload(e['image_url'], f"event:{event_id}")
     events = [e for e in events if e['id'] != event_id]
     save_events(events)
     flash("Event gelöscht.", "info")
@@ -1835,7 +4996,7 @@ def admin_event_delete(event_id):
 
 @app.route('/calendar')
 def calendar():
-    events = load_events()
+    events = [entry['event'] for entry in get_shared('event_timeline')]
     now = datetime.now().isoformat()
     
     # Aufteilen in Upcoming und Past
@@ -1893,99 +5054,65 @@ def event_detail(event_id):
         try:
             filepath = os.path.join(app.config['RESULTS_FOLDER'], secure_filename(event['result_file']))
             if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    
-                    # Get RDF Driver Names from Event Lineup
-                    rdf_names = [d['name'] for d in event_drivers]
+                race_table, _ = load_session_tables(filepath)
                     
-                    # Find these drivers in the result
-                    sessions = data.get('data', {}).get('session_results', [])
-                    race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), sessions[-1] if sessions else None)
+                # Get RDF Driver Names from Event Lineup
+                rdf_names = [d['name'] for d in event_drivers]
                     
-                    if race_session:
-                        # 1. Identify Class Winners (for Laps Down calculation)
-                        class_winners = {} # class_id -> max_laps
-                        for entry in race_session.get('results', []):
-                            cid = entry.get('car_class_id')
-                            laps = entry.get('laps_complete', 0)
-                            if cid not in class_winners or laps > class_winners[cid]:
-                                class_winners[cid] = laps
-
-                        # Helper
-                        def format_time(val):
-                            if val <= 0: return "-"
-                            seconds = val / 10000
-                            minutes = int(seconds // 60)
-                            rem_seconds = seconds % 60
-                            return f"{minutes}:{rem_seconds:06.3f}"
-
-                        for entry in race_session.get('results', []):
-                            is_rdf = False
-                            # Check main driver name
-                            if entry.get('display_name') in rdf_names:
-                                is_rdf = True
+                if race_table:
+                    # Abstände in der Klasse (inkl. Runden-Rückstand) und beste Runden für alle Zeilen
+                    class_gaps = race_table.class_gaps(leader="Winner")
+                    best_laps = race_table.best_laps()
+                    class_positions = (race_table.class_position + 1).tolist()
+
+                    for i, entry in enumerate(race_table.rows):
+                        is_rdf = False
+                        # Check main driver name
+                        if entry.get('display_name') in rdf_names:
+                            is_rdf = True
                             
-                            # Check team drivers
-                            drivers_details = []
-                            if entry.get('driver_results'):
-                                for d in entry.get('driver_results'):
-                                    dname = d.get('display_name')
+                        # Check team drivers
+                        drivers_details = []
+                        if entry.get('driver_results'):
+                            for d in entry.get('driver_results'):
+                                dname = d.get('display_name')
                                     
-                                    drivers_details.append({
-                                        'name': dname,
-                                        'best_lap': format_time(d.get('best_lap_time', 0)),
-                                        'laps': d.get('laps_complete', 0),
-                                        'inc': d.get('incidents', 0)
-                                    })
-                                    
-                                    if dname in rdf_names:
-                                        is_rdf = True
-                            else:
-                                # Single driver entry
-                                dname = entry.get('display_name')
                                 drivers_details.append({
                                     'name': dname,
-                                    'best_lap': format_time(entry.get('best_lap_time', 0)),
-                                    'laps': entry.get('laps_complete', 0),
-                                    'inc': entry.get('incidents', 0)
+                                    'best_lap': format_lap_time(d.get('best_lap_time', 0)),
+                                    'laps': d.get('laps_complete', 0),
+                                    'inc': d.get('incidents', 0)
                                 })
+                                    
+                                if dname in rdf_names:
+                                    is_rdf = True
+                        else:
+                            # Single driver entry
+                            dname = entry.get('display_name')
+                            drivers_details.append({
+                                'name': dname,
+                                'best_lap': best_laps[i],
+                                'laps': entry.get('laps_complete', 0),
+                                'inc': entry.get('incidents', 0)
+                            })
                             
-                            # Also check if "RaceDayFriends" is in team name (if available) or just assume matched by driver
-                            # If no drivers matched but we want to be sure, maybe check 'team_name'? 
-                            # But 'display_name' is often the team name in team events.
-                            if "RaceDayFriends" in str(entry.get('display_name')):
-                                is_rdf = True
+                        # Also check if "RaceDayFriends" is in team name (if available) or just assume matched by driver
+                        # If no drivers matched but we want to be sure, maybe check 'team_name'? 
+                        # But 'display_name' is often the team name in team events.
+                        if "RaceDayFriends" in str(entry.get('display_name')):
+                            is_rdf = True
                             
-                            if is_rdf:
-                                # Calc Gap
-                                cid = entry.get('car_class_id')
-                                winner_laps = class_winners.get(cid, 0)
-                                laps = entry.get('laps_complete', 0)
-                                class_interval = entry.get('class_interval', 0)
-                                
-                                gap_str = "-"
-                                if laps < winner_laps:
-                                    gap_str = f"+{winner_laps - laps} Laps"
-                                elif class_interval > 0:
-                                    seconds = class_interval / 10000
-                                    if seconds > 60:
-                                         gap_str = f"+{int(seconds//60)}:{seconds%60:05.2f}"
-                                    else:
-                                         gap_str = f"+{seconds:.3f}s"
-                                elif class_interval == 0 and laps == winner_laps:
-                                    gap_str = "Winner"
-
-                                rdf_result_summary.append({
-                                    'pos': entry.get('finish_position_in_class', entry.get('position', 0) + 1) + 1,
-                                    'class': entry.get('car_class_short_name'),
-                                    'car_number': entry.get('livery', {}).get('car_number', '#'),
-                                    'inc': entry.get('incidents', 0),
-                                    'laps': laps,
-                                    'gap': gap_str,
-                                    'best_lap': format_time(entry.get('best_lap_time', 0)),
-                                    'drivers': drivers_details
-                                })
+                        if is_rdf:
+                            rdf_result_summary.append({
+                                'pos': class_positions[i],
+                                'class': entry.get('car_class_short_name'),
+                                'car_number': entry.get('livery', {}).get('car_number', '#'),
+                                'inc': entry.get('incidents', 0),
+                                'laps': entry.get('laps_complete', 0),
+                                'gap': class_gaps[i],
+                                'best_lap': best_laps[i],
+                                'drivers': drivers_details
+                            })
         except Exception as e:
             print(f"Error loading result summary: {e}")
 
@@ -2032,7 +5159,7 @@ def update_hero():
                 filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 print(f"Versuche zu speichern nach: {filepath}") # Debug
                 try:
-                    file.save(filepath)
+                    save_upload_to(file, filepath)
                     print("Speichern erfolgreich!") # Debug
                     
                     # Pfad in Config speichern
@@ -2114,17 +5241,6 @@ def admin_driver_new():
 def admin_driver_edit(driver_id):
     # Wir laden die gespeicherten Rohdaten, nicht die angereicherten
     drivers_raw = load_drivers()
-    
-    # Check ob drivers_raw eine Liste von Objekten oder IDs ist
-    # Migration: Wenn es IDs sind, konvertieren wir sie on-the-fly zu Objekten
-    if drivers_raw and isinstance(drivers_raw[0], int):
-        # Alte Struktur -> Konvertierung
-        new_list = []
-        for d_id in drivers_raw:
-             new_list.append({"id": str(d_id), "iracing_id": str(d_id), "name": f"Driver {d_id}"})
-        drivers_raw = new_list
-        save_drivers(drivers_raw)
-
     driver = next((d for d in drivers_raw if str(d.get('id')) == str(driver_id)), None)
     
     if not driver:
@@ -2137,13 +5253,6 @@ def admin_driver_edit(driver_id):
 @login_required
 def admin_driver_save():
     drivers = load_drivers()
-    
-    # Migration Check
-    if drivers and isinstance(drivers[0], int):
-        new_list = []
-        for d_id in drivers:
-             new_list.append({"id": str(d_id), "iracing_id": str(d_id), "name": f"Driver {d_id}"})
-        drivers = new_list
 
     mode = request.form.get('mode')
     driver_id = request.form.get('id')
@@ -2182,17 +5291,10 @@ def admin_driver_save():
     if 'driver_image' in request.files:
         file = request.files['driver_image']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            ts = int(datetime.now().timestamp())
-            filename = f"driver_{driver_id}_{ts}_{filename}"
-            
-            if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                os.makedirs(app.config['UPLOAD_FOLDER'])
-                
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            driver['image_url'] = url_for('static', filename=f'uploads/{filename}')
+            stored_filename = store_upload(file, f"driver:{driver_id}")
+            if driver.get('image_url'):
+                release_upload(driver['image_url'], f"driver:{driver_id}")
+            driver['image_url'] = upload_url(stored_filename)
 
     save_drivers(drivers)
     flash("Fahrer gespeichert!", "success")
@@ -2202,9 +5304,11 @@ def admin_driver_save():
 @login_required
 def admin_driver_delete(driver_id):
     drivers = load_drivers()
-    # Migration Check
-    if drivers and isinstance(drivers[0], int):
-        drivers = [{"id": str(d), "iracing_id": str(d)} for d in drivers]
+
+    for d in drivers:
+        if str(d.get('id')) == str(driver_id):
+            for url in [d.get('image_url'), d.get('pending_image_url')] + d.get('rig', {}).get('images', []):
+                release_upload(url, f"driver:{driver_id}")
         
     drivers = [d for d in drivers if str(d.get('id')) != str(driver_id)]
     save_drivers(drivers)
@@ -2318,7 +5422,7 @@ def admin_news_save():
                 os.makedirs(app.config['UPLOAD_FOLDER'])
                 
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            save_upload_to(file, filepath)
             
             news_item['image_url'] = url_for('static', filename=f'uploads/{filename}')
 
@@ -2350,7 +5454,8 @@ def admin_results():
                     results.append({
                         'filename': filename,
                         'size': f"{size_kb:.1f} KB",
-                        'date': mod_time
+                        'date': mod_time,
+                        'has_laps': has_lap_data(filename)
                     })
                 except Exception as e:
                     print(f"Fehler bei Datei {filename}: {e}")
@@ -2373,13 +5478,63 @@ def admin_results_upload():
     if file and file.filename.endswith('.json'):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
-        file.save(filepath)
+        if RESULT_COMPACT_ENABLED:
+            # Upload neben das Ergebnis legen und von dort archivieren/projizieren (gestreamt)
+            upload_path = f"{filepath}.upload-{os.getpid()}"
+            save_upload_to(file, upload_path)
+            try:
+                store_result_file(filename, source_path=upload_path)
+            except ValueError as e:
+                flash(f'Ungültiges JSON: {e}', 'error')
+                return redirect(url_for('admin_results'))
+            finally:
+                os.remove(upload_path)
+        else:
+            save_upload_to(file, filepath)
+        bump_generation('results')
+        update_result_aggregates(filename)
         flash(f'Datei {filename} erfolgreich hochgeladen', 'success')
+
+        # Optional: Rundendaten gleich mit hochladen
+        lap_file = request.files.get('lap_file')
+        if lap_file and lap_file.filename:
+            try:
+                summary = ingest_lap_file(filename, lap_file)
+                flash(f"Rundendaten: {summary['laps']} Runden von {summary['cars']} Autos gespeichert", 'success')
+            except (ValueError, json.JSONDecodeError) as e:
+                flash(f'Rundendaten konnten nicht gelesen werden: {e}', 'error')
     else:
         flash('Nur .json Dateien erlaubt', 'error')
         
     return redirect(url_for('admin_results'))
 
+@app.route('/admin/results/laps/<filename>', methods=['POST'])
+@login_required
+def admin_results_laps(filename):
+    filename = secure_filename(filename)
+    filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
+    if not os.path.exists(filepath):
+        flash('Ergebnisdatei nicht gefunden', 'error')
+        return redirect(url_for('admin_results'))
+
+    try:
+        lap_file = request.files.get('lap_file')
+        if lap_file and lap_file.filename:
+            summary = ingest_lap_file(filename, lap_file)
+        elif request.form.get('fetch'):
+            subsession_id = read_result_fields(filepath, ('subsession_id',)).get('subsession_id')
+            if not subsession_id:
+                flash('Ergebnis hat keine subsession_id - Rundendaten bitte als Datei hochladen', 'error')
+                return redirect(url_for('admin_results'))
+            summary = write_lap_store(filename, parse_lap_payload(fetch_lap_data(subsession_id)), 'iracing')
+        else:
+            flash('Keine Datei ausgewählt', 'error')
+            return redirect(url_for('admin_results'))
+        flash(f"Rundendaten für {filename}: {summary['laps']} Runden von {summary['cars']} Autos gespeichert", 'success')
+    except Exception as e:
+        flash(f'Rundendaten konnten nicht gespeichert werden: {e}', 'error')
+    return redirect(url_for('admin_results'))
+
 @app.route('/admin/results/edit/<filename>', methods=['GET', 'POST'])
 @login_required
 def admin_results_edit(filename):
@@ -2388,9 +5543,8 @@ def admin_results_edit(filename):
         flash('Datei nicht gefunden', 'error')
         return redirect(url_for('admin_results'))
         
-    # Read file content
-    with open(filepath, 'r') as f:
-        content = f.read()
+    # Read file content (Original aus dem Archiv, nicht die Projektion)
+    content = load_result_original(filename)
     
     # Try to parse JSON for Visual Editor
     race_results = []
@@ -2434,23 +5588,22 @@ def admin_results_save(filename):
     mode = request.form.get('mode', 'visual') # 'visual' or 'code'
     
     try:
-        # Backup erstellen (Sicherheit)
+        # Backup erstellen (Sicherheit) - vom Original, bei kompaktierten Ergebnissen also vom Archiv
         if os.path.exists(filepath):
-            backup_path = filepath + ".bak"
-            shutil.copy2(filepath, backup_path)
+            archive = result_archive_path(filename)
+            source = archive if os.path.exists(archive) and compact_result_version(filepath) else filepath
+            shutil.copy2(source, source + ".bak")
 
         if mode == 'code':
             # RAW JSON SAVE
             content = request.form.get('content')
-            json.loads(content) # Validate
-            with open(filepath, 'w') as f:
-                f.write(content)
+            store_result_file(filename, raw=content) # Validiert (ValueError bei ungültigem JSON)
                 
         else:
             # VISUAL SAVE
             # We need to read the original file to preserve structure
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            note_file_read('result_files', filepath)
+            data = json.loads(load_result_original(filename))
             
             sessions = data.get('data', {}).get('session_results', [])
             race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), None)
@@ -2497,9 +5650,10 @@ def admin_results_save(filename):
                 raise Exception("Keine Race oder Quali Session gefunden.")
                         
             # Write back
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=4)
+            store_result_file(filename, raw=json.dumps(data, indent=4))
 
+        bump_generation('results')
+        update_result_aggregates(secure_filename(filename))
         flash('Ergebnis erfolgreich aktualisiert!', 'success')
         
     except json.JSONDecodeError as e:
@@ -2622,9 +5776,9 @@ def update_iracing_stats():
         except Exception as e:
             print(f"SimpleClient Init Failed: {e}")
             # 2. Versuch: Library Client (Falls installiert)
-            if IRACING_AVAILABLE:
+            irDataClient = get_irdataclient_class()
+            if irDataClient:
                 try:
-                    from iracingdataapi.client import irDataClient
                     client_to_use = irDataClient(username=IRACING_USER, password=IRACING_PASSWORD)
                     print("Nutze iracingdataapi Library")
                 except Exception as lib_e:
@@ -2649,6 +5803,7 @@ def update_iracing_stats():
                     stats = client_to_use.get_stats(cust_id=int(cust_id))
                 else:
                     # Library Client
+                    metric_inc('iracing_calls')
                     stats = client_to_use.stats_member_career(cust_id=int(cust_id))
 
                 if not stats: 
@@ -2694,11 +5849,6 @@ def get_drivers_data():
     drivers = load_drivers()
     if not drivers:
         return []
-    
-    # Migration Check
-    if drivers and isinstance(drivers[0], int):
-         # On-the-fly Konvertierung für Anzeige (speichert noch nicht)
-         drivers = [{"id": str(d), "iracing_id": str(d), "name": "Unknown"} for d in drivers]
 
     client = get_client()
     data_list = []
@@ -2851,20 +6001,10 @@ def team():
     except Exception as e:
         return f"<h1>Fehler:</h1><p>{e}</p>"
 
-@app.route('/driver/<driver_id>')
-def driver_detail(driver_id):
-    drivers = get_drivers_data()
-    # Driver ID can be string or int in JSON, so check both
-    driver = next((d for d in drivers if str(d['id']) == str(driver_id)), None)
-    
-    if not driver:
-        flash("Fahrer nicht gefunden.", "error")
-        return redirect(url_for('team'))
-        
-    # Get upcoming and past events for this driver
+def build_driver_history(driver_id, driver):
+    # Events des Fahrers, angereichert mit seinen Werten aus den verlinkten Ergebnisdateien
     events = load_events()
-    now = datetime.now().isoformat()
-    
+
     # Filter by driver ID participation
     d_id_str = str(driver_id)
     d_id_int = int(driver_id) if str(driver_id).isdigit() else None
@@ -2890,67 +6030,43 @@ def driver_detail(driver_id):
                 res_path = os.path.join(app.config['RESULTS_FOLDER'], secure_filename(e['result_file']))
                 if os.path.exists(res_path):
                     try:
-                        with open(res_path, 'r') as f:
-                            res_data = json.load(f)
+                        race_table, _ = load_session_tables(res_path)
                         
-                        sessions = res_data.get('data', {}).get('session_results', [])
-                        race_session = next((s for s in sessions if s.get('simsession_type_name') == 'Race'), sessions[-1] if sessions else None)
-                        
-                        if race_session:
+                        if race_table:
+                            race_session = race_table.session
                             # Always set result link if file exists and has race session
                             e['result_link'] = e['result_file']
                             
-                            # Find driver (Single or Team Event)
+                            # Find driver (Single or Team Event) über den ID-Index der Tabelle
                             d_res = None # Init
-                            scanned_teams = 0
-                            scanned_drivers = 0
-                            
-                            for r in race_session.get('results', []):
-                                scanned_teams += 1
-                                # 1. Single Driver Match (ID)
-                                if str(r.get('cust_id')) == search_id_str:
-                                    d_res = r
-                                    e['debug'] = "Found via Single ID"
-                                    break
-                                
-                                # 2. Team Driver Match (search inside driver_results)
-                                if 'driver_results' in r:
-                                    for team_driver in r.get('driver_results', []):
-                                        scanned_drivers += 1
-                                        if str(team_driver.get('cust_id')) == search_id_str:
-                                            # Found driver in team!
-                                            # We need to COMBINE team info (Position) with Driver Info (Incidents, Laps)
-                                            d_res = r.copy() # Copy team result
-                                            # Override specific driver stats
-                                            d_res['incidents'] = team_driver.get('incidents', 0)
-                                            # Best lap might be team best lap, or driver best lap?
-                                            # Usually we want the driver's best lap if available
-                                            if 'best_lap_time' in team_driver:
-                                                d_res['best_lap_time'] = team_driver.get('best_lap_time')
-                                                
-                                            e['debug'] = "Found via Team ID"
-                                            break
-                                if d_res: break
+                            row, team_driver = race_table.locate(search_id_str)
+                            if row is not None and team_driver is None:
+                                d_res = race_table.rows[row]
+                                e['debug'] = "Found via Single ID"
+                            elif row is not None:
+                                # Found driver in team!
+                                # We need to COMBINE team info (Position) with Driver Info (Incidents, Laps)
+                                d_res = race_table.rows[row].copy() # Copy team result
+                                # Override specific driver stats
+                                d_res['incidents'] = team_driver.get('incidents', 0)
+                                # Usually we want the driver's best lap if available
+                                if 'best_lap_time' in team_driver:
+                                    d_res['best_lap_time'] = team_driver.get('best_lap_time')
+                                e['debug'] = "Found via Team ID"
                                 
                             # If not found by ID, maybe by name? (less reliable, only top level)
                             if not d_res:
-                                d_res = next((r for r in race_session.get('results', []) if r.get('display_name') == driver['name']), None)
+                                d_res = next((r for r in race_table.rows if r.get('display_name') == driver['name']), None)
                                 if d_res: e['debug'] = "Found via Name"
                                 
                             if d_res:
-                                def format_time(val):
-                                    if val <= 0: return "-"
-                                    # iRacing time is in 1/10000 seconds
-                                    seconds = val / 10000
-                                    minutes = int(seconds // 60)
-                                    rem_seconds = seconds % 60
-                                    return f"{minutes}:{rem_seconds:06.3f}"
-                                
-                                e['best_lap'] = format_time(d_res.get('best_lap_time', 0))
+                                e['best_lap'] = format_lap_time(d_res.get('best_lap_time', 0))
                                 e['inc'] = d_res.get('incidents', 0)
                                 if not e.get('debug'): e['debug'] = "Found via ID (Standard)"
                             else:
                                 # Debug info
+                                scanned_teams = len(race_table)
+                                scanned_drivers = sum(len(r.get('driver_results', [])) for r in race_table.rows if 'driver_results' in r)
                                 first_res = race_session.get('results', [])[0] if race_session.get('results') else {}
                                 keys = list(first_res.keys())
                                 
@@ -2978,12 +6094,32 @@ def driver_detail(driver_id):
                 e['debug'] = "No result file linked"
 
             driver_events.append(e)
-            
+
+    return driver_events
+
+@app.route('/driver/<driver_id>')
+def driver_detail(driver_id):
+    drivers = get_drivers_data()
+    # Driver ID can be string or int in JSON, so check both
+    driver = next((d for d in drivers if str(d['id']) == str(driver_id)), None)
+    
+    if not driver:
+        flash("Fahrer nicht gefunden.", "error")
+        return redirect(url_for('team'))
+        
+    # Get upcoming and past events for this driver
+    now = datetime.now().isoformat()
+    driver_events = cached_artifact(f"driver-history:{driver_id}",
+                                    (GENERATIONS.get('events'), GENERATIONS.get('drivers'), GENERATIONS.get('results')),
+                                    lambda: build_driver_history(driver_id, driver))
+
     upcoming_events = [e for e in driver_events if e.get('date') > now]
     past_events = [e for e in driver_events if e.get('date') <= now]
     past_events.sort(key=lambda x: x.get('date'), reverse=True) # Newest first
     
-    return render_template('driver_detail.html', driver=driver, upcoming_events=upcoming_events, past_events=past_events)
+    stats = get_driver_stats(driver_cust_id(driver))
+    
+    return render_template('driver_detail.html', driver=driver, upcoming_events=upcoming_events, past_events=past_events, stats=stats)
 
 @app.route('/add', methods=['POST'])
 def add():
@@ -2996,7 +6132,7 @@ def add():
         new_id = int(new_id_str)
         drivers = load_drivers()
         
-        if new_id in drivers:
+        if any(str(d.get('iracing_id')) == str(new_id) for d in drivers):
             flash(f"Fahrer mit ID {new_id} ist bereits in der Liste.", "info")
             return redirect(url_for('index'))
 
@@ -3009,7 +6145,7 @@ def add():
                 
                 if info and 'members' in info and len(info['members']) > 0:
                     driver_name = info['members'][0]['display_name']
-                    drivers.append(new_id)
+                    drivers.append({"id": str(new_id), "iracing_id": str(new_id), "name": driver_name})
                     save_drivers(drivers)
                     flash(f"Fahrer '{driver_name}' erfolgreich hinzugefügt!", "success")
                 else:
@@ -3027,12 +6163,228 @@ def add():
 @app.route('/delete/<int:cust_id>')
 def delete(cust_id):
     drivers = load_drivers()
-    if cust_id in drivers:
-        drivers.remove(cust_id)
-        save_drivers(drivers)
+    remaining = [d for d in drivers if str(d.get('iracing_id')) != str(cust_id)]
+    if len(remaining) != len(drivers):
+        save_drivers(remaining)
         flash(f"Fahrer ID {cust_id} entfernt.", "info")
     return redirect(url_for('index'))
 
+# --- Statischer Export ---
+# Rendert alle öffentlichen Seiten als HTML in ein Verzeichnis (z.B. für nginx/CDN). Jede Seite merkt sich
+# die Versionen der Daten, aus denen sie gebaut wurde -> beim nächsten Export werden nur Seiten neu
+# gerendert, deren Daten sich geändert haben. Admin, Boxengasse und Formulare bleiben bei Flask.
+STORE_FILES = {
+    'drivers': DRIVERS_FILE,
+    'config': CONFIG_FILE,
+    'cars': CARS_FILE,
+    'events': EVENTS_FILE,
+    'news': NEWS_FILE,
+    'messages': MESSAGES_FILE,
+    'liveries': LIVERIES_FILE,
+    'setups': SETUPS_FILE,
+    'applications': APPLICATIONS_FILE,
+    'results_meta': RESULTS_META_FILE,
+    'standings': STANDINGS_FILE,
+}
+EXPORT_MANIFEST_NAME = '.export_manifest.json'
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}-{st.st_size}"
+    except OSError:
+        return "missing"
+
+def data_version(name):
+    """Version eines Datenbestands: Store-Name, 'result:<datei>', 'laps:<datei>', 'results', 'timeline' oder 'code'."""
+    if name in STORE_FILES:
+        # Datei-Stand fängt Änderungen außerhalb der Savers ab (Restore, Sync, Hand-Edit), die Generation
+        # Saves innerhalb derselben mtime-Auflösung
+        return f"{_file_version(STORE_FILES[name])}-g{GENERATIONS.get(name)}"
+    if name.startswith('result:'):
+        return _file_version(os.path.join(app.config['RESULTS_FOLDER'], secure_filename(name.split(':', 1)[1])))
+    if name.startswith('laps:'):
+        return _file_version(lap_store_path(name.split(':', 1)[1]))
+    
+    key = hashlib.sha1()
+    if name == 'results':
+        if os.path.exists(app.config['RESULTS_FOLDER']):
+            for filename in sorted(os.listdir(app.config['RESULTS_FOLDER'])):
+                if filename.endswith('.json'):
+                    key.update(f"{filename}:{_file_version(os.path.join(app.config['RESULTS_FOLDER'], filename))};".encode('utf-8'))
+    elif name == 'timeline':
+        # Zeitabhängige Anteile: nächstes/laufendes Event und welche Events schon vorbei sind
+        next_ev = get_next_event()
+        now = datetime.now().isoformat()
+        past_ids = [str(e.get('id')) for e in load_events() if e.get('date') and e.get('date') <= now]
+        key.update(json.dumps([next_ev.get('id') if next_ev else None, bool(next_ev and next_ev.get('is_live')), past_ids]).encode('utf-8'))
+    elif name == 'code':
+        key.update(_file_version(os.path.abspath(__file__)).encode('utf-8'))
+        template_folder = os.path.join(app.root_path, app.template_folder)
+        for filename in sorted(os.listdir(template_folder)):
+            key.update(f"{filename}:{_file_version(os.path.join(template_folder, filename))};".encode('utf-8'))
+    return key.hexdigest()
+
+def public_export_pages():
+    """Alle öffentlichen URLs mit den Daten, von denen sie abhängen."""
+    # Jede Seite nutzt base.html (site_config, next_event)
+    base_deps = ['code', 'config', 'events', 'timeline']
+    pages = [
+        ('/', base_deps + ['drivers', 'news']),
+        ('/team', base_deps + ['drivers']),
+        ('/calendar', base_deps),
+        ('/event-info', base_deps),
+        ('/results', base_deps + ['results', 'results_meta']),
+    ]
+    
+    for event in load_events():
+        deps = base_deps + ['drivers', 'news']
+        if event.get('result_file'):
+            deps.append(f"result:{event['result_file']}")
+        pages.append((f"/event/{event['id']}", deps))
+    
+    for news_item in load_news():
+        pages.append((f"/news/{news_item['id']}", base_deps + ['news', 'drivers']))
+    
+    for driver in load_drivers():
+        if isinstance(driver, dict):
+            pages.append((f"/driver/{driver['id']}", base_deps + ['drivers', 'results']))
+    pages.append(('/compare', base_deps + ['drivers', 'results']))
+    
+    pages.append(('/standings', base_deps + ['standings']))
+    for season in get_shared('standings'):
+        pages.append((f"/standings/{season['key']}", base_deps + ['standings']))
+    
+    for key, event in sorted(get_shared('split_events').items()):
+        pages.append((f"/results/event/{key}", base_deps + ['drivers'] + [f"result:{f}" for f in event['files'].values()]))
+    
+    if os.path.exists(app.config['RESULTS_FOLDER']):
+        for filename in sorted(os.listdir(app.config['RESULTS_FOLDER'])):
+            if not filename.endswith('.json'):
+                continue
+            deps = base_deps + ['results_meta', f"result:{filename}"]
+            pages.append((f"/results/view/{filename}", deps + [f"laps:{filename}"]))
+            if has_lap_data(filename):
+                pages.append((f"/results/view/{filename}/pace", deps + [f"laps:{filename}"]))
+            try:
+                # Einzelfahrer-Zeilen des Rennens (wie public_result_driver), Sessions gestreamt
+                race_session, _ = stream_result_sessions(os.path.join(app.config['RESULTS_FOLDER'], filename))
+                for entry in (race_session or {}).get('results', []):
+                    if entry.get('cust_id') and not entry.get('driver_results'):
+                        pages.append((f"/results/view/{filename}/driver/{entry['cust_id']}", deps))
+            except Exception as e:
+                print(f"Export: Fehler beim Lesen von {filename}: {e}")
+    return pages
+
+def _export_target(out_dir, path):
+    if path == '/':
+        return os.path.join(out_dir, 'index.html')
+    return os.path.join(out_dir, path.strip('/'), 'index.html')
+
+def _rewrite_export_links(html, exported_paths):
+    # Links auf exportierte Seiten bekommen einen Slash am Ende (-> <pfad>/index.html auf jedem Static Host)
+    def replace(match):
+        attr, url = match.group(1), match.group(2)
+        path, sep, rest = url.partition('#')
+        path_only, qsep, query = path.partition('?')
+        if path_only != '/' and path_only in exported_paths:
+            path_only += '/'
+        return f'{attr}="{path_only}{qsep}{query}{sep}{rest}"'
+    return re.sub(r'(href|action)="(/[^"]*)"', replace, html)
+
+def _sync_static_dir(src_dir, dst_dir):
+    copied = 0
+    for root, dirs, files in os.walk(src_dir, followlinks=True):
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(dst_dir, os.path.relpath(src, src_dir))
+            try:
+                src_st = os.stat(src)
+                dst_st = os.stat(dst) if os.path.exists(dst) else None
+                if dst_st and dst_st.st_size == src_st.st_size and int(dst_st.st_mtime) == int(src_st.st_mtime):
+                    continue
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst)
+                copied += 1
+            except OSError as e:
+                print(f"Export: Fehler beim Kopieren von {src}: {e}")
+    return copied
+
+def export_static_site(out_dir, base_url='http://localhost', full=False):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, EXPORT_MANIFEST_NAME)
+    manifest = {}
+    if not full and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except Exception:
+            manifest = {}
+    
+    pages = public_export_pages()
+    exported_paths = {path for path, deps in pages}
+    versions = {}
+    report = {"rendered": 0, "skipped": 0, "removed": 0, "failed": 0, "static_copied": 0}
+    new_manifest = {}
+    client = app.test_client()
+    
+    for path, deps in pages:
+        for dep in deps:
+            if dep not in versions:
+                versions[dep] = data_version(dep)
+        page_versions = {dep: versions[dep] for dep in deps}
+        target = _export_target(out_dir, path)
+        
+        if manifest.get(path, {}).get('deps') == page_versions and os.path.exists(target):
+            new_manifest[path] = manifest[path]
+            report['skipped'] += 1
+            continue
+        
+        resp = client.get(path, base_url=base_url)
+        if resp.status_code == 200:
+            html = _rewrite_export_links(resp.get_data(as_text=True), exported_paths)
+        elif resp.status_code in (301, 302) and resp.location:
+            # Redirects (z.B. /event-info) als Weiterleitungsseite
+            location = _rewrite_export_links(f'href="{resp.location}"', exported_paths)[6:-1]
+            html = f'<!DOCTYPE html><meta charset="utf-8"><meta http-equiv="refresh" content="0; url={location}"><a href="{location}">{location}</a>'
+        else:
+            print(f"Export: {path} -> HTTP {resp.status_code}, übersprungen.")
+            report['failed'] += 1
+            continue
+        
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = f"{target}.tmp"
+        with open(tmp_target, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_target, target)
+        new_manifest[path] = {"deps": page_versions}
+        report['rendered'] += 1
+    
+    # Seiten, die es nicht mehr gibt (gelöschte Events, News, ...)
+    for path in set(manifest) - set(new_manifest):
+        target = _export_target(out_dir, path)
+        if os.path.exists(target):
+            os.remove(target)
+            report['removed'] += 1
+    
+    report['static_copied'] = _sync_static_dir(os.path.join(app.root_path, 'static'), os.path.join(out_dir, 'static'))
+    
+    with open(manifest_path, 'w') as f:
+        json.dump(new_manifest, f, indent=4)
+    return report
+
+@app.cli.command('export-static')
+@click.argument('out_dir')
+@click.option('--base-url', default='http://localhost', help='Öffentliche URL der Seite (für og:url etc.).')
+@click.option('--full', is_flag=True, help='Alle Seiten neu rendern, Manifest ignorieren.')
+def export_static_command(out_dir, base_url, full):
+    """Exportiert alle öffentlichen Seiten als statisches HTML."""
+    report = export_static_site(out_dir, base_url=base_url, full=full)
+    click.echo(f"{report['rendered']} gerendert, {report['skipped']} unverändert, {report['removed']} entfernt, "
+               f"{report['failed']} fehlgeschlagen, {report['static_copied']} statische Dateien kopiert.")
+
+report_startup()
+
 if __name__ == "__main__":
     # Starte den Webserver auf Port 8083
     print("Starte Webserver auf http://127.0.0.1:8083")
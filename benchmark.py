@@ -0,0 +1,479 @@
+"""Route-Benchmark für die RaceDayFriends Seite.
+
+Baut ein synthetisches BASE_DATA_DIR (Fahrer, Events, Ergebnisdateien im Format von
+eventresult-83916242.json, News, Setups, Nachrichten), lädt die App in diesem Sandbox-Verzeichnis
+und misst jede öffentliche und Boxengasse-Route über den Flask Test Client:
+p50/p99 Latenz, gelesene Bytes und Ergebnisdateien (aus g.metrics der App, kalter Aufruf) und Peak RSS.
+
+Jede Route läuft in einem eigenen (geforkten) Prozess, damit Peak RSS pro Route messbar ist
+und Caches einer Route die nächste nicht beeinflussen.
+
+Beispiele:
+    python benchmark.py --scale team
+    python benchmark.py --scale league --iterations 30 --json bench_league.json
+    python benchmark.py --scale league --compare bench_league.json --max-regression 1.25
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_RESULT = os.path.join(REPO_DIR, 'static', 'results', 'eventresult-83916242.json')
+
+SCALES = {
+    # drivers, events, results, field size, classes, news, setups, messages
+    'team': dict(drivers=10, events=30, results=20, field=22, classes=2, news=20, setups=30, messages=50),
+    'league': dict(drivers=40, events=150, results=300, field=60, classes=3, news=100, setups=200, messages=50),
+}
+
+TRACKS = [
+    ("Spa-Francorchamps", "Grand Prix Pits"), ("Autodromo Enzo e Dino Ferrari", "Grand Prix"),
+    ("Daytona International Speedway", "Road Course"), ("Nürburgring Combined", "Gesamtstrecke 24h"),
+    ("Sebring International Raceway", "International"), ("Watkins Glen International", "Boot"),
+]
+CLASSES = [(4029, "GT3", "GT3 Class"), (4074, "GTP", "GTP Class"), (4048, "LMP2", "LMP2 Class")]
+
+
+# --- Synthetische Daten ---
+
+def _template_entry():
+    # Echte Ergebnis-Zeile als Vorlage, damit die Dateien Form und Größe realer Exporte haben
+    if os.path.exists(TEMPLATE_RESULT):
+        with open(TEMPLATE_RESULT, 'r') as f:
+            data = json.load(f)['data']
+        race = next(s for s in data['session_results'] if s['simsession_type_name'] == 'Race')
+        licenses = data.get('driver_licenses', {})
+        extra = {k: v for k, v in data.items() if k not in ('session_results', 'driver_licenses')}
+        return race['results'][0], licenses, extra
+    entry = {
+        "display_name": "Team", "finish_position": 0, "finish_position_in_class": 0, "laps_complete": 0,
+        "interval": 0, "class_interval": 0, "incidents": 0, "best_lap_time": 0, "average_lap": 0,
+        "livery": {"car_number": "1"}, "driver_results": [],
+    }
+    return entry, {}, {}
+
+
+def _make_driver_result(template, cust_id, name, laps, rnd):
+    d = copy.deepcopy(template.get('driver_results', [template])[0]) if template.get('driver_results') else {}
+    d.update({
+        "cust_id": cust_id, "display_name": name, "laps_complete": laps,
+        "best_lap_time": rnd.randint(1_350_000, 1_450_000), "average_lap": rnd.randint(1_400_000, 1_550_000),
+        "incidents": rnd.randint(0, 12), "oldi_rating": rnd.randint(1000, 4000),
+        "newi_rating": rnd.randint(1000, 4000), "old_safety_rating": 350, "new_safety_rating": 360,
+    })
+    return d
+
+
+def make_result(index, field, classes, team_drivers, rnd, template, licenses, extra, league):
+    track, config = TRACKS[index % len(TRACKS)]
+    start = datetime(2025, 1, 1) + timedelta(days=index * 3)
+    subsession_id = 80_000_000 + index
+    data = copy.deepcopy(extra)
+    data.update({
+        "subsession_id": subsession_id,
+        "associated_subsession_ids": [subsession_id],
+        "track": {"track_name": track, "config_name": config},
+        "start_time": start.isoformat() + "Z",
+        "series_name": "RDF Benchmark Series",
+        "season_year": start.year,
+        "season_quarter": (start.month - 1) // 3 + 1,
+        "league_id": 4711 if league else 0,
+        "league_season_id": 100 + start.year if league else 0,
+        "driver_licenses": licenses,
+        "session_results": [],
+    })
+
+    used_classes = CLASSES[:classes]
+    sessions = []
+    for s_num, s_name in ((-2, "Open Practice"), (-1, "Open Qualifying"), (0, "Race")):
+        results = []
+        for pos in range(field):
+            cid, cshort, cname = used_classes[pos % len(used_classes)]
+            laps = max(1, 120 - pos // len(used_classes) - rnd.randint(0, 2))
+            entry = copy.deepcopy(template)
+            members = []
+            for m in range(3):
+                if pos == 0 and m < len(team_drivers):
+                    cust_id, name = team_drivers[m]
+                else:
+                    cust_id, name = 1_000_000 + index * 1000 + pos * 3 + m, f"Driver {pos}-{m}"
+                members.append(_make_driver_result(template, cust_id, name, laps // 3, rnd))
+            entry.update({
+                "display_name": "RaceDayFriends" if pos == 0 else f"Team {pos}",
+                "team_id": -(index * 1000 + pos),
+                "finish_position": pos, "finish_position_in_class": pos // len(used_classes),
+                "position": pos, "car_class_id": cid, "car_class_short_name": cshort, "car_class_name": cname,
+                "laps_complete": laps, "interval": pos * 12_345, "class_interval": (pos // len(used_classes)) * 23_456,
+                "best_lap_time": min(d['best_lap_time'] for d in members),
+                "average_lap": int(statistics.mean(d['average_lap'] for d in members)),
+                "incidents": sum(d['incidents'] for d in members), "driver_results": members,
+                "livery": dict(template.get('livery', {}), car_number=str(pos + 1)),
+                "steward_note": "",
+            })
+            entry.pop('cust_id', None)
+            if pos == field - 1:
+                # Letzter Platz als Einzelfahrer-Zeile (ohne Team), für die Fahrer-Ansicht eines Ergebnisses
+                entry.update({k: v for k, v in members[0].items() if k != 'driver_results'}, driver_results=[])
+            results.append(entry)
+        sessions.append({"simsession_number": s_num, "simsession_type_name": s_name, "simsession_name": s_name.upper(),
+                         "results": results})
+    data['session_results'] = sessions
+    return f"eventresult-{subsession_id}.json", {"type": "subsession_results", "data": data}
+
+
+def make_laps(race, rnd):
+    # Rundendaten (Format der iRacing lap_chart_data) für alle Autos eines Rennens, Stopp alle 40 Runden
+    laps = []
+    for pos, entry in enumerate(race):
+        members = entry.get('driver_results') or [entry]
+        session_time = 0
+        for lap in range(1, entry['laps_complete'] + 1):
+            lap_time = entry['average_lap'] + rnd.randint(-15_000, 25_000)
+            pitted = lap % 40 == 0
+            session_time += lap_time
+            laps.append({"group_id": entry.get('team_id') or entry.get('cust_id'), "team_id": entry.get('team_id'),
+                         "cust_id": members[(lap // 40) % len(members)]['cust_id'], "lap_number": lap,
+                         "lap_time": lap_time + (600_000 if pitted else 0), "session_time": session_time,
+                         "lap_position": pos + 1, "lap_events": ["pitted"] if pitted else []})
+    return laps
+
+
+def build_dataset(target, scale, seed=42):
+    rnd = random.Random(seed)
+    os.makedirs(os.path.join(target, 'static', 'uploads'), exist_ok=True)
+    os.makedirs(os.path.join(target, 'static', 'results'), exist_ok=True)
+
+    drivers = [{
+        "id": str(1_700_000_000 + i), "name": f"Fahrer {i}", "iracing_id": str(500_000 + i),
+        "role": "Fahrer", "number": str(i + 1), "nationality": "DE", "image_url": "",
+        "ir_sports": 1500 + i * 50, "sr_sports": "A 3.50",
+    } for i in range(scale['drivers'])]
+    team_drivers = [(int(d['iracing_id']), d['name']) for d in drivers]
+
+    template, licenses, extra = _template_entry()
+    result_files = []
+    meta = {}
+    laps = {}
+    for i in range(scale['results']):
+        members = rnd.sample(team_drivers, min(3, len(team_drivers)))
+        filename, doc = make_result(i, scale['field'], scale['classes'], members, rnd, template, licenses, extra,
+                                    league=scale is SCALES['league'] or scale.get('league', False))
+        if scale['results'] >= 2 and i >= scale['results'] - 2:
+            # Die beiden neuesten Ergebnisse sind zwei Splits desselben Events (/results/event/<key>)
+            split_ids = [80_000_000 + scale['results'] - 2, 80_000_000 + scale['results'] - 1]
+            doc['data']['associated_subsession_ids'] = split_ids
+            doc['data']['session_splits'] = [{"subsession_id": sid, "event_strength_of_field": 2500 - n * 400}
+                                             for n, sid in enumerate(split_ids)]
+        if i == scale['results'] // 2:
+            laps[filename] = make_laps(doc['data']['session_results'][-1]['results'], rnd)
+        with open(os.path.join(target, 'static', 'results', filename), 'w') as f:
+            json.dump(doc, f, indent=4)
+        result_files.append((filename, doc['data'], [m[0] for m in members]))
+        if i % 2 == 0:
+            dt = datetime.fromisoformat(doc['data']['start_time'].rstrip('Z'))
+            meta[filename] = {"track": doc['data']['track']['track_name'], "date": dt.strftime('%d.%m.%Y %H:%M'),
+                              "series": doc['data']['series_name'], "title": f"Benchmark Rennen {i}"}
+
+    now = datetime.now()
+    events = []
+    for i in range(scale['events']):
+        past = i < scale['events'] * 2 // 3
+        date = now - timedelta(days=(scale['events'] - i) * 2) if past else now + timedelta(days=i)
+        event = {
+            "id": str(1_800_000_000 + i), "title": f"Event {i}", "series": "RDF Benchmark Series",
+            "track": TRACKS[i % len(TRACKS)][0], "date": date.strftime('%Y-%m-%dT%H:%M'), "duration": "2",
+            "league": "", "car_class": "GT3", "car_model": "BMW M4 GT3", "description": "Benchmark",
+            "drivers": [d['id'] for d in rnd.sample(drivers, min(3, len(drivers)))], "status": "approved",
+        }
+        if past and result_files:
+            filename, data, members = result_files[i % len(result_files)]
+            event['result_file'] = filename
+            by_iracing = {int(d['iracing_id']): d['id'] for d in drivers}
+            event['drivers'] = [by_iracing[m] for m in members]
+        events.append(event)
+
+    news = [{"id": str(1_900_000_000 + i), "title": f"News {i}", "category": "ARTICLE",
+             "date": (now - timedelta(days=i)).strftime('%Y-%m-%d'), "content": "Lorem ipsum " * 50,
+             "event_id": events[i % len(events)]['id'] if events else ""} for i in range(scale['news'])]
+
+    setups = []
+    for i in range(scale['setups']):
+        files = []
+        for j in range(3):
+            stored = f"setup_bench_{i}_{j}.sto"
+            with open(os.path.join(target, 'static', 'uploads', stored), 'wb') as f:
+                f.write(os.urandom(20_000))
+            files.append({"filename": f"setup_{j}.sto", "stored_filename": stored})
+        setups.append({"id": f"setup-{i}", "car": "BMW M4 GT3", "track": TRACKS[i % len(TRACKS)][0],
+                       "uploader": drivers[0]['name'], "uploader_id": drivers[0]['id'],
+                       "date": now.isoformat(), "files": files})
+
+    messages = [{"id": f"msg-{i}", "driver_id": drivers[i % len(drivers)]['id'], "driver_name": "Bench",
+                 "driver_image": None, "content": "Hallo Team! " * 5, "date": now.isoformat()}
+                for i in range(scale['messages'])]
+
+    stores = {
+        'drivers.json': drivers, 'events.json': events, 'news.json': news, 'setups.json': setups,
+        'messages.json': messages, 'liveries.json': [], 'applications.json': [], 'results_meta.json': meta,
+        'site_config.json': _load_repo_json('site_config.json', {}), 'cars.json': _load_repo_json('cars.json', {}),
+    }
+    for name, data in stores.items():
+        with open(os.path.join(target, name), 'w') as f:
+            json.dump(data, f, indent=4)
+    return {"drivers": drivers, "events": events, "news": news, "setups": setups, "results": result_files,
+            "laps": laps}
+
+
+def _load_repo_json(name, default):
+    try:
+        with open(os.path.join(REPO_DIR, name), 'r') as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+def build_sandbox(scale, seed):
+    # Eigener Ordner mit App-Code + Templates, damit BASE_DATA_DIR == Sandbox (kein Volume, kein Symlink)
+    sandbox = tempfile.mkdtemp(prefix='rdf_bench_')
+    shutil.copy2(os.path.join(REPO_DIR, 'app.py'), sandbox)
+    shutil.copytree(os.path.join(REPO_DIR, 'templates'), os.path.join(sandbox, 'templates'))
+    for sub in ('css', 'img'):
+        shutil.copytree(os.path.join(REPO_DIR, 'static', sub), os.path.join(sandbox, 'static', sub))
+    dataset = build_dataset(sandbox, scale, seed)
+    return sandbox, dataset
+
+
+# --- Messung ---
+
+# Routen, deren Antwort ein Redirect ist (z.B. /event-info -> nächstes Event)
+REDIRECT_ROUTES = {'/event-info'}
+
+
+def route_list(dataset):
+    routes = [('/', False), ('/team', False), ('/calendar', False), ('/results', False), ('/event-info', False),
+              ('/standings', False)]
+    results = dataset['results']
+    # Neuestes, ältestes und ein mittleres Ergebnis
+    picks = {0, len(results) // 2, len(results) - 1} if results else set()
+    for i in sorted(picks):
+        filename, data, members = results[i]
+        routes.append((f'/results/view/{filename}', False))
+        race = data['session_results'][-1]['results']
+        solo = next((r for r in race if r.get('cust_id') and not r.get('driver_results')), None)
+        if solo:
+            routes.append((f"/results/view/{filename}/driver/{solo['cust_id']}", False))
+    for filename in dataset['laps']:
+        routes.append((f'/results/view/{filename}/pace', False))
+    split_ids = sorted({sid for _, data, _ in results for sid in data['associated_subsession_ids']
+                        if len(data['associated_subsession_ids']) > 1})
+    if split_ids:
+        routes.append((f"/results/event/{split_ids[0]}-{len(split_ids)}", False))
+    seasons = sorted({f"{data['league_id']}-{data['league_season_id']}" for _, data, _ in results if data.get('league_id')})
+    if seasons:
+        routes.append((f"/standings/{seasons[-1]}", False))
+    past_events = [e for e in dataset['events'] if e.get('result_file')]
+    if past_events:
+        routes.append((f"/event/{past_events[-1]['id']}", False))
+    if dataset['events']:
+        routes.append((f"/event/{dataset['events'][-1]['id']}", False))
+    if dataset['drivers']:
+        routes.append((f"/driver/{dataset['drivers'][0]['id']}", False))
+    if len(dataset['drivers']) >= 2:
+        routes.append((f"/compare?d={dataset['drivers'][0]['id']}&d={dataset['drivers'][1]['id']}", False))
+    if dataset['news']:
+        routes.append((f"/news/{dataset['news'][0]['id']}", False))
+    routes.append(('/boxengasse', True))
+    routes.append(('/boxengasse/referenzen', True))
+    if dataset['setups']:
+        routes.append((f"/boxengasse/setup/download/{dataset['setups'][0]['id']}", True))
+    return routes
+
+
+def _current_rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * (os.sysconf('SC_PAGE_SIZE') // 1024)
+    except OSError:
+        return 0
+
+
+def measure_route(app_module, path, driver_session, driver_id, iterations):
+    # Zähler der App (g.metrics) des kalten Aufrufs mitschneiden: gelesene Bytes, Ergebnisdateien, Store-Loads
+    cold_counters = {}
+    record_request_metrics = app_module.record_request_metrics
+
+    def capture(endpoint, duration_ms, counters):
+        if not cold_counters:
+            cold_counters.update(counters)
+        record_request_metrics(endpoint, duration_ms, counters)
+
+    app_module.record_request_metrics = capture
+    client = app_module.app.test_client()
+    if driver_session:
+        with client.session_transaction() as s:
+            s['driver_logged_in'] = True
+            s['driver_id'] = driver_id
+            s['driver_name'] = 'Benchmark'
+
+    rss_start = _current_rss_kb()
+    # Erster Aufruf = Cold Cache, getrennt ausweisen
+    t = time.perf_counter()
+    resp = client.get(path)
+    resp.get_data()
+    cold_ms = (time.perf_counter() - t) * 1000
+    status = resp.status_code
+
+    timings = []
+    for _ in range(iterations):
+        t = time.perf_counter()
+        resp = client.get(path)
+        resp.get_data()
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    return {
+        "path": path,
+        "status": status,
+        "cold_ms": round(cold_ms, 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        "bytes_read": int(cold_counters.get('bytes_read', 0)),
+        "result_files": int(cold_counters.get('result_files', 0)),
+        "store_loads": int(cold_counters.get('store_loads', 0)),
+        "rss_start_kb": rss_start,
+    }
+
+
+def run_in_child(func, *args):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = func(*args)
+        except Exception as e:
+            result = {"path": args[1], "error": str(e)}
+        with os.fdopen(write_fd, 'w') as w:
+            json.dump(result, w)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'r') as r:
+        payload = r.read()
+    _, _, rusage = os.wait4(pid, 0)
+    result = json.loads(payload) if payload else {"path": args[1], "error": "kein Ergebnis"}
+    # ru_maxrss ist auf Linux in KB
+    result['peak_rss_mb'] = round(rusage.ru_maxrss / 1024, 1)
+    if 'rss_start_kb' in result:
+        result['rss_growth_mb'] = round((rusage.ru_maxrss - result.pop('rss_start_kb')) / 1024, 1)
+    return result
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path, 'r') as f:
+        baseline = {r['path']: r for r in json.load(f)['routes']}
+    regressions = []
+    for r in results:
+        base = baseline.get(r['path'])
+        if not base or 'p50_ms' not in base or 'p50_ms' not in r:
+            continue
+        if base['p50_ms'] > 0 and r['p50_ms'] / base['p50_ms'] > max_regression:
+            regressions.append(f"{r['path']}: p50 {base['p50_ms']}ms -> {r['p50_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='team')
+    for key in ('drivers', 'events', 'results', 'field', 'classes', 'news', 'setups', 'messages'):
+        parser.add_argument(f'--{key}', type=int, help=f'Überschreibt {key} der gewählten Scale')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_out', help='Ergebnis als JSON speichern')
+    parser.add_argument('--compare', help='JSON eines früheren Laufs als Baseline')
+    parser.add_argument('--max-regression', type=float, default=1.25, help='Erlaubter Faktor auf p50 (Default 1.25)')
+    parser.add_argument('--keep', action='store_true', help='Sandbox-Verzeichnis nicht löschen')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    scale['league'] = args.scale == 'league'
+    for key in ('drivers', 'events', 'results', 'field', 'classes', 'news', 'setups', 'messages'):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    print(f"Baue Sandbox ({args.scale}: {scale['drivers']} Fahrer, {scale['events']} Events, {scale['results']} Ergebnisse)...")
+    t = time.perf_counter()
+    sandbox, dataset = build_sandbox(scale, args.seed)
+    print(f"Sandbox: {sandbox} ({time.perf_counter() - t:.1f}s)")
+
+    # App aus der Sandbox laden: ohne Volume ist BASE_DATA_DIR das Verzeichnis von app.py
+    os.environ['RAILWAY_VOLUME_MOUNT_POINT'] = os.path.join(sandbox, 'no-volume')
+    os.environ['UPLOAD_GC_INTERVAL_HOURS'] = '0'
+    os.environ['CACHE_WARMER'] = '0'
+    # Ergebnisse wie im Betrieb (Volume) kompaktieren, die Sandbox ist eine Kopie
+    os.environ['RESULT_COMPACT'] = '1'
+    sys.path.insert(0, sandbox)
+    t = time.perf_counter()
+    import app as app_module
+    import_ms = (time.perf_counter() - t) * 1000
+    app_module.app.config['TESTING'] = True
+    # Rundendaten gehen wie beim Upload durch den Lap Store der App
+    for filename, laps in dataset['laps'].items():
+        app_module.write_lap_store(filename, laps, 'benchmark')
+
+    driver_id = dataset['drivers'][0]['id'] if dataset['drivers'] else None
+    results = []
+    for path, driver_session in route_list(dataset):
+        r = run_in_child(measure_route, app_module, path, driver_session, driver_id, args.iterations)
+        if 'error' not in r and r['status'] != (302 if path in REDIRECT_ROUTES else 200):
+            # Redirects/Fehlerseiten messen nicht die Route selbst
+            r['error'] = f"HTTP {r['status']}"
+        results.append(r)
+        if 'error' in r:
+            print(f"  {path}: FEHLER {r['error']}")
+
+    print(f"\nImport app.py: {import_ms:.0f} ms\n")
+    header = f"{'Route':<70} {'HTTP':>4} {'cold':>8} {'p50':>8} {'p99':>8} {'gelesen':>10} {'Dateien':>7} {'peakRSS':>8} {'+RSS':>6}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        if 'error' in r:
+            continue
+        path = r['path'] if len(r['path']) <= 70 else '...' + r['path'][-67:]
+        print(f"{path:<70} {r['status']:>4} {r['cold_ms']:>7.1f}ms {r['p50_ms']:>6.1f}ms {r['p99_ms']:>6.1f}ms "
+              f"{r['bytes_read'] / 1024:>8.0f}KB {r['result_files']:>7} {r['peak_rss_mb']:>6.0f}MB {r.get('rss_growth_mb', 0):>5.0f}M")
+
+    report = {"date": datetime.now().isoformat(), "scale": scale, "iterations": args.iterations,
+              "import_ms": round(import_ms, 1), "routes": results}
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nGespeichert: {args.json_out}")
+
+    failed = [r['path'] for r in results if 'error' in r]
+    exit_code = 1 if failed else 0
+    if failed:
+        print(f"\n{len(failed)} Route(n) fehlgeschlagen.")
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"\nREGRESSIONEN (> x{args.max_regression}):")
+            for line in regressions:
+                print(f"  {line}")
+            exit_code = 1
+        else:
+            print(f"\nKeine Regression gegenüber {args.compare}.")
+
+    if not args.keep:
+        shutil.rmtree(sandbox, ignore_errors=True)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
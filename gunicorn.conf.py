@@ -0,0 +1,19 @@
+# Gunicorn Konfiguration (Procfile: gunicorn -c gunicorn.conf.py app:app)
+# Bind-Adresse und Worker-Anzahl kommen wie bisher aus PORT / WEB_CONCURRENCY.
+import os
+
+# app.py einmal im Master laden: init_persistence, Migrationen und die geteilten Read-Only Daten laufen
+# nur einmal, die Worker erben alles per Fork (copy-on-write). GUNICORN_PRELOAD=0 schaltet zurück.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.prepare_for_fork()
+
+
+def post_worker_init(worker):
+    # Hintergrund-Jobs (Upload GC, Cache Warmer) direkt nach dem Worker-Start, nicht erst beim ersten Request
+    import app
+    app.start_background_jobs()
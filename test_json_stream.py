@@ -0,0 +1,67 @@
+"""Prüft JsonStream an Chunk-Grenzen (abgeschnittene Zahlen) und die Validierung beim Speichern.
+
+app.py wird aus einer Kopie in einem temporären Ordner geladen, damit Import und Migrationen keine
+Daten im Repo anfassen. Lauf: python test_json_stream.py (oder pytest).
+"""
+import atexit
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+
+_app = None
+
+def load_app():
+    global _app
+    if _app is None:
+        workdir = tempfile.mkdtemp(prefix='rdf-test-')
+        atexit.register(shutil.rmtree, workdir, True)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'), workdir)
+        os.environ['RAILWAY_VOLUME_MOUNT_POINT'] = os.path.join(workdir, 'kein-volume')
+        os.environ['CACHE_WARMER'] = '0'
+        os.environ['RESULT_COMPACT'] = '1'
+        spec = importlib.util.spec_from_file_location('rdf_app_test', os.path.join(workdir, 'app.py'))
+        _app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_app)
+    return _app
+
+def test_number_cut_at_chunk_boundary():
+    app = load_app()
+    for cut in range(1, 12):
+        pad = 'x' * (app.JSON_STREAM_CHUNK - 20 - cut)
+        text = ('{"data":{"pad":"' + pad + '","avg": 123.45e-1, "n": -0.5E+3, '
+                '"track": {"track_name": "T"}, "session_results": []}}')
+        assert app.JsonStream(io.StringIO(text)).value() == json.loads(text)
+        projected = app.project_result_stream(app.JsonStream(io.StringIO(text)))
+        assert projected['data']['track'] == {'track_name': 'T'}
+
+def test_small_chunks():
+    app = load_app()
+    text = '{"a":[1.5,22.25e3,-0.0,3],"b":12345.678,"c":"x\\"]}"}'
+    for chunk in range(1, 10):
+        stream = app.JsonStream(io.StringIO(text), chunk)
+        values = {key: stream.value() for key in stream.object_keys()}
+        assert values == json.loads(text)
+        stream = app.JsonStream(io.StringIO(text), chunk)
+        stream.skip()
+        stream.finish()
+
+def test_store_rejects_invalid_json_in_skipped_fields():
+    app = load_app()
+    bad = '{"type":"x","data":{"weather":{"a" 1},"session_results":[]}}'
+    try:
+        app.store_result_file('kaputt.json', raw=bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ungültiges JSON wurde gespeichert")
+    assert not os.path.exists(os.path.join(app.RESULTS_FOLDER, 'kaputt.json'))
+    assert not os.path.exists(app.result_archive_path('kaputt.json'))
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print(f"{name}: OK")